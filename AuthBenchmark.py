@@ -0,0 +1,129 @@
+"""
+AuthBenchmark.py
+
+Author: Tim Duggan
+Date: 10/18/2026
+Company: ImposterAI
+Contact: csw73@cornell.edu
+
+This is a Python scripting tool measuring the authentication overhead of a request,
+i.e. the time login_required (see backend/auth.py) adds to every API request, with
+and without the user cache (AUTH_USER_CACHE_TTL). It runs in process against a new
+temporary database, so it neither needs a running server nor touches stored data:
+    python AuthBenchmark.py --requests 20000
+"""
+# region General/API Imports
+import argparse
+import os
+import tempfile
+import time
+from typing import Callable
+
+# endregion
+
+
+# region Benchmark Functions
+def time_per_request(app, headers: dict, step: Callable, requests: int) -> float:
+    """
+    Times a step run in the context of authenticated requests.
+
+    Args:
+        app (Flask): The application.
+        headers (dict): Headers of the requests.
+        step (Callable): Step to time, run once per request.
+        requests (int): Number of requests.
+
+    Returns:
+        float: Mean time per request in microseconds, including the setup and
+        teardown of the request context.
+    """
+    started = time.perf_counter()
+    for _ in range(requests):
+        with app.test_request_context("/api/benchmark", headers=headers):
+            step()
+
+    return (time.perf_counter() - started) / requests * 1e6
+
+
+def run_benchmark(requests: int, cache_ttl: float) -> None:
+    """
+    Registers a user, then times the authentication steps of its requests and
+    prints the results.
+
+    Args:
+        requests (int): Number of requests timed per step.
+        cache_ttl (float): AUTH_USER_CACHE_TTL of the cached run.
+    """
+    # [1] Point the application to a temporary database before loading it
+    tmp = tempfile.mkdtemp()
+    os.environ["DATABASE_PATH"] = os.path.join(tmp, "imposter.sqlite")
+    os.environ["CHAT_SHARDS"] = ""
+
+    from app import app
+    from backend.auth import decode_token, login_required
+    from backend.db import get_db
+    from backend.migrations import stamp_schema_version
+
+    with app.app_context(), app.open_resource("backend/schema.sql") as f:
+        get_db().executescript(f.read().decode("utf8"))
+        stamp_schema_version(get_db())
+    client = app.test_client()
+    token = client.post(
+        "/auth/register", json={"username": "benchmark", "password": "benchmark"}
+    ).get_json()["token"]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    # [2] Time the steps, from the bare request context to full authentication
+    view = login_required(lambda: None)
+    results = {
+        "request context only": time_per_request(app, headers, lambda: None, requests),
+        "token decoding": time_per_request(
+            app, headers, lambda: decode_token(token), requests
+        ),
+    }
+
+    app.config["AUTH_USER_CACHE_TTL"] = 0
+    results["login_required"] = time_per_request(app, headers, view, requests)
+
+    app.config["AUTH_USER_CACHE_TTL"] = cache_ttl
+    app.extensions.pop("user_cache", None)
+    results[f"login_required, {cache_ttl:g}s user cache"] = time_per_request(
+        app, headers, view, requests
+    )
+
+    # [3] Report the overhead on top of the bare request context
+    baseline = results["request context only"]
+    for name, value in results.items():
+        print(f"{name:<40} {value:8.1f} us/request ({value - baseline:+.1f} us)")
+
+
+# endregion
+
+
+def main():
+    """
+    Run the benchmark given the arguments provided by the user.
+    """
+    # [1] Set up the argument parser
+    parser = argparse.ArgumentParser(
+        description="Measure the authentication overhead of ImposterAI requests."
+    )
+    parser.add_argument(
+        "--requests", type=int, default=10000, help="Requests timed per step."
+    )
+    parser.add_argument(
+        "--cache-ttl",
+        type=float,
+        default=30,
+        help="AUTH_USER_CACHE_TTL of the cached run in seconds.",
+    )
+
+    # [2] Parse the arguments
+    args = parser.parse_args()
+
+    # [3] Run the benchmark
+    run_benchmark(args.requests, args.cache_ttl)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+"""
+CompressionBenchmark.py
+
+Author: Tim Duggan
+Date: 10/18/2026
+Company: ImposterAI
+Contact: csw73@cornell.edu
+
+This is a Python scripting tool comparing the storage formats of message contents
+(see CHAT_COMPRESSION in backend/config.py): plain text, zlib, lzma and zlib with a
+preset dictionary. For every format it stores the same messages, drawn from the
+messages and personality prompts of a database, in a new temporary database and
+reports the database size, the write time per message (committing every user and
+assistant message pair like a request does) and the time to read and decode a
+conversation.
+
+The preset dictionary is built from the same database as the messages (as
+build-chat-dictionary does for a live database), so its ratio is the best case.
+    python CompressionBenchmark.py --database instance/imposter.sqlite
+"""
+# region General/API Imports
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from typing import List
+
+# endregion
+
+# region Backend Imports
+from backend.compression import ContentCodec, build_dictionary
+
+# endregion
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+# region Benchmark Functions
+def load_corpus(path: str) -> List[str]:
+    """
+    Reads the stored message contents and personality prompts of a database.
+    Compressed messages are skipped.
+
+    Args:
+        path (str): Path to the database file.
+
+    Returns:
+        List[str]: The texts.
+    """
+    db = sqlite3.connect(path)
+    corpus = [
+        row[0]
+        for row in db.execute("SELECT CONTENT FROM messages WHERE ENCODING IS NULL")
+    ]
+    corpus += [row[0] for row in db.execute("SELECT SYSTEM_MESSAGE FROM personalities")]
+    db.close()
+
+    return [text for text in corpus if text]
+
+
+def benchmark_codec(
+    codec: ContentCodec, messages: List[str], conversation_size: int
+) -> dict:
+    """
+    Stores and reads the messages with a codec.
+
+    Args:
+        codec (ContentCodec): Codec of the storage format.
+        messages (List[str]): Message contents to store.
+        conversation_size (int): Messages per conversation.
+
+    Returns:
+        dict: "size" of the database in bytes, "write" seconds per message and
+        "read" seconds per conversation.
+    """
+    # [1] Create a database with the messages table of the schema
+    path = os.path.join(tempfile.mkdtemp(), "benchmark.sqlite")
+    db = sqlite3.connect(path)
+    with open(os.path.join(ROOT, "backend", "schema.sql")) as f:
+        db.executescript(f.read())
+    db.execute("PRAGMA journal_mode = WAL")
+    db.execute("PRAGMA synchronous = NORMAL")
+
+    # [2] Store the messages, committing every pair
+    conversations = len(messages) // conversation_size
+    started = time.perf_counter()
+    for i, message in enumerate(messages):
+        content, encoding = codec.encode(message)
+        db.execute(
+            """
+            INSERT INTO messages
+            (USER_ID, PERSONALITY_ID, SEQ, ROLE, CONTENT, ENCODING)
+            VALUES (?, 0, ?, ?, ?, ?)
+            """,
+            (i % conversations, i, "user" if i % 2 else "assistant", content, encoding),
+        )
+        if i % 2:
+            db.commit()
+    db.commit()
+    write = (time.perf_counter() - started) / len(messages)
+
+    # [3] Measure the size without free pages
+    db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    db.execute("VACUUM")
+    size = os.path.getsize(path)
+
+    # [4] Read and decode every conversation
+    started = time.perf_counter()
+    for user_id in range(conversations):
+        [
+            codec.decode(content, encoding)
+            for content, encoding in db.execute(
+                """
+                SELECT CONTENT, ENCODING FROM messages
+                WHERE USER_ID = ? AND PERSONALITY_ID = 0
+                ORDER BY SEQ
+                """,
+                (user_id,),
+            )
+        ]
+    read = (time.perf_counter() - started) / conversations
+    db.close()
+
+    return {"size": size, "write": write, "read": read}
+
+
+def run_benchmark(database: str, messages: int, conversation_size: int) -> None:
+    """
+    Compares the storage formats and prints the results.
+
+    Args:
+        database (str): Database to draw the message contents from.
+        messages (int): Number of messages stored per format.
+        conversation_size (int): Messages per conversation.
+    """
+    corpus = load_corpus(database)
+    random.seed(0)
+    # Numbered, so repeated texts are not exact duplicates
+    sample = [f"{random.choice(corpus)} ({i})" for i in range(messages)]
+
+    codecs = {
+        "plain": ContentCodec(None),
+        "zlib": ContentCodec("zlib"),
+        "lzma": ContentCodec("lzma"),
+        "zlib+dict": ContentCodec("zlib", dictionaries=[build_dictionary(corpus)]),
+    }
+    print(f"{len(corpus)} texts, {messages} messages, {conversation_size}/conversation")
+    for name, codec in codecs.items():
+        result = benchmark_codec(codec, sample, conversation_size)
+        print(
+            f"{name:<10} size {result['size'] / 1024 / 1024:6.1f} MiB"
+            + f"  write {result['write'] * 1e6:6.0f} us/message"
+            + f"  read {result['read'] * 1e3:5.2f} ms/conversation"
+        )
+
+
+# endregion
+
+
+def main():
+    """
+    Run the benchmark given the arguments provided by the user.
+    """
+    # [1] Set up the argument parser
+    parser = argparse.ArgumentParser(
+        description="Compare the storage formats of message contents."
+    )
+    parser.add_argument(
+        "--database",
+        default=os.path.join(ROOT, "instance", "imposter.sqlite"),
+        help="Database to draw the message contents from.",
+    )
+    parser.add_argument(
+        "--messages", type=int, default=20000, help="Messages stored per format."
+    )
+    parser.add_argument(
+        "--conversation-size",
+        type=int,
+        default=100,
+        help="Messages per conversation.",
+    )
+
+    # [2] Parse the arguments
+    args = parser.parse_args()
+
+    # [3] Run the benchmark
+    run_benchmark(args.database, args.messages, args.conversation_size)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+"""
+DatabaseBenchmark.py
+
+Author: Tim Duggan
+Date: 10/18/2026
+Company: ImposterAI
+Contact: csw73@cornell.edu
+
+This is a Python scripting tool measuring the throughput of the SQLite connection
+layer (see backend/db.py) when many worker processes read and write chats at once,
+like gunicorn workers do. It compares two modes on a new temporary database:
+    legacy : a new connection per operation with SQLite's defaults (rollback
+             journal), as get_db did before connections were pooled
+    pooled : one connection per worker, tuned with the SQLITE_* settings of
+             Config (WAL, synchronous=NORMAL, mmap and cache sizes, busy timeout)
+Every operation either appends a message to the worker's chat (a commit) or reads
+the latest page of it:
+    python DatabaseBenchmark.py --workers 8 --operations 1000 --write-ratio 0.2
+"""
+# region General/API Imports
+import argparse
+import multiprocessing
+import os
+import sqlite3
+import tempfile
+import time
+
+# endregion
+
+# region Backend Imports
+from backend.config import Config
+from backend.db import connect
+
+# endregion
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# Personality every benchmark chat is held with
+PERSONALITY_ID = 0
+
+# Messages stored in every chat before the measurement
+INITIAL_MESSAGES = 50
+
+
+# region Benchmark Functions
+def get_config() -> dict:
+    """
+    Returns the SQLITE_* settings of Config, waiting longer on locks so that the
+    legacy mode measures contention rather than failing under it.
+
+    Returns:
+        dict: Settings for backend.db.connect.
+    """
+    config = {name: getattr(Config, name) for name in dir(Config) if name.isupper()}
+    config["SQLITE_BUSY_TIMEOUT"] = 60.0
+    config["SQLITE_SHARED_POOL"] = False
+    return config
+
+
+def create_database(path: str, mode: str, workers: int) -> None:
+    """
+    Creates the benchmark database with a chat of INITIAL_MESSAGES messages per
+    worker.
+
+    Args:
+        path (str): Path to the database file.
+        mode (str): "legacy" or "pooled".
+        workers (int): Number of worker processes.
+    """
+    db = sqlite3.connect(path)
+    with open(os.path.join(ROOT, "backend", "schema.sql")) as f:
+        db.executescript(f.read())
+    db.execute(f"PRAGMA journal_mode = {'DELETE' if mode == 'legacy' else 'WAL'}")
+
+    for worker in range(workers):
+        db.execute(
+            "INSERT INTO chats (USER_ID, PERSONALITY_ID) VALUES (?, ?)",
+            (worker, PERSONALITY_ID),
+        )
+        db.executemany(
+            """
+            INSERT INTO messages (USER_ID, PERSONALITY_ID, SEQ, ROLE, CONTENT)
+            VALUES (?, ?, ?, 'user', 'Hello there, how are you doing today?')
+            """,
+            [(worker, PERSONALITY_ID, seq) for seq in range(INITIAL_MESSAGES)],
+        )
+    db.commit()
+    db.close()
+
+
+def run_worker(
+    path: str, mode: str, worker: int, operations: int, write_ratio: float, results
+) -> None:
+    """
+    Runs the operations of a worker process and reports the time they took.
+
+    Args:
+        path (str): Path to the database file.
+        mode (str): "legacy" or "pooled".
+        worker (int): Number of the worker, also the user ID of its chat.
+        operations (int): Number of operations.
+        write_ratio (float): Fraction of the operations appending a message.
+        results (Queue): Receives the elapsed seconds.
+    """
+    config = get_config()
+    pooled = connect(path, config) if mode == "pooled" else None
+    writes_every = round(1 / write_ratio) if write_ratio > 0 else 0
+
+    started = time.perf_counter()
+    for i in range(operations):
+        db = pooled or sqlite3.connect(path, timeout=config["SQLITE_BUSY_TIMEOUT"])
+        if writes_every and i % writes_every == 0:
+            db.execute(
+                """
+                INSERT INTO messages (USER_ID, PERSONALITY_ID, SEQ, ROLE, CONTENT)
+                VALUES (?, ?, ?, 'assistant', 'I am doing great, thanks for asking!')
+                """,
+                (worker, PERSONALITY_ID, INITIAL_MESSAGES + i),
+            )
+            db.execute(
+                """
+                UPDATE chats SET MESSAGE_COUNT = MESSAGE_COUNT + 1
+                WHERE USER_ID = ? AND PERSONALITY_ID = ?
+                """,
+                (worker, PERSONALITY_ID),
+            )
+            db.commit()
+        else:
+            db.execute(
+                """
+                SELECT SEQ, ROLE, CONTENT FROM messages
+                WHERE USER_ID = ? AND PERSONALITY_ID = ?
+                ORDER BY SEQ DESC LIMIT 50
+                """,
+                (worker, PERSONALITY_ID),
+            ).fetchall()
+        if pooled is None:
+            db.close()
+
+    results.put(time.perf_counter() - started)
+
+
+def run_benchmark(workers: int, operations: int, write_ratio: float) -> None:
+    """
+    Runs both modes with concurrent worker processes and prints their throughput.
+
+    Args:
+        workers (int): Number of worker processes.
+        operations (int): Number of operations per worker.
+        write_ratio (float): Fraction of the operations appending a message.
+    """
+    throughputs = {}
+    for mode in ("legacy", "pooled"):
+        path = os.path.join(tempfile.mkdtemp(), "benchmark.sqlite")
+        create_database(path, mode, workers)
+
+        results = multiprocessing.Queue()
+        processes = [
+            multiprocessing.Process(
+                target=run_worker,
+                args=(path, mode, worker, operations, write_ratio, results),
+            )
+            for worker in range(workers)
+        ]
+        started = time.perf_counter()
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        elapsed = time.perf_counter() - started
+
+        throughputs[mode] = workers * operations / elapsed
+        print(f"{mode:<7} {throughputs[mode]:10,.0f} operations/s ({elapsed:.2f}s)")
+
+    print(f"Speedup: {throughputs['pooled'] / throughputs['legacy']:.1f}x")
+
+
+# endregion
+
+
+def main():
+    """
+    Run the benchmark given the arguments provided by the user.
+    """
+    # [1] Set up the argument parser
+    parser = argparse.ArgumentParser(
+        description="Measure the SQLite throughput of concurrent worker processes."
+    )
+    parser.add_argument(
+        "--workers", type=int, default=8, help="Number of worker processes."
+    )
+    parser.add_argument(
+        "--operations", type=int, default=1000, help="Operations per worker."
+    )
+    parser.add_argument(
+        "--write-ratio",
+        type=float,
+        default=0.2,
+        help="Fraction of the operations appending a message.",
+    )
+
+    # [2] Parse the arguments
+    args = parser.parse_args()
+
+    # [3] Run the benchmark
+    run_benchmark(args.workers, args.operations, args.write_ratio)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+"""
+FakeModelServer.py
+
+Author: Christian Welling
+Date: 10/18/2026
+Company: ImposterAI
+Contact: csw73@cornell.edu
+
+This is a Python scripting tool serving a fake model over the OpenAI chat
+completions wire format, to benchmark ImposterAI (and its HTTP model clients)
+without calling OpenAI.
+
+Start the server, then point the application at it:
+    python FakeModelServer.py --port 8089 --latency lognormal:1.5:0.5
+    OPENAI_API_BASE=http://127.0.0.1:8089/v1 OPENAI_API_KEY=fake gunicorn app:app
+
+The server answers POST /v1/chat/completions, streamed (server-sent events) or
+not, with the replies, latencies, errors and rate limits of the FAKE_MODEL_*
+settings (see backend/fake_model.py), which the arguments override.
+"""
+# region General/API Imports
+import argparse
+import asyncio
+import json
+import time
+import uuid
+
+from aiohttp import web
+
+# endregion
+
+# region Backend Imports
+from backend.config import Config
+from backend.fake_model import FakeProfile
+
+# endregion
+
+
+# region Server Functions
+def create_server(profile: FakeProfile) -> web.Application:
+    """
+    Creates the fake chat completions server.
+
+    Args:
+        profile (FakeProfile): Behavior of the fake model.
+
+    Returns:
+        Application: aiohttp application serving the fake model.
+    """
+
+    async def chat_completions(request: web.Request) -> web.StreamResponse:
+        # [1] Wait for the response like a real model, then inject the errors
+        body = await request.json()
+        await asyncio.sleep(profile.get_latency())
+        status = profile.get_error()
+        if status is not None:
+            error_type = "rate_limit_exceeded" if status == 429 else "server_error"
+            return web.json_response(
+                {
+                    "error": {
+                        "message": f"Fake model returned status {status}",
+                        "type": error_type,
+                    }
+                },
+                status=status,
+                headers={"Retry-After": "1"} if status == 429 else None,
+            )
+
+        content = profile.get_reply(body["messages"])
+        completion = {
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "created": int(time.time()),
+            "model": body.get("model", "fake"),
+        }
+
+        # [2] Answer with a single completion
+        if not body.get("stream"):
+            return web.json_response(
+                {
+                    **completion,
+                    "object": "chat.completion",
+                    "choices": [
+                        {
+                            "index": 0,
+                            "message": {"role": "assistant", "content": content},
+                            "finish_reason": "stop",
+                        }
+                    ],
+                }
+            )
+
+        # [3] Or stream the reply in chunks, as server-sent events
+        response = web.StreamResponse(
+            headers={"Content-Type": "text/event-stream", "Cache-Control": "no-cache"}
+        )
+        await response.prepare(request)
+
+        async def send(delta: dict, finish_reason=None) -> None:
+            chunk = {
+                **completion,
+                "object": "chat.completion.chunk",
+                "choices": [
+                    {"index": 0, "delta": delta, "finish_reason": finish_reason}
+                ],
+            }
+            await response.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+
+        await send({"role": "assistant"})
+        for i, chunk in enumerate(profile.split_chunks(content)):
+            if i:
+                await asyncio.sleep(profile.chunk_delay)
+            await send({"content": chunk})
+        await send({}, "stop")
+        await response.write(b"data: [DONE]\n\n")
+        await response.write_eof()
+        return response
+
+    app = web.Application()
+    app.router.add_post("/v1/chat/completions", chat_completions)
+    return app
+
+
+# endregion
+
+
+def main():
+    """
+    Start the fake model server with the profile given by the configuration and
+    the arguments provided by the user.
+    """
+    # [1] Set up the argument parser, defaulting to the FAKE_MODEL_* settings
+    parser = argparse.ArgumentParser(
+        description="Serve a fake model over the chat completions API."
+    )
+    parser.add_argument("--host", default="127.0.0.1", help="Address to bind.")
+    parser.add_argument("--port", type=int, default=8089, help="Port to bind.")
+    parser.add_argument(
+        "--reply", default=Config.FAKE_MODEL_REPLY, help="Reply template."
+    )
+    parser.add_argument(
+        "--latency",
+        default=Config.FAKE_MODEL_LATENCY,
+        help="Latency distribution, e.g. fixed:0.5 or lognormal:1.5:0.5.",
+    )
+    parser.add_argument(
+        "--chunk-delay",
+        type=float,
+        default=Config.FAKE_MODEL_CHUNK_DELAY,
+        help="Seconds between streamed chunks.",
+    )
+    parser.add_argument(
+        "--error-rate",
+        type=float,
+        default=Config.FAKE_MODEL_ERROR_RATE,
+        help="Share of requests failing with status 500.",
+    )
+    parser.add_argument(
+        "--requests-per-minute",
+        type=int,
+        default=Config.FAKE_MODEL_REQUESTS_PER_MINUTE,
+        help="Requests per minute before answering with status 429 (0 = no limit).",
+    )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=Config.FAKE_MODEL_SEED,
+        help="Seed of the latencies and errors.",
+    )
+
+    # [2] Parse the arguments
+    args = parser.parse_args()
+
+    # [3] Serve the fake model
+    profile = FakeProfile(
+        args.reply,
+        args.latency,
+        args.chunk_delay,
+        args.error_rate,
+        args.requests_per_minute,
+        args.seed,
+    )
+    web.run_app(create_server(profile), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
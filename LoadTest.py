@@ -0,0 +1,208 @@
+"""
+LoadTest.py
+
+Author: Tim Duggan
+Date: 10/18/2026
+Company: ImposterAI
+Contact: csw73@cornell.edu
+
+This is a Python scripting tool load testing a running ImposterAI server with
+concurrent chatters, e.g. to compare the sync and gevent serving modes (see
+gunicorn.conf.py). Every chatter registers a new user, then all chatters send
+their messages at once, each one after the other like a user waiting for the
+responses.
+
+To measure the server rather than OpenAI, run it against the fake model:
+    MODEL_CLIENT=fake FAKE_MODEL_LATENCY=fixed:1 WEB_CONCURRENCY=2 \\
+        SERVER_MODE=gevent gunicorn --config gunicorn.conf.py app:app
+    python LoadTest.py --chatters 100 --workers 2 --model-latency 1
+"""
+# region General/API Imports
+import argparse
+import asyncio
+import time
+import uuid
+from typing import List
+
+import aiohttp
+
+# endregion
+
+
+# region Load Test Functions
+async def register_chatter(session: aiohttp.ClientSession, url: str) -> str:
+    """
+    Registers a new user for a chatter.
+
+    Args:
+        session (ClientSession): HTTP client session.
+        url (str): Base URL of the server.
+
+    Returns:
+        str: Token of the user.
+    """
+    username = f"loadtest-{uuid.uuid4().hex}"
+    async with session.post(
+        f"{url}/auth/register", json={"username": username, "password": username}
+    ) as resp:
+        resp.raise_for_status()
+        return (await resp.json())["token"]
+
+
+async def run_chatter(
+    session: aiohttp.ClientSession,
+    url: str,
+    token: str,
+    personality_id: int,
+    messages: int,
+    latencies: List[float],
+    errors: List[str],
+) -> None:
+    """
+    Sends a chatter's messages one after the other.
+
+    Args:
+        session (ClientSession): HTTP client session.
+        url (str): Base URL of the server.
+        token (str): Token of the chatter's user.
+        personality_id (int): Personality to chat with.
+        messages (int): Number of messages to send.
+        latencies (List[float]): Receives the latency of every answered message.
+        errors (List[str]): Receives a description of every failed request.
+    """
+    headers = {"Authorization": f"Bearer {token}"}
+    for i in range(messages):
+        started = time.monotonic()
+        try:
+            async with session.post(
+                f"{url}/api/send_user_message",
+                json={"activeContactId": personality_id, "newMessage": f"Hi #{i}"},
+                headers=headers,
+            ) as resp:
+                body = await resp.json()
+                if resp.status != 200 or body.get("error"):
+                    errors.append(f"send_user_message: {resp.status}")
+                    continue
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            errors.append(f"send_user_message: {e!r}")
+            continue
+        latencies.append(time.monotonic() - started)
+
+
+async def run_load_test(
+    url: str,
+    chatters: int,
+    messages: int,
+    personality_id: int,
+    workers: int,
+    model_latency: float,
+) -> None:
+    """
+    Registers the chatters, then runs them concurrently and prints the results.
+
+    Args:
+        url (str): Base URL of the server.
+        chatters (int): Number of concurrent chatters.
+        messages (int): Number of messages sent by every chatter.
+        personality_id (int): Personality to chat with.
+        workers (int): Number of worker processes of the server.
+        model_latency (float): Latency of the model in seconds, if known.
+    """
+    latencies, errors = [], []
+    connector = aiohttp.TCPConnector(limit=0)
+    timeout = aiohttp.ClientTimeout(total=600)
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+        # [1] Register the users, which is not part of the measurement
+        tokens = await asyncio.gather(
+            *(register_chatter(session, url) for _ in range(chatters))
+        )
+
+        # [2] Chat concurrently
+        started = time.monotonic()
+        await asyncio.gather(
+            *(
+                run_chatter(
+                    session, url, token, personality_id, messages, latencies, errors
+                )
+                for token in tokens
+            )
+        )
+        elapsed = time.monotonic() - started
+
+    print(f"Messages answered: {len(latencies)} in {elapsed:.1f}s")
+    print(f"Errors: {len(errors)}")
+    for error in sorted(set(errors)):
+        print(f"  {errors.count(error)} x {error}")
+    if not latencies:
+        return
+
+    throughput = len(latencies) / elapsed
+    latencies.sort()
+    print(f"Throughput: {throughput:.1f} messages/s")
+    print(
+        "Latency: "
+        + ", ".join(
+            f"p{percentile} {latencies[len(latencies) * percentile // 100]:.2f}s"
+            for percentile in (50, 95, 99)
+        )
+    )
+    if model_latency:
+        # Little's law: messages waiting for the model at once
+        concurrency = throughput * model_latency
+        print(
+            f"Concurrent chats: {concurrency:.1f} "
+            + f"({concurrency / workers:.1f} per worker)"
+        )
+
+
+# endregion
+
+
+def main():
+    """
+    Run the load test given the arguments provided by the user.
+    """
+    # [1] Set up the argument parser
+    parser = argparse.ArgumentParser(
+        description="Load test a running ImposterAI server with concurrent chatters."
+    )
+    parser.add_argument(
+        "--url", default="http://127.0.0.1:8000", help="Base URL of the server."
+    )
+    parser.add_argument(
+        "--chatters", type=int, default=50, help="Number of concurrent chatters."
+    )
+    parser.add_argument(
+        "--messages", type=int, default=5, help="Messages sent by every chatter."
+    )
+    parser.add_argument(
+        "--personality", type=int, default=0, help="Personality to chat with."
+    )
+    parser.add_argument(
+        "--workers", type=int, default=1, help="Worker processes of the server."
+    )
+    parser.add_argument(
+        "--model-latency",
+        type=float,
+        default=None,
+        help="Latency of the (fake) model in seconds, to count concurrent chats.",
+    )
+
+    # [2] Parse the arguments
+    args = parser.parse_args()
+
+    # [3] Run the load test
+    asyncio.run(
+        run_load_test(
+            args.url.rstrip("/"),
+            args.chatters,
+            args.messages,
+            args.personality,
+            args.workers,
+            args.model_latency,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+"""
+ManageChatShards.py
+
+Author: Tim Duggan
+Date: 10/18/2026
+Company: ImposterAI
+Contact: csw73@cornell.edu
+
+This is a Python scripting tool for inspecting and rebalancing the chat shard
+databases of ImposterAI (see CHAT_SHARDS in backend/config.py).
+
+Rebalancing is an offline operation: stop the server, rebalance from the current
+shard list to the new one, then start the server with CHAT_SHARDS set to the new
+list. To split shards, keep the existing shards at the start of the new list and
+multiply their number, e.g. [a, b] -> [a, b, c, d]; users then only move from a to
+c and from b to d.
+"""
+# region General/API Imports
+import argparse
+import os
+import sqlite3
+from sqlite3 import Connection
+from typing import List
+
+# endregion
+
+# region Backend Imports
+from backend.db import CHAT_TABLES, get_shard_index
+from backend.migrations import MIGRATIONS, get_schema_version, stamp_schema_version
+
+# endregion
+
+SCHEMA_PATH = os.path.join(os.path.dirname(__file__), "backend", "schema.sql")
+
+
+# region Shard Functions
+def open_shard(path: str) -> Connection:
+    """
+    Connects to a shard database, initializing it with the latest schema if it does
+    not exist yet.
+
+    Args:
+        path (str): Shard database filename.
+
+    Returns:
+        Connection: Connection to the shard database.
+    """
+    # [1] Connect to the SQLite database
+    is_new = not os.path.exists(path)
+    conn = sqlite3.connect(path)
+
+    # [2] Create the schema of new shards
+    if is_new:
+        with open(SCHEMA_PATH, "r") as file:
+            conn.executescript(file.read())
+        stamp_schema_version(conn)
+        print(f"Created shard {path}.")
+
+    # [3] Refuse to move data between databases with different schemas
+    if get_schema_version(conn) != len(MIGRATIONS):
+        raise SystemExit(f"Shard {path} is outdated, run 'flask migrate-db' first.")
+
+    return conn
+
+
+def move_user(user_id: int, source: Connection, target: Connection) -> None:
+    """
+    Moves all chat data of a user from one shard to another. The copy is committed
+    before the source rows are deleted, so an interrupted move leaves duplicates
+    (overwritten when the move is repeated) but never loses data.
+
+    Args:
+        user_id (int): ID of the user to move.
+        source (Connection): Shard currently holding the user's chats.
+        target (Connection): Shard the user's chats are moved to.
+    """
+    # [1] Copy every chat table, letting the target assign new row IDs
+    for table in CHAT_TABLES:
+        columns = [
+            column[1]
+            for column in source.execute(f"PRAGMA table_info({table})")
+            if column[1] != "ID"
+        ]
+        rows = source.execute(
+            f"SELECT {', '.join(columns)} FROM {table} WHERE USER_ID = ?", (user_id,)
+        ).fetchall()
+        target.executemany(
+            f"INSERT OR REPLACE INTO {table} ({', '.join(columns)}) "
+            + f"VALUES ({', '.join('?' for _ in columns)})",
+            rows,
+        )
+    target.commit()
+
+    # [2] Delete the moved rows from the source shard
+    for table in CHAT_TABLES:
+        source.execute(f"DELETE FROM {table} WHERE USER_ID = ?", (user_id,))
+    source.commit()
+
+
+def rebalance(old_paths: List[str], new_paths: List[str]) -> None:
+    """
+    Moves every user's chats from the shard assigned by the old shard list to the
+    shard assigned by the new shard list.
+
+    Args:
+        old_paths (List[str]): Current shard database filenames (CHAT_SHARDS).
+        new_paths (List[str]): New shard database filenames.
+    """
+    # [1] Connect to all shards, creating new ones
+    shards = {os.path.abspath(path): None for path in old_paths + new_paths}
+    for path in shards:
+        shards[path] = open_shard(path)
+
+    # [2] Move users whose shard changed
+    for old_path in old_paths:
+        source = shards[os.path.abspath(old_path)]
+        user_ids = [
+            row[0] for row in source.execute("SELECT DISTINCT USER_ID FROM chats")
+        ]
+
+        moved = 0
+        for user_id in user_ids:
+            new_path = new_paths[get_shard_index(user_id, len(new_paths))]
+            if os.path.abspath(new_path) != os.path.abspath(old_path):
+                move_user(user_id, source, shards[os.path.abspath(new_path)])
+                moved += 1
+
+        print(f"Moved {moved} of {len(user_ids)} users out of {old_path}.")
+
+    # [3] Close the connections
+    for conn in shards.values():
+        conn.close()
+
+    print("Rebalanced successfully! Set CHAT_SHARDS to: " + ",".join(new_paths))
+
+
+def print_status(paths: List[str]) -> None:
+    """
+    Prints the number of users, chats and messages stored in each shard.
+
+    Args:
+        paths (List[str]): Shard database filenames.
+    """
+    for path in paths:
+        conn = sqlite3.connect(path)
+        users, chats = conn.execute(
+            "SELECT COUNT(DISTINCT USER_ID), COUNT(*) FROM chats"
+        ).fetchone()
+        messages = conn.execute("SELECT COUNT(*) FROM messages").fetchone()[0]
+        conn.close()
+
+        print(f"{path}: {users} users, {chats} chats, {messages} messages")
+
+
+# endregion
+
+
+def main():
+    """
+    Take appropriate actions on the chat shards given the arguments provided by the
+    user.
+    """
+    # [1] Set up the argument parser
+    parser = argparse.ArgumentParser(
+        description="Inspect and rebalance the chat shard SQLite databases."
+    )
+
+    # [2] Subparsers for different operations
+    subparsers = parser.add_subparsers(dest="operation", required=True)
+
+    # [3] Parser for shard status
+    status_parser = subparsers.add_parser(
+        "status", help="Print the contents of each shard. Args [shard_paths]"
+    )
+    status_parser.add_argument("shards", nargs="+", help="Shard database paths.")
+
+    # [4] Parser for rebalancing (and splitting) shards
+    rebalance_parser = subparsers.add_parser(
+        "rebalance",
+        help="Move chats from the old shard list to the new shard list (offline). "
+        + "Args [--old shard_paths, --new shard_paths]",
+    )
+    rebalance_parser.add_argument(
+        "--old", nargs="+", required=True, help="Current CHAT_SHARDS paths."
+    )
+    rebalance_parser.add_argument(
+        "--new", nargs="+", required=True, help="New CHAT_SHARDS paths."
+    )
+
+    # [5] Parse the arguments
+    args = parser.parse_args()
+
+    # [6] Call the appropriate function based on the operation
+    if args.operation == "status":
+        print_status(args.shards)
+    elif args.operation == "rebalance":
+        rebalance(args.old, args.new)
+
+
+if __name__ == "__main__":
+    main()
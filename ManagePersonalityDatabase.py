@@ -17,7 +17,8 @@ import sqlite3
 # endregion
 
 # region Backend Imports
-from backend.utils import serialize_json
+from backend.personality_cache import bump_personality_generation
+from backend.utils import compile_system_prompt, serialize_json
 
 # endregion
 
@@ -38,21 +39,31 @@ def create_new_personality_from_json(json_filename: str) -> None:
     conn = sqlite3.connect("instance/imposter.sqlite")
     cursor = conn.cursor()
 
-    # [3] Insert data from the JSON file into the database
+    # [3] Insert data from the JSON file into the database, precompiling the system
+    # message sent to the model
+    system_message, system_tokens = compile_system_prompt(data["system_prompt"])
     cursor.execute(
         """
-        INSERT INTO personalities (NAME, SYSTEM_PROMPT, INTRO_MESSAGE, IMAGE_PATH)
-        VALUES (?, ?, ?, ?)
+        INSERT INTO personalities (
+            NAME, SYSTEM_PROMPT, SYSTEM_MESSAGE, SYSTEM_TOKENS, INTRO_MESSAGE,
+            IMAGE_PATH
+        )
+        VALUES (?, ?, ?, ?, ?, ?)
     """,
         (
             data["name"],
             serialize_json(data["system_prompt"]),
+            system_message,
+            system_tokens,
             data["intro_message"],
             data["image_path"],
         ),
     )
 
-    # [4] Commit changes and close the connection
+    # [4] Invalidate cached personalities of running workers
+    bump_personality_generation(conn)
+
+    # [5] Commit changes and close the connection
     conn.commit()
     conn.close()
 
@@ -73,7 +84,10 @@ def delete_personality(personality_id: int) -> None:
     # [2] Delete record based on ID
     cursor.execute("DELETE FROM personalities WHERE ID = ?", (personality_id,))
 
-    # [3] Commit changes and close the connection
+    # [3] Invalidate cached personalities of running workers
+    bump_personality_generation(conn)
+
+    # [4] Commit changes and close the connection
     conn.commit()
     conn.close()
 
@@ -96,13 +110,17 @@ def update_personality(personality_id: int, json_filename: str):
     conn = sqlite3.connect("instance/imposter.sqlite")
     cursor = conn.cursor()
 
-    # [3] Update the nickname for the specified personality ID
+    # [3] Update the nickname for the specified personality ID, precompiling the
+    # system message sent to the model
+    system_message, system_tokens = compile_system_prompt(data["system_prompt"])
     cursor.execute(
         """
         UPDATE personalities
         SET 
             NAME = ?,
             SYSTEM_PROMPT = ?,
+            SYSTEM_MESSAGE = ?,
+            SYSTEM_TOKENS = ?,
             INTRO_MESSAGE = ?,
             IMAGE_PATH = ?
         WHERE ID = ?
@@ -110,12 +128,17 @@ def update_personality(personality_id: int, json_filename: str):
         (
             data["name"],
             serialize_json(data["system_prompt"]),
+            system_message,
+            system_tokens,
             data["intro_message"],
             data["image_path"],
             personality_id,
         ),
     )
-    # [4] Commit changes and close the connection
+    # [4] Invalidate cached personalities of running workers
+    bump_personality_generation(conn)
+
+    # [5] Commit changes and close the connection
     conn.commit()
     conn.close()
 
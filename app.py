@@ -13,9 +13,11 @@ for ImposterAI application.
 # region General/API Imports
 import os
 import sys
+import time
 import logging
 from flask.logging import default_handler
-from flask import Flask, request, send_from_directory, g
+from flask import Flask, Response, request, g, jsonify
+from flask import stream_with_context
 from flask_restful import Api
 from werkzeug.exceptions import HTTPException
 from typing import List, Dict
@@ -24,14 +26,21 @@ from typing import List, Dict
 
 # region Backend Imports
 from backend import db
+from backend import job_queue
+from backend import static_files
 from backend import auth
 from backend.config import Config
 import backend.callbacks as cb
 from backend.chat_manager import ChatManager
-from backend.gpt_model import GPTModel
-from backend.auth import login_required
+from backend.context_window import get_context_window
+from backend.idempotency import IdempotencyError, get_idempotency_store
+from backend.job_queue import get_job_queue
+from backend.model_factory import get_model, get_summarizer
+from backend.static_files import get_static_files
+from backend.auth import login_required, metrics_token_required
 from backend.database_manager import DatabaseManager as dbm
-from backend.utils import serialize_json
+from backend.metrics import METRICS
+from backend.utils import format_sse, format_sse_comment, serialize_json
 
 # endregion
 
@@ -74,7 +83,21 @@ def serve(path: str):
     Returns:
         A Flask Response object with the contents of the 'index.html'.
     """
-    return send_from_directory(app.static_folder, "index.html")
+    return get_static_files("frontend").serve("index.html")
+
+
+@app.endpoint("static")
+def static_file(filename: str):
+    """
+    Serve the other files of the build directory (replaces Flask's static view).
+
+    Args:
+        filename (str): path to static file
+
+    Returns:
+        A Flask Response object with the contents of the file.
+    """
+    return get_static_files("frontend").serve(filename)
 
 
 @app.route(rule="/favicon.ico")
@@ -83,13 +106,16 @@ def favicon():
     Handle favicon requests.
 
     Returns:
-        The requested 'favicon.ico' file.
+        The favicon of the build directory.
     """
-    return send_from_directory(os.path.join(app.root_path, "build"), "favicon.ico")
+    return get_static_files("frontend").serve("myfavicon.ico")
 
 
-# Initialize the database and register the auth blueprint
+# Initialize the database, job queue and static files, and register the auth
+# blueprint
 db.init_app(app)
+job_queue.init_app(app)
+static_files.init_app(app)
 app.register_blueprint(auth.bp)
 
 
@@ -105,7 +131,7 @@ def backend_assets(path: str):
     Returns:
         str: Full URL to the asset on the backend.
     """
-    return send_from_directory("backend/static/assets", path)
+    return get_static_files("backend_assets").serve(path)
 
 
 # endregion
@@ -120,107 +146,258 @@ def fetch_contacts() -> str:
 
     Returns:
         str: A JSON formatted string representing list of contacts,
-        each with their id, nickname, img, and last_message.
+        each with their id, nickname, img, last_message, last_message_at and
+        message_count.
     """
     app.logger.info("Fetching contacts")
-    # [1] Retrieve personality list from database
-    # TODO: handle case where fetching all personalities returns none
-    personality_list = dbm.get_all_personalities()
+    # [1] Retrieve personalities joined with the user's conversation previews
+    contact_list = dbm.get_contact_list(g.user["id"])
 
-    # [2] Convert list of tuples into dictionaries identified by personality_id
-    # {
-    #   id:
+    # [2] Convert list of tuples into list of dictionaries
+    # [
     #   {
     #       id:,
     #       nickname:,
     #       img:,
-    #       last_message:
+    #       last_message:,
+    #       last_message_at:,
+    #       message_count:
     #   },
     #   ...
-    # }
-    personality_dict = {
-        tpl[0]: dict(zip(["id", "nickname", "img", "last_message"], tpl))
-        for tpl in personality_list
-    }
+    # ]
+    contact_list_dict_format = [
+        dict(
+            zip(
+                [
+                    "id",
+                    "nickname",
+                    "img",
+                    "last_message",
+                    "last_message_at",
+                    "message_count",
+                ],
+                tpl,
+            )
+        )
+        for tpl in contact_list
+    ]
 
-    # [3] Retrieve chat list
-    user_id = g.user["id"]
-    chat_list = dbm.get_chat_list(user_id)
-
-    # [4] Update any last message given personalities with existing
-    # conversations
-    for personality_id, _ in chat_list:
-        last_message = get_last_message(user_id, personality_id)
-        if last_message is None:
-            app.logger.error(
-                f"Database Error. Conversation for [{personality_id}] not found!"
+    # [3] Convert to JSON format
+    contact_list_json_format = serialize_json(contact_list_dict_format)
+    return contact_list_json_format
+
+
+# endregion
+
+
+# region ChatMessaging
+@app.route(rule="/api/send_user_message", methods=["POST"])
+@login_required
+def send_user_message() -> Dict:
+    """
+    API endpoint to handle sending user messages. Requests with an Idempotency-Key
+    header are only sent once per key, see backend.idempotency.
+
+    With MESSAGE_JOBS, the message is stored and its response generated by a
+    background job (see backend.job_queue), to be fetched from
+    /api/generation_jobs/<job_id>.
+
+    Returns:
+        JSON response containing response to user message or error message, or with
+        MESSAGE_JOBS, the id of the job generating the response (status 202). A
+        conversation whose previous message is still being answered rejects new
+        messages (status 409).
+    """
+    # TODO: Error handling of payload content
+    # [1] Get the user's input
+    data = request.json
+
+    # [2] Send message to provided personality with a new chat manager
+    def handle_message():
+        chat_manager = ChatManager(
+            g.user["id"], get_model(), get_context_window(app.config), get_summarizer()
+        )
+        if app.config["MESSAGE_JOBS"]:
+            return queue_reply(
+                chat_manager, data["activeContactId"], data["newMessage"]
+            )
+
+        response = chat_manager.send_message(
+            data["activeContactId"], data["newMessage"]
+        )
+        return response, not response.get("error")
+
+    # [3] Send it once per idempotency key, if the client sent one
+    key = request.headers.get("Idempotency-Key")
+    if key is None:
+        response, _ = handle_message()
+    else:
+        try:
+            response = get_idempotency_store().execute(
+                g.user["id"],
+                key,
+                {"id": data["activeContactId"], "message": data["newMessage"]},
+                handle_message,
             )
-        else:
-            personality_dict[personality_id]["last_message"] = last_message
+        except IdempotencyError as e:
+            return jsonify({"error": str(e)}), e.status
 
-    # [5] Convert to list of dictionaries in JSON format
-    personality_list_dict_format = list(personality_dict.values())
-    personality_list_json_format = serialize_json(personality_list_dict_format)
-    return personality_list_json_format
+    # [4] Return ChatGPT's response, or the job generating it
+    if isinstance(response, dict) and "job_id" in response:
+        return response, 202
+    return response
 
 
-def get_last_message(user_id: int, personality_id: int) -> str:
+def queue_reply(chat_manager: ChatManager, conv_id: int, message: str) -> tuple:
     """
-    Retrieves the last message given user_id and personality_id. If
-    conversation does not exist, will return None.
+    Stores a user message and queues the job generating its response.
 
     Args:
-        user_id (int): User identifier.
-        personality_id (int): Personality identifier.
+        chat_manager (ChatManager): Chat manager of the user.
+        conv_id (int): The ID of the conversation the message is sent to.
+        message (str): The content of the message.
 
     Returns:
-        str: The content of the last message, or None if no message exists.
+        tuple: The response ({"job_id":, "id":} once queued, else an error
+        response) and whether it may be replayed to duplicate requests.
     """
-    try:
-        last_message = None
-        message_log = dbm.get_chat_from_id(user_id, personality_id)
-
-        # Return the last message (content key in dict) from log
-        if (
-            message_log
-            and isinstance(message_log, list)
-            and "content" in message_log[-1]
-        ):
-            last_message = message_log[-1]["content"]
-        return last_message
-    except Exception as e:
-        app.logger.error(
-            "An error occurred while retrieving the last message for user_id"
-            + f"{user_id} and personality_id {personality_id}: {str(e)}"
-        )
-        return None
+    queue = get_job_queue()
+    job_id = queue.reserve(g.user["id"], conv_id)
+    if job_id is None:
+        error = "The previous message is still being answered."
+        return (jsonify({"error": error, "id": conv_id}), 409), False
 
+    if not chat_manager.submit_message(conv_id, message):
+        queue.cancel(job_id)
+        error = {"content": ChatManager.ERROR_MESSAGE, "id": conv_id, "error": True}
+        return (jsonify(error), 500), False
 
-# endregion
+    queue.enqueue(job_id)
+    return {"job_id": job_id, "id": conv_id}, True
 
 
-# region ChatMessaging
-@app.route(rule="/api/send_user_message", methods=["POST"])
+@app.route(rule="/api/generation_jobs/<job_id>", methods=["GET"])
 @login_required
-def send_user_message() -> Dict:
+def fetch_generation_job(job_id: str) -> Dict:
     """
-    API endpoint to handle sending user messages.
+    API endpoint to poll a job generating the response to a message.
+
+    Args:
+        job_id (str): Id of the job, returned by /api/send_user_message.
 
     Returns:
-        JSON response containing response to user message or error message.
+        JSON response {"id":, "status":, "result":} where status is "queued",
+        "running", "done" or "failed", and result is the response to the message
+        (like the one of /api/send_user_message) once the job is finished.
+    """
+    job = get_job_queue().get(g.user["id"], job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job."}), 404
+    return job
+
+
+@app.route(rule="/api/generation_jobs/<job_id>/events", methods=["GET"])
+@login_required
+def subscribe_generation_job(job_id: str) -> Response:
+    """
+    API endpoint to subscribe to the result of a job generating the response to a
+    message, as Server-Sent Events.
+
+    Args:
+        job_id (str): Id of the job, returned by /api/send_user_message.
+
+    Returns:
+        A text/event-stream response with the following events:
+            status:  {'id':, 'status':} whenever the status of the job changes
+            done:    the finished job, see /api/generation_jobs/<job_id>
+            error:   {'error': <Description>} if the job does not exist
+            timeout: {'id':, 'status':} if the job is not finished within
+                     JOB_SUBSCRIBE_TIMEOUT seconds (e.g. no job worker is running),
+                     after which the client may subscribe again
+        While waiting, a comment is sent every JOB_HEARTBEAT_INTERVAL seconds.
+    """
+    queue = get_job_queue()
+    user_id = g.user["id"]
+    config = app.config
+
+    # [1] Poll the job until it is finished, reporting status changes
+    def generate_events():
+        status = None
+        started = time.monotonic()
+        last_sent = started
+        while True:
+            job = queue.get(user_id, job_id)
+            if job is None:
+                yield format_sse("error", {"error": "Unknown job."})
+                return
+            if job["result"] is not None:
+                yield format_sse("done", job)
+                return
+
+            now = time.monotonic()
+            if job["status"] != status:
+                status = job["status"]
+                yield format_sse("status", {"id": job_id, "status": status})
+                last_sent = now
+            elif now - last_sent >= config["JOB_HEARTBEAT_INTERVAL"]:
+                yield format_sse_comment("heartbeat")
+                last_sent = now
+
+            # Give the worker back instead of waiting for a job nobody runs
+            if now - started >= config["JOB_SUBSCRIBE_TIMEOUT"]:
+                METRICS.increment("job_queue.subscribe_timeouts")
+                yield format_sse("timeout", {"id": job_id, "status": status})
+                return
+            time.sleep(config["JOB_POLL_INTERVAL"])
+
+    # [2] Stream events
+    return Response(
+        stream_with_context(generate_events()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.route(rule="/api/stream_user_message", methods=["POST"])
+@login_required
+def stream_user_message() -> Response:
+    """
+    API endpoint to handle sending user messages, streaming the response as
+    Server-Sent Events while it is generated.
+
+    Expects the same JSON payload as /api/send_user_message.
+
+    Returns:
+        A text/event-stream response with the following events:
+            token: {'delta': <Next chunk of the response content>}
+            done:  {'content': <Complete response content>, 'id': <Conversation id>}
+            error: {'content': <Fallback error message>, 'id': <Conversation id>}
     """
-    # TODO: Error handling of payload content
     # [1] Get the user's input
     data = request.json
 
     # [2] Startup chat manager
-    chat_manager = ChatManager(g.user["id"], GPTModel())
-
-    # [3] Send message to provided personality
-    response = chat_manager.send_message(data["activeContactId"], data["newMessage"])
+    chat_manager = ChatManager(
+        g.user["id"], get_model(), get_context_window(app.config), get_summarizer()
+    )
 
-    # [4] Return ChatGPT's response
-    return response
+    # [3] Convert the streamed response into events
+    def generate_events():
+        for event in chat_manager.stream_message(
+            data["activeContactId"], data["newMessage"]
+        ):
+            if "delta" in event:
+                yield format_sse("token", event)
+            else:
+                name = "error" if event.get("error") else "done"
+                yield format_sse(name, {"content": event["content"], "id": event["id"]})
+
+    # [4] Stream events, keeping the request context for storing the conversation
+    return Response(
+        stream_with_context(generate_events()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 @app.route(rule="/api/fetch_chat_history", methods=["POST"])
@@ -248,17 +425,71 @@ def fetch_chat_history() -> List:
 
     # [2] Startup chat manager
     app.logger.debug("Setting up chat manager")
-    chat_manager = ChatManager(g.user["id"], GPTModel())
+    chat_manager = ChatManager(g.user["id"], get_model())
 
     # [3] Retreive conversation given ID
     app.logger.debug(f"personality_id: {data['id']}, type: {type(data['id'])}")
-    conversation = chat_manager.retrieve_conversation(data["id"])
+    conversation = chat_manager.get_conversation(data["id"])
 
     # [4] Export conversation history
     message_history = conversation.export_saved_messages()
     return message_history
 
 
+@app.route(rule="/api/fetch_chat_history_page", methods=["POST"])
+@login_required
+def fetch_chat_history_page() -> Dict:
+    """
+    API endpoint to fetch one page of chat history, newest messages first.
+
+    Expects a JSON payload with the conversation 'id', an optional 'before' cursor
+    (the 'next_cursor' of the previously fetched page) and an optional 'limit'.
+
+    Returns:
+        dict: A dictionary with the following structure:
+                {
+                    'messages': <List of messages in chronological order, each with
+                                'seq', 'role', 'content' and 'created_at' keys>,
+                    'next_cursor': <Cursor for the next (older) page, or None if
+                                   the oldest message has been returned>
+                }
+
+              System prompts are not included.
+    """
+    # [1] Get and validate user's input
+    data = request.json
+    before = data.get("before")
+    limit = data.get("limit", app.config["CHAT_HISTORY_PAGE_SIZE"])
+    if (before is not None and not isinstance(before, int)) or not isinstance(
+        limit, int
+    ):
+        return jsonify({"error": "Cursor and limit must be integers."}), 400
+    limit = max(1, min(limit, app.config["CHAT_HISTORY_MAX_PAGE_SIZE"]))
+
+    # [2] Startup chat manager
+    chat_manager = ChatManager(g.user["id"], get_model())
+
+    # [3] Retrieve requested page of the conversation
+    return chat_manager.fetch_message_page(data["id"], before, limit)
+
+
+# endregion
+
+
+# region Metrics
+@app.route(rule="/backend/metrics", methods=["GET"])
+@metrics_token_required
+def metrics() -> Dict:
+    """
+    API endpoint exposing the metrics of the worker serving the request, to clients
+    sending the METRICS_TOKEN (see backend.auth.metrics_token_required).
+
+    Returns:
+        dict: Counters and summaries, see backend.metrics.Metrics.snapshot.
+    """
+    return METRICS.snapshot()
+
+
 # endregion
 
 
@@ -274,7 +505,7 @@ def not_found(e: HTTPException) -> Flask.response_class:
         response_class: A Flask response object that sends the static "index.html"
         file back to the client.
     """
-    return app.send_static_file("index.html")
+    return get_static_files("frontend").serve("index.html")
 
 
 # Main entry point
@@ -7,23 +7,104 @@ Company: ImposterAI
 Contact: csw73@cornell.edu
 
 Contains abstract class for AI models used in imposter AI.
+
+Every request method accepts the request's context as keyword arguments
+(personality_id, user_id). Models ignore what they do not need, while model
+wrappers (e.g. caches) use it to decide how to handle a request and forward it.
+Wrappers enforcing a deadline also pass the seconds left as timeout, after which
+clients abort the request (or stream) instead of leaving it running in the
+background.
+
+Models log errors and return None (or end their stream) by default. Wrappers that
+handle errors themselves (e.g. retries) set raise_errors, so the wrapped model
+raises a ModelError instead.
+
+A stream's generator returns True once the response was received completely, and
+False if it ended early (e.g. the connection was lost), so wrappers forward its
+return value with `return (yield from ...)`. Only complete responses may be reused
+(e.g. cached).
 """
 # region Imports
+import time
 from abc import abstractmethod
+from typing import Generator
 
 # endregion
 
 
+def start_deadline(context: dict, deadline: float) -> float:
+    """
+    Starts the deadline of a request, shortened to the timeout of its context if
+    there is one. The timeout is removed from the context, so the wrapper can pass
+    the time left at every attempt instead.
+
+    Args:
+        context (dict): Request context.
+        deadline (float): Maximum duration (seconds) of the request.
+
+    Returns:
+        float: Monotonic time by which the request must be done.
+    """
+    timeout = context.pop("timeout", None)
+    if timeout is not None:
+        deadline = min(deadline, timeout)
+    return time.monotonic() + deadline
+
+
+class ModelError(Exception):
+    def __init__(self, message: str, retryable: bool = False) -> None:
+        """
+        Error of a model request, raised by models with raise_errors set.
+
+        Args:
+            message (str): Description of the error.
+            retryable (bool):
+                Whether the error is transient (e.g. rate limits, timeouts, service
+                unavailable) and the request may succeed when repeated.
+        """
+        super().__init__(message)
+        self.retryable: bool = retryable
+
+
 class AIModel:
+    # Raise ModelError on errors instead of logging them and returning None
+    raise_errors: bool = False
+
     @abstractmethod
-    def make_request(self, conversation_messages):
+    def make_request(self, conversation_messages, **kwargs):
         """
         Make request to model.
 
         Args:
             conversation_messages: messages input for api call
+            **kwargs: request context (personality_id, user_id)
 
         Returns:
             Message response JSON or None if error
         """
         pass
+
+    def stream_request(
+        self, conversation_messages, **kwargs
+    ) -> Generator[str, None, bool]:
+        """
+        Make streaming request to model. Models without native streaming support
+        yield the whole response as a single chunk.
+
+        Args:
+            conversation_messages: messages input for api call
+            **kwargs: request context (personality_id, user_id)
+
+        Yields:
+            str: Content chunks of the response as they arrive. Nothing is yielded
+            if there is an error.
+
+        Returns:
+            bool: True if the response was received completely.
+        """
+        resp = self.make_request(conversation_messages, **kwargs)
+        if not resp or not resp["content"]:
+            return False
+
+        yield resp["content"]
+        return True
@@ -0,0 +1,335 @@
+"""
+async_gpt_model.py
+
+Author: Christian Welling
+Date: 10/18/2026
+Company: ImposterAI
+Contact: csw73@cornell.edu
+
+Contains class for accessing GPT models through the OpenAI chat completions HTTP
+API with a long-lived, pooled aiohttp client.
+
+Every worker process owns one client session running on a background event loop,
+so connections (and their TLS sessions) are kept alive and reused across requests,
+while the Flask views wait for the requests synchronously. The client is opt-in
+(MODEL_CLIENT = "aiohttp").
+"""
+
+# region General/API Imports
+import asyncio
+import json
+import os
+import threading
+from typing import AsyncIterator, Generator, Mapping, Optional
+import aiohttp
+
+# endregion
+
+# region Backend Imports
+from backend.ai_model import AIModel, ModelError
+from backend.logger import LOGGER
+
+# endregion
+
+
+class AsyncGPTModel(AIModel):
+    def __init__(self, config: Mapping) -> None:
+        """
+        Access OpenAI GPT models with a pooled async HTTP client.
+
+        The API key is read from the environment once, the client session is created
+        on first use.
+
+        Args:
+            config (Mapping): Application configuration (usually current_app.config).
+        """
+        self._model_id: str = config["MODEL_ID"]
+        self._url: str = config["OPENAI_API_BASE"].rstrip("/") + "/chat/completions"
+        self._api_key: str = (os.getenv("OPENAI_API_KEY") or "").strip()
+        self._max_connections: int = config["MODEL_HTTP_MAX_CONNECTIONS"]
+        self._keepalive_timeout: float = config["MODEL_HTTP_KEEPALIVE_TIMEOUT"]
+        self._timeout = aiohttp.ClientTimeout(
+            total=config["MODEL_HTTP_TIMEOUT"],
+            connect=config["MODEL_HTTP_CONNECT_TIMEOUT"],
+        )
+
+        self._lock = threading.Lock()
+        self._pid: int = None
+        self._loop: asyncio.AbstractEventLoop = None
+        self._session: aiohttp.ClientSession = None
+
+    def set_model(self, model_id: str) -> None:
+        """
+        Sets the id of the model to be used.
+
+        Arguments:
+            model_id (str): The id of the model to be set.
+        """
+        self._model_id = model_id
+
+    def make_request(self, conversation_messages, **kwargs) -> Optional[dict]:
+        """
+        Makes a request to the model, blocking until the response is received.
+
+        Args:
+            conversation_messages (json): Input messages for the api call.
+            **kwargs: Request context, only timeout (seconds) is used.
+
+        Returns:
+            dict: The message response received from the "assistant".
+                  Returns None if there's an error.
+        """
+        return asyncio.run_coroutine_threadsafe(
+            self._request(conversation_messages, kwargs.get("timeout")),
+            self._get_loop(),
+        ).result()
+
+    def stream_request(
+        self, conversation_messages, **kwargs
+    ) -> Generator[str, None, bool]:
+        """
+        Makes a streaming request to the model, yielding chunks as they arrive.
+
+        Args:
+            conversation_messages (json): Input messages for the api call.
+            **kwargs: Request context, only timeout (seconds) is used.
+
+        Yields:
+            str: Content chunks of the "assistant" response. The stream ends early
+                 if there's an error.
+
+        Returns:
+            bool: True if the response was received completely.
+        """
+        loop = self._get_loop()
+        chunks = self._stream(conversation_messages, kwargs.get("timeout"))
+        try:
+            while True:
+                try:
+                    chunk = asyncio.run_coroutine_threadsafe(
+                        _next_chunk(chunks), loop
+                    ).result()
+                except StopAsyncIteration:
+                    return False
+                # None marks the end of a complete response
+                if chunk is None:
+                    return True
+                yield chunk
+        finally:
+            # Release the connection if the stream is abandoned early
+            asyncio.run_coroutine_threadsafe(chunks.aclose(), loop).result()
+
+    def _get_loop(self) -> asyncio.AbstractEventLoop:
+        """
+        Returns the client's event loop, starting it on first use. Event loops (and
+        their threads and connections) are never shared with forked processes.
+
+        Returns:
+            AbstractEventLoop: Event loop running in the background thread.
+        """
+        with self._lock:
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._session = None
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(
+                    target=self._loop.run_forever, name="model-client", daemon=True
+                ).start()
+
+            return self._loop
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        """
+        Returns the pooled client session, creating it on first use. Must be called
+        on the client's event loop.
+
+        Returns:
+            ClientSession: Session shared by every request of the worker.
+        """
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=self._max_connections,
+                    keepalive_timeout=self._keepalive_timeout,
+                ),
+                timeout=self._timeout,
+                headers={"Authorization": f"Bearer {self._api_key}"},
+            )
+        return self._session
+
+    async def _request(
+        self, conversation_messages, timeout: Optional[float] = None
+    ) -> Optional[dict]:
+        """
+        Sends a chat completion request on the client's event loop.
+
+        Args:
+            conversation_messages (json): Input messages for the api call.
+            timeout (float): Maximum seconds of the request, shortening
+                MODEL_HTTP_TIMEOUT. None keeps the session's timeout.
+
+        Returns:
+            dict: The message response, or None if there's an error.
+        """
+        try:
+            async with self._get_session().post(
+                self._url,
+                json=self._payload(conversation_messages),
+                timeout=self._get_timeout(timeout),
+            ) as resp:
+                if resp.status != 200:
+                    await self._handle_status_error(resp)
+                    return None
+
+                completion = await resp.json()
+                return completion["choices"][0]["message"]
+        except ModelError:
+            raise
+        except Exception as e:
+            self._handle_client_error(e)
+            return None
+
+    async def _stream(
+        self, conversation_messages, timeout: Optional[float] = None
+    ) -> AsyncIterator[Optional[str]]:
+        """
+        Sends a streaming chat completion request on the client's event loop.
+
+        Args:
+            conversation_messages (json): Input messages for the api call.
+            timeout (float): Maximum seconds of the whole stream, shortening
+                MODEL_HTTP_TIMEOUT. None keeps the session's timeout.
+
+        Yields:
+            str: Content chunks of the response, then None once the response is
+            complete. The stream ends without None if there's an error.
+        """
+        try:
+            async with self._get_session().post(
+                self._url,
+                json=self._payload(conversation_messages, stream=True),
+                timeout=self._get_timeout(timeout),
+            ) as resp:
+                if resp.status != 200:
+                    await self._handle_status_error(resp)
+                    return
+
+                # Every event is a "data: <json>" line, the last one "data: [DONE]"
+                async for line in resp.content:
+                    line = line.strip()
+                    if not line.startswith(b"data:"):
+                        continue
+                    data = line[len(b"data:") :].strip()
+                    if data == b"[DONE]":
+                        yield None
+                        return
+
+                    delta = json.loads(data)["choices"][0]["delta"]
+                    if delta.get("content"):
+                        yield delta["content"]
+
+                raise aiohttp.ClientPayloadError(
+                    "Response stream ended before [DONE]"
+                )
+        except ModelError:
+            raise
+        except Exception as e:
+            self._handle_client_error(e)
+
+    def _get_timeout(self, timeout: Optional[float]) -> aiohttp.ClientTimeout:
+        """
+        Returns the timeouts of a request limited to the given seconds.
+
+        Args:
+            timeout (float): Maximum seconds of the request, or None.
+
+        Returns:
+            ClientTimeout: Timeouts of the request.
+        """
+        if timeout is None:
+            return self._timeout
+
+        total = max(timeout, 0)
+        if self._timeout.total is not None:
+            total = min(total, self._timeout.total)
+        return aiohttp.ClientTimeout(total=total, connect=self._timeout.connect)
+
+    def _payload(self, conversation_messages, stream: bool = False) -> dict:
+        """
+        Builds the body of a chat completion request.
+
+        Args:
+            conversation_messages (json): Input messages for the api call.
+            stream (bool): Whether the response should be streamed.
+
+        Returns:
+            dict: Request body.
+        """
+        payload = {
+            "model": self._model_id,
+            "messages": conversation_messages,
+            "temperature": 1.2,
+        }
+        if stream:
+            payload["stream"] = True
+        return payload
+
+    async def _handle_status_error(self, resp: aiohttp.ClientResponse) -> None:
+        """
+        Logs an unsuccessful API response, or raises it as a ModelError if
+        raise_errors is set. Rate limits and server errors are retryable.
+
+        Args:
+            resp (ClientResponse): The response with an error status.
+        """
+        body = await resp.text()
+        if self.raise_errors:
+            raise ModelError(
+                f"OpenAI API returned status {resp.status}: {body}",
+                retryable=resp.status == 429 or resp.status >= 500,
+            )
+
+        if resp.status == 401:
+            LOGGER.error(f"OpenAI API key cannot be authenticated: {body}")
+        elif resp.status == 429:
+            LOGGER.error(f"OpenAI API request exceeded rate limit: {body}")
+        elif resp.status >= 500:
+            LOGGER.error(f"OpenAI API service is currently unavailable: {body}")
+        else:
+            LOGGER.error(f"OpenAI API request is invalid ({resp.status}): {body}")
+
+    def _handle_client_error(self, error: Exception) -> None:
+        """
+        Logs an error raised while making a request, or raises it as a ModelError
+        if raise_errors is set. Timeouts and connection errors are retryable.
+
+        Args:
+            error (Exception): The error raised by the request.
+        """
+        if self.raise_errors:
+            raise ModelError(
+                f"OpenAI API request failed: {error!r}",
+                retryable=isinstance(
+                    error, (asyncio.TimeoutError, aiohttp.ClientError)
+                ),
+            ) from error
+
+        if isinstance(error, asyncio.TimeoutError):
+            LOGGER.error(f"OpenAI API request timeout: {error}")
+        elif isinstance(error, aiohttp.ClientError):
+            LOGGER.error(f"Failed to connect to OpenAI API: {error}")
+        else:
+            LOGGER.error(f"An unknown error occurred: {error}")
+
+
+async def _next_chunk(chunks: AsyncIterator[str]) -> str:
+    """
+    Awaits the next chunk of an async stream.
+
+    Args:
+        chunks (AsyncIterator[str]): The stream.
+
+    Returns:
+        str: Next chunk. Raises StopAsyncIteration at the end of the stream.
+    """
+    return await chunks.__anext__()
@@ -13,12 +13,15 @@ user registration, login, logout and also implementing the required login decora
 It uses JWT for authentication and sqlite for database.
 """
 # region General/API Imports
+import collections
 import datetime
 import functools
-from typing import Callable
+import hmac
+import threading
+import time
+from typing import Callable, Optional
 
-from flask import Blueprint, current_app, g, jsonify, request, session
-from werkzeug.security import check_password_hash, generate_password_hash
+from flask import Blueprint, abort, current_app, g, jsonify, request, session
 import jwt
 
 # endregion
@@ -26,11 +29,17 @@ import jwt
 # region Backend Imports
 from backend.db import get_db
 from backend.logger import LOGGER
+from backend.metrics import METRICS
+from backend.password_hasher import PasswordHashingBusyError, get_password_hasher
 
 # endregion
 
 bp = Blueprint(name="auth", import_name=__name__, url_prefix="/auth")
 
+_lock = threading.Lock()
+
+BUSY_MESSAGE = "The server is busy, please try again later."
+
 
 # region Token Related Operations
 def create_token(user_id: int) -> (str, float):
@@ -83,6 +92,119 @@ def decode_token(token: str) -> int:
 # endregion
 
 
+# region User Lookup
+class UserCache:
+    def __init__(self, ttl: float, max_entries: int) -> None:
+        """
+        Per-worker cache of the users of authenticated requests, so a user sending
+        many requests is looked up once every ttl seconds.
+
+        Args:
+            ttl (float): Seconds a user is cached.
+            max_entries (int): Maximum number of cached users, the least recently
+            used ones are evicted first.
+        """
+        self._ttl: float = ttl
+        self._max_entries: int = max_entries
+        self._lock = threading.Lock()
+        # (user, expiry) by user ID, least recently used first
+        self._entries: collections.OrderedDict = collections.OrderedDict()
+
+    def get(self, user_id: int) -> Optional[dict]:
+        """
+        Returns a cached user.
+
+        Args:
+            user_id (int): ID of the user.
+
+        Returns:
+            dict: The user, or None if it is not cached or has expired.
+        """
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            if entry[1] <= time.monotonic():
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+            return entry[0]
+
+    def put(self, user_id: int, user: dict) -> None:
+        """
+        Caches a user.
+
+        Args:
+            user_id (int): ID of the user.
+            user (dict): The user.
+        """
+        with self._lock:
+            self._entries[user_id] = (user, time.monotonic() + self._ttl)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+
+
+def get_user_cache() -> Optional[UserCache]:
+    """
+    Returns the user cache of the current application, creating it on first use.
+
+    Returns:
+        UserCache: Shared cache, or None if AUTH_USER_CACHE_TTL disables it.
+    """
+    if current_app.config["AUTH_USER_CACHE_TTL"] <= 0:
+        return None
+
+    extensions = current_app.extensions
+    if "user_cache" not in extensions:
+        with _lock:
+            if "user_cache" not in extensions:
+                extensions["user_cache"] = UserCache(
+                    current_app.config["AUTH_USER_CACHE_TTL"],
+                    current_app.config["AUTH_USER_CACHE_SIZE"],
+                )
+
+    return extensions["user_cache"]
+
+
+def load_user(user_id: int) -> Optional[dict]:
+    """
+    Look up the user of an authenticated request, from the user cache if enabled.
+    Only the columns needed while serving requests are read, never the password.
+
+    Args:
+        user_id (int): ID of the user, from the token claims.
+
+    Returns:
+        dict: The user's "id" and "username", or None if the user does not exist.
+    """
+    # [1] Check the cache
+    cache = get_user_cache()
+    if cache is not None:
+        user = cache.get(user_id)
+        if user is not None:
+            METRICS.increment("auth.user_cache.hits")
+            return user
+        METRICS.increment("auth.user_cache.misses")
+
+    # [2] Read the user
+    row = (
+        get_db()
+        .execute("SELECT ID, USERNAME FROM users WHERE ID = ?", (user_id,))
+        .fetchone()
+    )
+    if row is None:
+        return None
+
+    user = {"id": row["ID"], "username": row["USERNAME"]}
+    if cache is not None:
+        cache.put(user_id, user)
+    return user
+
+
+# endregion
+
+
 # region User Authentication Routes
 @bp.route(rule="/register", methods=("GET", "POST"))
 def register():
@@ -93,7 +215,8 @@ def register():
         JSON response containing JWT Token and its expiry,
         along with status code 200 on Successful registration or,
         JSON response containing error message,
-        along with status code 400 or 500 in case of any error during registration.
+        along with status code 400 or 500 in case of any error during registration,
+        or 503 if too many passwords are being hashed.
     """
     if request.method == "POST":
         error = None
@@ -109,22 +232,23 @@ def register():
 
         if error is None:
             try:
-                db.execute(
+                pwhash = get_password_hasher().hash(password)
+            except PasswordHashingBusyError:
+                return jsonify({"error": BUSY_MESSAGE}), 503
+
+            try:
+                user_id = db.execute(
                     "INSERT INTO users (USERNAME, PASSWORD) VALUES (?, ?)",
-                    (username, generate_password_hash(password)),
-                )
+                    (username, pwhash),
+                ).lastrowid
                 db.commit()
-                user = db.execute(
-                    "SELECT * FROM users WHERE USERNAME = ?", (username,)
-                ).fetchone()
             except db.IntegrityError:
                 error = f"User {username} is already registered."
 
             if error is None:
                 session.clear()
-                user = dict(user)
-                session["user_id"] = user["ID"]
-                token, token_expiry = create_token(user["ID"])
+                session["user_id"] = user_id
+                token, token_expiry = create_token(user_id)
                 return (
                     jsonify(
                         {
@@ -153,7 +277,8 @@ def login():
         JSON response containing JWT Token and its expiry,
         along with status code 200 on Successful login or,
         JSON response containing error message,
-        along with status code 400 or 500 in case of any error during login.
+        along with status code 400 or 500 in case of any error during login,
+        or 503 if too many passwords are being hashed.
     """
     if request.method == "POST":
         error = None
@@ -168,16 +293,32 @@ def login():
 
             db = get_db()
             user = db.execute(
-                "SELECT * FROM users WHERE USERNAME = ?", (username,)
+                "SELECT ID, PASSWORD FROM users WHERE USERNAME = ?", (username,)
             ).fetchone()
 
             if user is None:
                 return jsonify({"error": "Incorrect username."}), 400
-            elif not check_password_hash(user["PASSWORD"], password):
+
+            hasher = get_password_hasher()
+            if not hasher.check(user["PASSWORD"], password):
                 return jsonify({"error": "Incorrect password."}), 400
 
+            # Replace hashes of an older method or cost now that the password is known,
+            # unless the hasher is busy (the next login will)
+            if hasher.needs_rehash(user["PASSWORD"]):
+                try:
+                    pwhash = hasher.hash(password)
+                except PasswordHashingBusyError:
+                    METRICS.increment("password_hash.rehashes_skipped")
+                else:
+                    db.execute(
+                        "UPDATE users SET PASSWORD = ? WHERE ID = ?",
+                        (pwhash, user["ID"]),
+                    )
+                    db.commit()
+                    METRICS.increment("password_hash.rehashes")
+
             session.clear()
-            user = dict(user)
             session["user_id"] = user["ID"]
             token, token_expiry = create_token(user["ID"])
             return (
@@ -192,6 +333,8 @@ def login():
                 200,
             )
 
+        except PasswordHashingBusyError:
+            return jsonify({"error": BUSY_MESSAGE}), 503
         except Exception as e:
             # catch any other error
             LOGGER.error(e)
@@ -214,34 +357,12 @@ def logout() -> (str, int):
     return jsonify({"message": "User logged out"}), 200
 
 
-@bp.before_app_request
-def load_logged_in_user() -> None:
-    """
-    Get the current logged in user before each HTTP request within
-    the application.
-
-    If the user is not logged in, the method will set g.user to None.
-    If the user is logged in, the method fetches the user's data from the database
-    and assigns it to g.user.
-    """
-
-    # Fetch user id from session
-    user_id = session.get("user_id")
-
-    # Check if user_id exists
-    if user_id is None:
-        g.user = None
-    else:
-        # Fetch user's data from database using user_id and set it to g.user
-        g.user = (
-            get_db().execute("SELECT * FROM users WHERE ID = ?", (user_id,)).fetchone()
-        )
-
-
 def login_required(view: Callable) -> Callable:
     """
     Decorator function to ensure certain views require user authentication (login)
-    to access.
+    to access. This is the only place requests are authenticated: the user ID comes
+    from the bearer token's claims, and g.user is set to the user's "id" and
+    "username" (see load_user).
 
     Args:
         view (Callable): Original view to be modified
@@ -264,14 +385,42 @@ def login_required(view: Callable) -> Callable:
 
         # Decode token to get user_id
         user_id = decode_token(token)
-        LOGGER.info(f"User ID: {user_id}")
         if not user_id:
             return jsonify({"error": "Invalid or expired token"}), 401
 
-        # Fetch user and attach to g.user for duration of request
-        g.user = (
-            get_db().execute("SELECT * FROM users WHERE ID = ?", (user_id,)).fetchone()
-        )
+        # Fetch user and attach to g.user for duration of request, once per request
+        # (the token's user may have been deleted since it was issued)
+        g.user = load_user(user_id)
+        if g.user is None:
+            return jsonify({"error": "Invalid or expired token"}), 401
+
+        return view(*args, **kwargs)
+
+    return wrapped_view
+
+
+def metrics_token_required(view: Callable) -> Callable:
+    """
+    Decorator function to restrict views exposing operational data (e.g. metrics)
+    to requests sending the METRICS_TOKEN as bearer token. Without a configured
+    token the views are disabled (404).
+
+    Args:
+        view (Callable): Original view to be modified
+
+    Returns:
+        Modified view function.
+    """
+
+    @functools.wraps(wrapped=view)
+    def wrapped_view(*args, **kwargs):
+        token = current_app.config["METRICS_TOKEN"]
+        if not token:
+            abort(404)
+
+        auth_header = request.headers.get("Authorization") or ""
+        if not hmac.compare_digest(auth_header.encode(), f"Bearer {token}".encode()):
+            return jsonify({"error": "Unauthorized"}), 401
 
         return view(*args, **kwargs)
 
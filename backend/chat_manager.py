@@ -10,31 +10,58 @@ Class for managing conversations of a user. Pulls conversation and personality
 information from DatabaseManager.
 """
 
+# region General/API Imports
+from typing import Callable, Iterator, Optional
+
+# endregion
+
 # region Backend Imports
 from backend.conversation import Conversation
 from backend.database_manager import DatabaseManager as dbm
-from backend.gpt_model import AIModel
+from backend.ai_model import AIModel
+from backend.context_window import ContextWindow
 from backend.logger import LOGGER
+from backend.summarizer import ConversationSummarizer
 
 # endregion
 
 
 class ChatManager:
-    def __init__(self, user_id: int, model: AIModel) -> None:
+    # Content returned instead of a response when the model does not respond
+    ERROR_MESSAGE = (
+        "... Imposter does not feel like responding at the current moment "
+        + "... please try again later!"
+    )
+
+    def __init__(
+        self,
+        user_id: int,
+        model: AIModel,
+        context_window: ContextWindow = None,
+        summarizer: ConversationSummarizer = None,
+    ) -> None:
         """
         Manages conversations and API model usage for a user.
 
+        Conversations are loaded lazily from the database the first time they are
+        accessed, so a request only pays for the conversations it actually uses.
+
         Args:
             user_id (int): user identification used in querying database
             model: Some type of model object which isn't specified here.
+            context_window (ContextWindow):
+                Token budget applied to model requests. Without one, every message
+                of the conversation is sent.
+            summarizer (ConversationSummarizer):
+                Summarizer folding old messages of stored conversations into their
+                running summary. Without one, conversations are not summarized.
         """
         self._user_id: int = user_id
         self._model: AIModel = model
+        self._context_window: ContextWindow = context_window
+        self._summarizer: ConversationSummarizer = summarizer
         self._conversation_history: dict = {}
 
-        # Retrieve current conversation history for user
-        self.update_conversation_history_from_remote()
-
     def send_message(self, conv_id: int, message) -> dict[str, str]:
         """
         Send a message by making API request for given model and returns response.
@@ -55,46 +82,202 @@ class ChatManager:
             dict[str, str]:
                 A dictionary including the response content and the id of the
                 conversation. The dictionary keys are "content" for the message
-                returned by the API (with a fallback error message if no response is
-                received) and "id" for the conversation ID.
+                returned by the API (with a fallback error message and "error" set
+                to True if no response is received) and "id" for the conversation
+                ID.
         """
 
-        # [1] Retrieve the conversation in question
-        LOGGER.debug(f"Sending message for conversation ID: {conv_id}.")
+        # [1] Retrieve the conversation and add the user's message
+        self._add_user_message(conv_id, message)
+
+        # [2] Send message
+        resp = self._send_model_request(conv_id)
+
+        # [3] Update and store the conversation with the response
+        return self._handle_model_response(conv_id, resp)
+
+    def submit_message(self, conv_id: int, message) -> bool:
+        """
+        Stores a user message without requesting a response, which is generated
+        later by generate_reply (e.g. by a job worker).
+
+        Args:
+            conv_id (int):
+                The ID of the conversation to which the message should be sent.
+
+            message (str):
+                The content of the message to be sent.
+
+        Returns:
+            bool: True if the message was stored.
+        """
+        self._add_user_message(conv_id, message)
+        self.store_conversation(conv_id)
+        return not self.current_conversation.get_unsaved_messages()
+
+    def generate_reply(
+        self, conv_id: int, should_store: Optional[Callable[[], bool]] = None
+    ) -> dict[str, str]:
+        """
+        Requests and stores the response to the stored messages of a conversation.
+        If the conversation was already answered (e.g. a job is run again after its
+        worker died), the stored response is returned instead.
+
+        Args:
+            conv_id (int): Conversation id
+            should_store (Callable[[], bool]):
+                Called once the response arrived. If it returns False (e.g. the job
+                was taken over by another worker), the response is not stored.
+
+        Returns:
+            dict[str, str]:
+                A dictionary including the response content ("content") and the id
+                of the conversation ("id"), see send_message.
+        """
+        self.current_conversation: Conversation = self.get_conversation(conv_id)
+        last_message = self.current_conversation.get_messages()[-1]
+        if last_message["role"] != "user":
+            return {"content": last_message["content"], "id": conv_id}
 
-        # If conversation ID does not exist, create new conversation
-        if conv_id not in self._conversation_history.keys():
-            LOGGER.debug("Creating new conversation.")
-            self.create_conversation(conv_id)
+        resp = self._send_model_request(conv_id)
+        if resp and should_store is not None and not should_store():
+            LOGGER.warning(f"Dropping response to conversation {conv_id}.")
+            return {"content": resp["content"], "id": conv_id}
+
+        return self._handle_model_response(conv_id, resp)
 
-        self.current_conversation: Conversation = self._conversation_history[conv_id]
+    def _add_user_message(self, conv_id: int, message) -> None:
+        """
+        Adds a user message to a conversation (created if it does not exist).
 
-        # [2] Update the conversation via conversation id
+        Args:
+            conv_id (int): Conversation id
+            message (str): The content of the message.
+        """
+        LOGGER.debug(f"Sending message for conversation ID: {conv_id}.")
+        self.current_conversation: Conversation = self.get_conversation(conv_id)
         self.current_conversation.add_user_message(message)
 
-        # [3] Send message
+    def _handle_model_response(self, conv_id: int, resp) -> dict[str, str]:
+        """
+        Adds the model's response to the conversation and stores it.
+
+        Args:
+            conv_id (int): Conversation id
+            resp: Message response of the model, or None if there was an error.
+
+        Returns:
+            dict[str, str]:
+                A dictionary with the response content ("content", a fallback error
+                message if no response was received, with "error" set to True) and
+                the conversation id ("id").
+        """
         # TODO: error handling on response
-        resp = self._send_model_request(conv_id)
         if resp:
             LOGGER.debug("Response received.")
 
-            # [4] Update conversation with response
-            self.current_conversation.add_assistant_message(resp.content)
+            # Update conversation with response
+            self.current_conversation.add_assistant_message(resp["content"])
 
             # Store History
             self.store_conversation(conv_id)
         else:
-            error_msg = (
-                "... Imposter does not feel like responding at the current moment "
-                + "... please try again later!"
-            )
-            resp = {"content": error_msg}
+            resp = {"content": self.ERROR_MESSAGE, "error": True}
 
-        # [5] Include id in response payload
+        # Include id in response payload
         resp["id"] = conv_id
 
         return resp
 
+    def stream_message(self, conv_id: int, message) -> Iterator[dict]:
+        """
+        Send a message by making a streaming API request for given model, yielding
+        the response content as it arrives.
+
+        The user and assistant messages are stored once the stream completes, or
+        when it is aborted (e.g. the client disconnects) after part of the response
+        was received. Nothing is stored if no response is received.
+
+        Args:
+            conv_id (int):
+                The ID of the conversation to which the message should be sent.
+
+            message (str):
+                The content of the message to be sent.
+
+        Yields:
+            dict:
+                {"delta": <content chunk>} for every chunk of the response, followed
+                by a final dictionary with the complete "content", the conversation
+                "id" and "done" set to True. If no response is received, the final
+                dictionary contains the fallback error message and "error" is True.
+        """
+
+        # [1] Retrieve the conversation and add the user's message
+        self._add_user_message(conv_id, message)
+
+        # [2] Forward response chunks as they arrive
+        chunks = []
+        try:
+            for chunk in self._model.stream_request(
+                self._export_request_messages(conv_id),
+                personality_id=conv_id,
+                user_id=self._user_id,
+            ):
+                chunks.append(chunk)
+                yield {"delta": chunk}
+        finally:
+            # [3] Store the (possibly partial) response once the stream ends
+            if chunks:
+                self.current_conversation.add_assistant_message("".join(chunks))
+                self.store_conversation(conv_id)
+
+        if not chunks:
+            yield {
+                "content": self.ERROR_MESSAGE,
+                "id": conv_id,
+                "done": True,
+                "error": True,
+            }
+            return
+
+        LOGGER.debug("Response streamed.")
+        yield {"content": "".join(chunks), "id": conv_id, "done": True}
+
+    def fetch_message_page(
+        self, conv_id: int, before_seq: int = None, limit: int = 50
+    ) -> dict:
+        """
+        Fetches a page of the conversation's messages, newest first, without loading
+        the whole conversation. System prompts are not included.
+
+        Args:
+            conv_id (int): Conversation id
+            before_seq (int):
+                Cursor returned with the previous page, or None for the newest page.
+            limit (int): Maximum number of messages in the page.
+
+        Returns:
+            dict: {"messages": [...], "next_cursor": <int or None>} where messages are
+            in chronological order and next_cursor is None once the oldest message
+            has been returned.
+        """
+        messages, next_cursor = dbm.get_chat_page(
+            self._user_id, conv_id, before_seq, limit
+        )
+
+        # A conversation that was never stored only consists of its intro message
+        if not messages and before_seq is None:
+            LOGGER.debug(f"No record of conversation with ID: {conv_id} exists!")
+            messages = [
+                {"seq": seq, **message, "created_at": None}
+                for seq, message in enumerate(
+                    self.get_conversation(conv_id).get_messages()
+                )
+            ]
+
+        return {"messages": messages, "next_cursor": next_cursor}
+
     def update_system_prompt(self, conv_id: int, prompt_string: str) -> None:
         """
         Updates the system pompt for a specified conversation/personality ID.
@@ -104,16 +287,10 @@ class ChatManager:
             conv_id (int): Conversation/personality id
             prompt_string (str): System prompt
         """
-        # TODO: error handling (1) if conversation does not exist
-        # Fetch relevant conversation if exist
-        if conv_id in self._conversation_history:
-            self.current_conversation: Conversation = self.current_conversation[conv_id]
-            # Update system prompt for conversation
-            self.current_conversation.add_system_message(prompt_string)
-        else:
-            LOGGER.error(
-                f"Conversation does not exist, cannot update prompt for ID: {conv_id}!"
-            )
+        # Fetch relevant conversation (created if it does not exist)
+        self.current_conversation: Conversation = self.get_conversation(conv_id)
+        # Update system prompt for conversation
+        self.current_conversation.add_system_message(prompt_string)
 
     def _send_model_request(self, conv_id: int):
         """
@@ -126,19 +303,49 @@ class ChatManager:
             Model restful API response json.
         """
         return self._model.make_request(
-            self._conversation_history[conv_id].export_saved_messages()
+            self._export_request_messages(conv_id),
+            personality_id=conv_id,
+            user_id=self._user_id,
         )
 
+    def _export_request_messages(self, conv_id: int) -> list:
+        """
+        Exports the conversation into the input of a model request, limited to the
+        context window if there is one.
+
+        Args:
+            conv_id (int): Conversation id
+
+        Return:
+            List of message dictionaries.
+        """
+        conversation: Conversation = self._conversation_history[conv_id]
+        if self._context_window is None:
+            return conversation.export_saved_messages()
+        return self._context_window.export(conversation)
+
     def store_conversation(self, conv_id) -> None:
         """
-        Stores the current state of the conversation in the database.
+        Stores the messages added to the conversation since it was last stored in the
+        database. Previously stored messages are not rewritten.
 
         Args:
             conv_id (int): Conversation id
         """
-        # retreive messages from conversation
-        messages = self._conversation_history[conv_id].get_messages()
-        dbm.save_chat(self._user_id, conv_id, messages)
+        # retreive new messages from conversation
+        conversation: Conversation = self._conversation_history[conv_id]
+        messages = conversation.get_unsaved_messages()
+        if not messages:
+            return
+
+        if dbm.append_messages(
+            self._user_id, conv_id, messages, conversation.get_saved_count()
+        ):
+            conversation.mark_saved()
+
+            # Fold messages that aged out of the kept window into the summary
+            if self._summarizer is not None:
+                self._summarizer.schedule(self._user_id, conv_id, conversation)
 
     def query_saved_conversations(self) -> list:
         """
@@ -157,6 +364,10 @@ class ChatManager:
     def update_conversation_history_from_remote(self) -> None:
         """
         Updates conversation list with any existing conversations from remote.
+
+        This eagerly loads every saved conversation of the user and should only be
+        used when all of them are needed. Use get_conversation for single
+        conversations.
         """
         LOGGER.info("Updating conversation history.")
         conversation_list = self.query_saved_conversations()
@@ -167,6 +378,22 @@ class ChatManager:
                 # Create conversation object for all retrieved convesations from remote
                 self.retrieve_conversation(conv_id)
 
+    def get_conversation(self, conv_id: int) -> Conversation:
+        """
+        Fetches the conversation for the given conversation id, loading it from the
+        database on first access. A new conversation is created if none is stored.
+
+        Args:
+            conv_id (int): Conversation id
+
+        Returns:
+            conversation object for conversation id.
+        """
+        if conv_id in self._conversation_history:
+            return self._conversation_history[conv_id]
+
+        return self.retrieve_conversation(conv_id)
+
     def retrieve_conversation(self, conv_id: int) -> Conversation:
         """
         Updates conversation history with the stored conversation from the database
@@ -185,11 +412,20 @@ class ChatManager:
             messages = []
             LOGGER.debug(f"No record of conversation with ID: {conv_id} exists!")
             LOGGER.debug("Creating new conversation!")
+            return self.create_conversation(conv_id, messages)
 
-        return self.create_conversation(conv_id, messages)
+        # Summaries are only stored and used when a summarizer is configured
+        summary, summary_count = None, 0
+        if self._summarizer is not None:
+            summary, summary_count = dbm.get_chat_summary(self._user_id, conv_id)
+        return self.create_conversation(conv_id, messages, summary, summary_count)
 
     def create_conversation(
-        self, personality_id: int, messages: list = []
+        self,
+        personality_id: int,
+        messages: list = None,
+        summary: str = None,
+        summary_count: int = 0,
     ) -> Conversation:
         """
         Creates a new conversation object and assigns it to the conv_id key in
@@ -199,8 +435,10 @@ class ChatManager:
         Args:
             personality_id (int): Personality id (same as conversation id)
             messages (list):
-                Array of messages related to conversation. If new conversation,
-                leave as empty list.
+                Array of messages related to conversation, as stored in the database.
+                If new conversation, leave as empty list.
+            summary (str): Stored running summary of the oldest messages.
+            summary_count (int): Number of leading messages folded into the summary.
 
         Returns:
             Newly created conversation object.
@@ -208,20 +446,32 @@ class ChatManager:
         # TODO: error checking personality_id does not match any know personalities in
         # database
         # [1] Get personality information from database
-        name, system_prompt, intro_message, img = dbm.get_personality_from_id(
-            personality_id
-        )
+        personality = dbm.get_personality(personality_id)
         LOGGER.debug(
-            f"Retrieved personality information for {name} ({personality_id})."
+            f"Retrieved personality information for {personality.name} "
+            + f"({personality_id})."
         )
 
+        # Every provided message is already stored in the database
+        messages = [] if messages is None else messages
+        saved_count = len(messages)
+
         if messages == []:
             # If no messages are provided, create a new conversation
-            messages.append({"role": "assistant", "content": intro_message})
+            messages.append({"role": "assistant", "content": personality.intro_message})
 
         # [2] Create new conversation in history with personality and message
-        # information
+        # information, reusing the precompiled system message
         self._conversation_history[personality_id] = Conversation(
-            personality_id, name, messages, system_prompt, img
+            personality_id,
+            personality.name,
+            messages,
+            list(personality.system_prompt),
+            personality.image_path,
+            saved_count,
+            personality.system_message,
+            personality.system_tokens,
+            summary,
+            summary_count,
         )
         return self._conversation_history[personality_id]
@@ -0,0 +1,215 @@
+"""
+chat_persister.py
+
+Author: Tim Duggan
+Date: 10/18/2026
+Company: ImposterAI
+Contact: csw73@cornell.edu
+
+Opt-in group commit for chat writes (see CHAT_WRITE_BATCHING in config.py).
+
+Instead of committing every chat write on its own, request threads hand their
+writes to a background writer per database. The writer collects the writes that
+arrive within a short window and commits them in a single transaction, i.e. with a
+single sync to disk, then acknowledges each write to its waiting request. Every
+write runs inside its own savepoint, so a failing write is rolled back without
+affecting the rest of the batch.
+
+Batching only pays off when a worker serves concurrent requests (gevent or
+threaded workers). A sync worker never has two writes to batch, so gunicorn.conf.py
+turns it off for sync workers.
+"""
+# region Imports
+import os
+import queue
+import threading
+import time
+from sqlite3 import Connection
+from typing import Callable, Mapping
+
+# endregion
+
+# region Backend Imports
+from backend.db import connect
+from backend.logger import LOGGER
+
+# endregion
+
+
+class _PendingWrite:
+    def __init__(self, write: Callable[[Connection], None]) -> None:
+        """
+        A write waiting to be committed by the persister. A write is either started
+        by the writer or cancelled by its request, never both.
+
+        Args:
+            write (Callable): Executes the write's statements on the given connection.
+        """
+        self.write = write
+        self.done = threading.Event()
+        self.committed = False
+        self._lock = threading.Lock()
+        self._started = False
+        self._cancelled = False
+
+    def start(self) -> bool:
+        """
+        Marks the write as executed by the writer.
+
+        Returns:
+            bool: False if the write was cancelled and must be skipped.
+        """
+        with self._lock:
+            self._started = not self._cancelled
+            return self._started
+
+    def cancel(self) -> bool:
+        """
+        Cancels the write unless the writer already started it.
+
+        Returns:
+            bool: True if the write will never be executed.
+        """
+        with self._lock:
+            self._cancelled = not self._started
+            return self._cancelled
+
+
+class ChatPersister:
+    def __init__(self, database: str, config: Mapping) -> None:
+        """
+        Background writer coalescing chat writes to one database into batched
+        transactions.
+
+        Args:
+            database (str): Path to the database file.
+            config (Mapping): Application configuration (usually current_app.config).
+        """
+        self._database: str = database
+        self._config: Mapping = dict(config)
+        self._window: float = config["CHAT_WRITE_BATCH_WINDOW"]
+        self._max_batch: int = config["CHAT_WRITE_BATCH_MAX"]
+        self._timeout: float = config["CHAT_WRITE_BATCH_TIMEOUT"]
+        self._queue: queue.Queue = queue.Queue()
+
+        self._thread = threading.Thread(
+            target=self._run, name=f"chat-persister:{database}", daemon=True
+        )
+        self._thread.start()
+
+    def submit(self, write: Callable[[Connection], None]) -> bool:
+        """
+        Queues a write and waits until the batch containing it is committed.
+
+        Args:
+            write (Callable):
+                Executes the write's statements on the given connection. It must not
+                commit or roll back.
+
+        Returns:
+            bool: True once the write is durably committed, False if it failed or
+            was not started in time (it is then cancelled, so it is never stored
+            and may be retried). A write started in time is always waited for.
+        """
+        pending = _PendingWrite(write)
+        self._queue.put(pending)
+
+        if not pending.done.wait(self._timeout) and pending.cancel():
+            LOGGER.error(f"Chat write to {self._database} timed out, cancelled it.")
+            return False
+
+        pending.done.wait()
+        return pending.committed
+
+    def _run(self) -> None:
+        """
+        Writer loop: waits for a first write, gathers more writes for the batch
+        window and commits them together.
+        """
+        db = connect(self._database, self._config)
+        # Transactions are managed explicitly, and since only one sync per batch is
+        # needed each commit can afford to be fully synchronous
+        db.isolation_level = None
+        synchronous = self._config["CHAT_WRITE_BATCH_SYNCHRONOUS"]
+        db.execute(f"PRAGMA synchronous = {synchronous}")
+
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self._window
+            while len(batch) < self._max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            self._commit(db, batch)
+
+    def _commit(self, db: Connection, batch: list) -> None:
+        """
+        Executes a batch of writes in a single transaction and acknowledges them.
+
+        Args:
+            db (Connection): Connection of the writer.
+            batch (list): Pending writes.
+        """
+        applied = []
+        try:
+            db.execute("BEGIN IMMEDIATE")
+            for pending in batch:
+                if not pending.start():
+                    continue
+                db.execute("SAVEPOINT chat_write")
+                try:
+                    pending.write(db)
+                    db.execute("RELEASE chat_write")
+                    applied.append(pending)
+                except Exception as e:
+                    db.execute("ROLLBACK TO chat_write")
+                    db.execute("RELEASE chat_write")
+                    LOGGER.error(f"Cannot save conversation to database! {e}")
+            db.execute("COMMIT")
+
+            for pending in applied:
+                pending.committed = True
+        except Exception as e:
+            if db.in_transaction:
+                db.execute("ROLLBACK")
+            LOGGER.error(f"Cannot commit batch of {len(batch)} chat writes! {e}")
+        finally:
+            for pending in batch:
+                pending.done.set()
+
+
+# Persisters of the current process, keyed by database path
+_persisters: dict = {}
+_persisters_lock = threading.Lock()
+_persisters_pid: int = None
+
+
+def get_persister(database: str, config: Mapping) -> ChatPersister:
+    """
+    Returns the persister of the given database, starting it on first use. Persisters
+    (and their threads) are never shared with forked processes.
+
+    Args:
+        database (str): Path to the database file.
+        config (Mapping): Application configuration (usually current_app.config).
+
+    Returns:
+        ChatPersister: Persister of the database.
+    """
+    global _persisters_pid
+
+    with _persisters_lock:
+        # Threads do not survive a fork, so start over in a new process
+        if _persisters_pid != os.getpid():
+            _persisters_pid = os.getpid()
+            _persisters.clear()
+
+        if database not in _persisters:
+            _persisters[database] = ChatPersister(database, config)
+
+        return _persisters[database]
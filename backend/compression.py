@@ -0,0 +1,222 @@
+"""
+compression.py
+
+Author: Christian Welling
+Date: 10/18/2026
+Company: ImposterAI
+Contact: csw73@cornell.edu
+
+Optional compression of stored message contents.
+
+Every message row records the encoding of its content, so rows written with
+different settings (including plain rows written before compression was enabled)
+can always be read back:
+    None            : plain text
+    "zlib"          : zlib compressed UTF-8
+    "lzma"          : xz compressed UTF-8
+    "zlib:<dictid>" : zlib compressed UTF-8 using the preset dictionary whose
+                      Adler-32 checksum is <dictid>
+
+Rows written with a preset dictionary can only be read with that dictionary. When
+a new dictionary replaces it, the retired one must stay listed (after the new one)
+in CHAT_COMPRESSION_DICTIONARIES and its file must never be deleted. A row that
+cannot be decoded anyway (e.g. its dictionary is missing or the row is corrupt) is
+logged and read as UNDECODABLE_CONTENT, so it does not break its conversation.
+"""
+# region General/API Imports
+import functools
+import lzma
+import zlib
+from typing import Iterable, Mapping, Optional, Tuple, Union
+
+# endregion
+
+# region Backend Imports
+from backend.logger import LOGGER
+from backend.metrics import METRICS
+
+# endregion
+
+# Largest useful zlib preset dictionary (size of the zlib window)
+MAX_DICTIONARY_SIZE = 32 * 1024
+
+# Content read in place of a stored message that cannot be decoded
+UNDECODABLE_CONTENT = "[This message could not be loaded.]"
+
+
+class ContentCodec:
+    def __init__(
+        self,
+        codec: str = None,
+        level: int = 6,
+        dictionaries: Iterable[bytes] = (),
+        min_size: int = 128,
+    ) -> None:
+        """
+        Encodes and decodes message contents for storage.
+
+        Args:
+            codec (str): "zlib", "lzma" or None to store new contents as plain text.
+            level (int): Compression level of the codec.
+            dictionaries (Iterable[bytes]):
+                zlib preset dictionaries. The first one is used to compress new
+                contents, all of them can be used to decompress stored contents.
+            min_size (int): Contents shorter than this (in bytes) are stored plain.
+        """
+        if codec not in (None, "zlib", "lzma"):
+            raise ValueError(f"Unknown chat compression codec: {codec}")
+
+        self._codec: str = codec
+        self._level: int = level
+        self._min_size: int = min_size
+        self._dictionaries: dict = {
+            f"zlib:{zlib.adler32(dictionary):08x}": dictionary
+            for dictionary in dictionaries
+        }
+
+        # Encoding recorded for newly compressed contents
+        self._encoding: str = codec
+        if codec == "zlib" and self._dictionaries:
+            self._encoding = next(iter(self._dictionaries))
+
+    def encode(self, content: str) -> Tuple[Union[str, bytes], Optional[str]]:
+        """
+        Encodes message content for storage. Contents that are too short or do not
+        shrink are kept as plain text.
+
+        Args:
+            content (str): Message content.
+
+        Returns:
+            tuple: Stored value (str or bytes) and its encoding.
+        """
+        data = content.encode("utf-8")
+        if self._codec is None or len(data) < self._min_size:
+            return content, None
+
+        if self._codec == "lzma":
+            compressed = lzma.compress(data, preset=self._level)
+        else:
+            compressor = zlib.compressobj(
+                self._level, zdict=self._dictionaries.get(self._encoding, b"")
+            )
+            compressed = compressor.compress(data) + compressor.flush()
+
+        if len(compressed) >= len(data):
+            return content, None
+        return compressed, self._encoding
+
+    def decode(self, value: Union[str, bytes], encoding: Optional[str]) -> str:
+        """
+        Decodes stored message content. Content that cannot be decoded is logged and
+        replaced by UNDECODABLE_CONTENT.
+
+        Args:
+            value (str | bytes): Stored value.
+            encoding (str): Encoding recorded with the value.
+
+        Returns:
+            str: Message content.
+        """
+        try:
+            return self._decode(value, encoding)
+        except (ValueError, zlib.error, lzma.LZMAError) as e:
+            # UnicodeDecodeError is a ValueError
+            LOGGER.error(f"Cannot decode message content with encoding {encoding}! {e}")
+            METRICS.increment("compression.decode_errors")
+            return UNDECODABLE_CONTENT
+
+    def _decode(self, value: Union[str, bytes], encoding: Optional[str]) -> str:
+        """
+        Decodes stored message content.
+
+        Args:
+            value (str | bytes): Stored value.
+            encoding (str): Encoding recorded with the value.
+
+        Returns:
+            str: Message content.
+
+        Raises:
+            ValueError: If the encoding (or its preset dictionary) is unknown.
+        """
+        if encoding is None:
+            return value
+        if encoding == "lzma":
+            return lzma.decompress(value).decode("utf-8")
+        if encoding == "zlib":
+            return zlib.decompress(value).decode("utf-8")
+        if encoding in self._dictionaries:
+            decompressor = zlib.decompressobj(zdict=self._dictionaries[encoding])
+            data = decompressor.decompress(value) + decompressor.flush()
+            return data.decode("utf-8")
+
+        raise ValueError(f"Unknown encoding or preset dictionary: {encoding}")
+
+
+@functools.lru_cache(maxsize=None)
+def _create_codec(
+    codec: str, level: int, dictionary_paths: Tuple[str, ...], min_size: int
+) -> ContentCodec:
+    """
+    Creates a codec, reading its preset dictionaries from disk. Results are cached so
+    dictionaries are only read once per worker. A missing retired dictionary is
+    logged, only its rows are then unreadable.
+
+    Args:
+        codec (str): "zlib", "lzma" or None.
+        level (int): Compression level.
+        dictionary_paths (tuple):
+            Paths of the zlib preset dictionaries, the one for new contents first.
+        min_size (int): Minimum content size to compress.
+
+    Returns:
+        ContentCodec: Codec for the given settings.
+    """
+    dictionaries = []
+    for i, path in enumerate(dictionary_paths):
+        try:
+            with open(path, "rb") as f:
+                dictionaries.append(f.read(MAX_DICTIONARY_SIZE))
+        except FileNotFoundError:
+            # New contents must never be written without their dictionary
+            if i == 0:
+                raise
+            LOGGER.error(f"Retired chat compression dictionary {path} is missing!")
+
+    return ContentCodec(codec, level, dictionaries, min_size)
+
+
+def get_codec(config: Mapping) -> ContentCodec:
+    """
+    Returns the codec for the CHAT_COMPRESSION_* settings of the configuration.
+
+    Args:
+        config (Mapping): Application configuration (usually current_app.config).
+
+    Returns:
+        ContentCodec: Codec for the configuration.
+    """
+    return _create_codec(
+        config["CHAT_COMPRESSION"],
+        config["CHAT_COMPRESSION_LEVEL"],
+        tuple(config["CHAT_COMPRESSION_DICTIONARIES"]),
+        config["CHAT_COMPRESSION_MIN_SIZE"],
+    )
+
+
+def build_dictionary(samples: Iterable[str], size: int = MAX_DICTIONARY_SIZE) -> bytes:
+    """
+    Builds a zlib preset dictionary from sample message contents. zlib matches the
+    end of the dictionary most cheaply and the beginning is cut off if the samples
+    are too large, so the most representative samples should come last.
+
+    Args:
+        samples (Iterable[str]): Sample message contents.
+        size (int): Maximum dictionary size in bytes.
+
+    Returns:
+        bytes: Preset dictionary.
+    """
+    dictionary = b"\n".join(sample.encode("utf-8") for sample in samples)
+    return dictionary[-size:]
@@ -24,7 +24,253 @@ class Config(object):
     SECRET_KEY = os.environ.get("SECRET_KEY") or "default_flask_secret"
     JWT_SECRET_KEY = os.environ.get("JWT_SECRET_KEY") or "default_jwt_secret"
     DATABASE = os.environ.get("DATABASE_PATH") or "instance/imposter.sqlite"
+    # Chat shard databases (comma separated paths). Chats are routed to a shard by
+    # hashing the user id while users and personalities stay in DATABASE. Without
+    # shards, chats are stored in DATABASE as well. Use ManageChatShards.py to
+    # rebalance stored chats before changing the list.
+    CHAT_SHARDS = [
+        path for path in (os.environ.get("CHAT_SHARDS") or "").split(",") if path
+    ]
     JWT_EXPIRATION_DELTA = datetime.timedelta(days=7)
+    # Seconds a worker caches the users of authenticated requests (0 disables the
+    # cache, so every request checks its user in the database). Deleted users keep
+    # access for up to that long.
+    AUTH_USER_CACHE_TTL = float(os.environ.get("AUTH_USER_CACHE_TTL") or 0)
+    AUTH_USER_CACHE_SIZE = 10000
+
+    # Password hashing (see backend/password_hasher.py). PASSWORD_HASH_METHOD is a
+    # werkzeug method with its cost, stored hashes of other methods are replaced on
+    # login. Every web worker hashes on PASSWORD_HASH_WORKERS processes (0 hashes on
+    # the request thread, and with SERVER_THREADPOOL hashes run on gevent's
+    # threadpool instead), with at most PASSWORD_HASH_CONCURRENCY hashes queued or
+    # running. Requests waiting longer than PASSWORD_HASH_WAIT seconds for a slot
+    # are rejected with status 503.
+    PASSWORD_HASH_METHOD = (
+        os.environ.get("PASSWORD_HASH_METHOD") or "pbkdf2:sha256:600000"
+    )
+    PASSWORD_HASH_WORKERS = int(os.environ.get("PASSWORD_HASH_WORKERS") or 1)
+    PASSWORD_HASH_CONCURRENCY = int(os.environ.get("PASSWORD_HASH_CONCURRENCY") or 4)
+    PASSWORD_HASH_WAIT = float(os.environ.get("PASSWORD_HASH_WAIT") or 10)
+
+    # Token of the worker metrics endpoint (/backend/metrics), which requires
+    # "Authorization: Bearer <METRICS_TOKEN>". Without a token it is disabled.
+    METRICS_TOKEN = os.environ.get("METRICS_TOKEN") or None
+
+    # Static files (see backend/static_files.py). Files whose path matches
+    # STATIC_IMMUTABLE_PATTERN (content-hashed build output) are cached by browsers
+    # for a year, others for STATIC_MAX_AGE seconds (0 revalidates them on every
+    # use). Files are kept in memory by every worker unless STATIC_MEMORY_CACHE=0.
+    # compress-static-files skips files smaller than STATIC_COMPRESS_MIN_SIZE bytes.
+    STATIC_IMMUTABLE_PATTERN = r"^static/.*\.[0-9a-f]{8,}\."
+    STATIC_MAX_AGE = int(os.environ.get("STATIC_MAX_AGE") or 0)
+    STATIC_MEMORY_CACHE = os.environ.get("STATIC_MEMORY_CACHE") != "0"
+    STATIC_COMPRESS_MIN_SIZE = 256
+
+    # SQLite connection tuning applied to every pooled connection
+    SQLITE_JOURNAL_MODE = os.environ.get("SQLITE_JOURNAL_MODE") or "WAL"
+    SQLITE_SYNCHRONOUS = os.environ.get("SQLITE_SYNCHRONOUS") or "NORMAL"
+    SQLITE_MMAP_SIZE = int(os.environ.get("SQLITE_MMAP_SIZE") or 64 * 1024 * 1024)
+    # Negative cache sizes are in KiB, positive ones in pages
+    SQLITE_CACHE_SIZE = int(os.environ.get("SQLITE_CACHE_SIZE") or -16 * 1024)
+    # Seconds to wait for a lock held by another connection before failing
+    SQLITE_BUSY_TIMEOUT = float(os.environ.get("SQLITE_BUSY_TIMEOUT") or 5.0)
+    # Share idle connections between the threads of a worker instead of keeping one
+    # per thread (set by gunicorn.conf.py for gevent workers)
+    SQLITE_SHARED_POOL = os.environ.get("SQLITE_SHARED_POOL") == "1"
+    # Run SQLite statements and password hashes on gevent's threadpool, so waiting
+    # for them does not block the other greenlets of a worker (set by
+    # gunicorn.conf.py for gevent workers, requires gevent). Not named GEVENT_*, as
+    # gevent reads those variables as its own settings.
+    SERVER_THREADPOOL = os.environ.get("SERVER_THREADPOOL") == "1"
+
+    # Compression of stored message contents: None (plain text), "zlib" or "lzma".
+    # The first zlib preset dictionary is used for new messages, all of them are
+    # needed to read messages written with them. Retired dictionaries must stay
+    # listed after the new one and their files must never be deleted.
+    CHAT_COMPRESSION = os.environ.get("CHAT_COMPRESSION") or None
+    CHAT_COMPRESSION_LEVEL = 6
+    CHAT_COMPRESSION_MIN_SIZE = 128
+    CHAT_COMPRESSION_DICTIONARIES = [
+        path
+        for path in (os.environ.get("CHAT_COMPRESSION_DICTIONARIES") or "").split(",")
+        if path
+    ]
+
+    # Group commit of chat writes. When enabled, chat writes of concurrent requests
+    # in a worker are committed together by a background writer every
+    # CHAT_WRITE_BATCH_WINDOW seconds, with one sync per batch. Only useful with
+    # concurrent (gevent or threaded) workers: gunicorn.conf.py enables it for
+    # gevent workers and disables it for sync workers.
+    CHAT_WRITE_BATCHING = os.environ.get("CHAT_WRITE_BATCHING") == "1"
+    CHAT_WRITE_BATCH_WINDOW = 0.005
+    CHAT_WRITE_BATCH_MAX = 64
+    CHAT_WRITE_BATCH_SYNCHRONOUS = "FULL"
+    # Seconds a write may wait for the writer before it is cancelled
+    CHAT_WRITE_BATCH_TIMEOUT = 10.0
+
+    # Model answering user messages. MODEL_CLIENT selects the client: "openai"
+    # (openai package), "aiohttp" (opt-in, one pooled, keep-alive HTTP client per
+    # worker) or "fake" (local fake model configured by FAKE_MODEL_*, for
+    # benchmarks).
+    MODEL_CLIENT = os.environ.get("MODEL_CLIENT") or "openai"
+    MODEL_ID = os.environ.get("MODEL_ID") or "gpt-4"
+    OPENAI_API_BASE = os.environ.get("OPENAI_API_BASE") or "https://api.openai.com/v1"
+    # Context size (in tokens) of the supported models, and tokens of it reserved for
+    # the response. Requests only include the most recent messages that fit, as
+    # selected by CONTEXT_TRUNCATION_POLICY ("recent", "intro_and_recent", "none").
+    MODEL_CONTEXT_TOKENS = {
+        "gpt-4": 8192,
+        "gpt-4-32k": 32768,
+        "gpt-3.5-turbo": 4096,
+        "gpt-3.5-turbo-16k": 16384,
+    }
+    MODEL_RESPONSE_TOKENS = 1024
+    CONTEXT_TRUNCATION_POLICY = os.environ.get("CONTEXT_TRUNCATION_POLICY") or "recent"
+    # Rolling summaries of long conversations. When enabled, messages older than the
+    # SUMMARY_KEEP_MESSAGES most recent ones are folded into a stored summary in the
+    # background (once SUMMARY_BATCH_MESSAGES of them accumulated) and sent to the
+    # model in their place.
+    CHAT_SUMMARIES = os.environ.get("CHAT_SUMMARIES") == "1"
+    SUMMARY_KEEP_MESSAGES = 20
+    SUMMARY_BATCH_MESSAGES = 10
+    SUMMARY_MAX_WORDS = 200
+    SUMMARY_WORKERS = 2
+    # Resilience of model requests. Retryable errors are retried up to MODEL_RETRIES
+    # times (None disables the resilience layer) with jittered exponential backoff,
+    # all within MODEL_REQUEST_DEADLINE seconds. After MODEL_CIRCUIT_FAILURES
+    # consecutive upstream failures requests fail fast for MODEL_CIRCUIT_RESET
+    # seconds. With MODEL_HEDGING, a duplicate request is sent when a request takes
+    # longer than the MODEL_HEDGE_PERCENTILE latency of recent requests. Attempts
+    # run on MODEL_REQUEST_WORKERS threads per worker and time out at the deadline,
+    # which must stay below the worker timeout (SERVER_TIMEOUT in gunicorn.conf.py).
+    MODEL_RETRIES = 3
+    MODEL_RETRY_BASE_DELAY = 0.5
+    MODEL_RETRY_MAX_DELAY = 8.0
+    MODEL_REQUEST_DEADLINE = 90.0
+    MODEL_CIRCUIT_FAILURES = 5
+    MODEL_CIRCUIT_RESET = 30.0
+    MODEL_HEDGING = os.environ.get("MODEL_HEDGING") == "1"
+    MODEL_HEDGE_MIN_DELAY = 2.0
+    MODEL_HEDGE_PERCENTILE = 95
+    MODEL_REQUEST_WORKERS = 32
+
+    # Fallback chain of models (comma separated ids) tried after MODEL_ID. With
+    # fallbacks, every request is routed to the first model that fits the prompt,
+    # preferring the model listed for the personality in MODEL_ROUTE_PREFERENCES
+    # (comma separated personality_id:model_id pairs) and trying models last whose
+    # recent error rate exceeds MODEL_ROUTE_MAX_ERROR_RATE or whose recent p95
+    # latency exceeds MODEL_ROUTE_LATENCY_TARGET seconds. Every model but the last
+    # gives up after MODEL_ROUTE_DEADLINE seconds, and the whole chain after
+    # MODEL_REQUEST_DEADLINE seconds.
+    MODEL_FALLBACKS = [
+        model_id
+        for model_id in (os.environ.get("MODEL_FALLBACKS") or "").split(",")
+        if model_id
+    ]
+    MODEL_ROUTE_PREFERENCES = {
+        int(personality_id): model_id
+        for personality_id, model_id in (
+            preference.split(":", 1)
+            for preference in (os.environ.get("MODEL_ROUTE_PREFERENCES") or "").split(
+                ","
+            )
+            if preference
+        )
+    }
+    MODEL_ROUTE_DEADLINE = 30.0
+    MODEL_ROUTE_LATENCY_TARGET = 20.0
+    MODEL_ROUTE_MAX_ERROR_RATE = 0.5
+
+    # Rate limits of the shared API key, enforced across workers with token buckets
+    # stored in RATE_LIMIT_PATH. Unset limits are not enforced. Waiting requests
+    # are served round-robin per user and rejected after RATE_LIMIT_MAX_WAIT
+    # seconds.
+    RATE_LIMIT_REQUESTS_PER_MINUTE = int(
+        os.environ.get("RATE_LIMIT_REQUESTS_PER_MINUTE") or 0
+    )
+    RATE_LIMIT_TOKENS_PER_MINUTE = int(
+        os.environ.get("RATE_LIMIT_TOKENS_PER_MINUTE") or 0
+    )
+    RATE_LIMIT_PATH = os.environ.get("RATE_LIMIT_PATH") or "instance/rate_limit.sqlite"
+    RATE_LIMIT_MAX_WAIT = 30.0
+
+    # Exact-match cache of model responses: None (disabled), "memory" (per worker) or
+    # "sqlite" (RESPONSE_CACHE_PATH, shared by workers). Only requests to the
+    # personalities listed in RESPONSE_CACHE_PERSONALITIES (comma separated ids)
+    # are cached.
+    RESPONSE_CACHE = os.environ.get("RESPONSE_CACHE") or None
+    RESPONSE_CACHE_PATH = (
+        os.environ.get("RESPONSE_CACHE_PATH") or "instance/response_cache.sqlite"
+    )
+    RESPONSE_CACHE_PERSONALITIES = [
+        int(personality_id)
+        for personality_id in (
+            os.environ.get("RESPONSE_CACHE_PERSONALITIES") or ""
+        ).split(",")
+        if personality_id
+    ]
+    RESPONSE_CACHE_MAX_ENTRIES = 10000
+    # Seconds until a cached response expires
+    RESPONSE_CACHE_TTL = 24 * 60 * 60
+
+    # Idempotency keys of sent messages (Idempotency-Key header), stored in
+    # IDEMPOTENCY_PATH and shared by workers. Responses are replayed to duplicates for
+    # IDEMPOTENCY_TTL seconds. Duplicates of a message in flight wait for its
+    # response up to IDEMPOTENCY_WAIT seconds, checking other workers' requests every
+    # IDEMPOTENCY_POLL_INTERVAL seconds.
+    IDEMPOTENCY_PATH = (
+        os.environ.get("IDEMPOTENCY_PATH") or "instance/idempotency.sqlite"
+    )
+    IDEMPOTENCY_TTL = 24 * 60 * 60
+    IDEMPOTENCY_WAIT = 120.0
+    IDEMPOTENCY_POLL_INTERVAL = 0.1
+
+    # Background generation of replies. With MESSAGE_JOBS, sent messages are stored
+    # and answered with the id of a job queued in JOB_QUEUE_PATH, which the job
+    # workers (flask --app app run-job-workers, JOB_WORKERS threads) run. A job is
+    # leased to its worker for JOB_LEASE seconds and claimed again after its
+    # worker died, up to JOB_MAX_ATTEMPTS times. Results are kept JOB_RESULT_TTL
+    # seconds. Subscriptions to a job send a comment every JOB_HEARTBEAT_INTERVAL
+    # seconds while waiting and end with a timeout event after JOB_SUBSCRIBE_TIMEOUT
+    # seconds (below the worker timeout), after which clients subscribe again.
+    MESSAGE_JOBS = os.environ.get("MESSAGE_JOBS") == "1"
+    JOB_QUEUE_PATH = os.environ.get("JOB_QUEUE_PATH") or "instance/job_queue.sqlite"
+    JOB_WORKERS = int(os.environ.get("JOB_WORKERS") or 8)
+    JOB_LEASE = 300.0
+    JOB_MAX_ATTEMPTS = 3
+    JOB_POLL_INTERVAL = 0.5
+    JOB_RESULT_TTL = 24 * 60 * 60
+    JOB_HEARTBEAT_INTERVAL = 15.0
+    JOB_SUBSCRIBE_TIMEOUT = MODEL_REQUEST_DEADLINE + 10.0
+
+    # Connection pool and timeouts (in seconds) of the aiohttp client
+    MODEL_HTTP_MAX_CONNECTIONS = 100
+    MODEL_HTTP_KEEPALIVE_TIMEOUT = 60.0
+    MODEL_HTTP_CONNECT_TIMEOUT = 10.0
+    MODEL_HTTP_TIMEOUT = 120.0
+
+    # Fake model (MODEL_CLIENT = "fake" and FakeModelServer.py). Replies are
+    # rendered from FAKE_MODEL_REPLY ({message}, {messages}, {personality_id}) after
+    # a FAKE_MODEL_LATENCY delay ("none", "fixed:<s>", "uniform:<min>:<max>",
+    # "normal:<mean>:<std>" or "lognormal:<median>:<sigma>"). A share of
+    # FAKE_MODEL_ERROR_RATE requests fails and requests beyond
+    # FAKE_MODEL_REQUESTS_PER_MINUTE (0 = unlimited) are rate limited.
+    FAKE_MODEL_REPLY = os.environ.get("FAKE_MODEL_REPLY") or "Fake reply to: {message}"
+    FAKE_MODEL_LATENCY = os.environ.get("FAKE_MODEL_LATENCY") or "none"
+    FAKE_MODEL_CHUNK_DELAY = float(os.environ.get("FAKE_MODEL_CHUNK_DELAY") or 0.0)
+    FAKE_MODEL_ERROR_RATE = float(os.environ.get("FAKE_MODEL_ERROR_RATE") or 0.0)
+    FAKE_MODEL_REQUESTS_PER_MINUTE = int(
+        os.environ.get("FAKE_MODEL_REQUESTS_PER_MINUTE") or 0
+    )
+    FAKE_MODEL_SEED = (
+        int(os.environ["FAKE_MODEL_SEED"])
+        if os.environ.get("FAKE_MODEL_SEED")
+        else None
+    )
+
+    # Number of messages returned per page of chat history
+    CHAT_HISTORY_PAGE_SIZE = 50
+    CHAT_HISTORY_MAX_PAGE_SIZE = 200
 
 
 class DevelopmentConfig(Config):
@@ -0,0 +1,194 @@
+"""
+context_window.py
+
+Author: Christian Welling
+Date: 10/18/2026
+Company: ImposterAI
+Contact: csw73@cornell.edu
+
+Token-budgeted context windows for model requests.
+
+Instead of sending every message of a conversation on every turn, the context
+window keeps the system message and as many messages as fit into the model's
+context (minus the tokens reserved for the response). Which messages are kept is
+decided by a truncation policy, see TRUNCATION_POLICIES.
+
+Policies receive the conversation's messages together with the running totals of
+their token counts, which conversations cache and only extend for new messages, and
+the index of the first message not folded into the conversation's summary. Only
+later messages are candidates, but a policy may still anchor on an earlier one
+(like the personality's intro message).
+"""
+# region Imports
+import bisect
+from typing import Callable, Dict, List, Mapping
+
+# endregion
+
+# region Backend Imports
+from backend.utils import estimate_tokens
+
+# endregion
+
+# Tokens used by the chat format around every message (role, separators)
+MESSAGE_OVERHEAD_TOKENS = 4
+
+# Context size of models missing from MODEL_CONTEXT_TOKENS
+DEFAULT_CONTEXT_TOKENS = 4096
+
+
+def count_message_tokens(message: dict) -> int:
+    """
+    Estimates the number of tokens a message takes up in a model request.
+
+    Args:
+        message (dict): Message dictionary ({"role":, "content":}).
+
+    Returns:
+        int: Estimated token count including the chat format overhead.
+    """
+    return estimate_tokens(message["content"]) + MESSAGE_OVERHEAD_TOKENS
+
+
+# region Truncation Policies
+def _recent_start(token_totals: List[int], budget: int, first: int = 0) -> int:
+    """
+    Finds the first message of the longest run of most recent messages that fits
+    into the budget. The last message is always included.
+
+    Args:
+        token_totals (List[int]):
+            Running token totals, token_totals[i + 1] - token_totals[i] being the
+            tokens of message i.
+        budget (int): Token budget for the messages.
+        first (int): Index of the first message that may be included.
+
+    Returns:
+        int: Index of the first included message.
+    """
+    last = len(token_totals) - 2
+    start = bisect.bisect_left(token_totals, token_totals[-1] - budget, lo=first)
+    return max(first, min(start, last))
+
+
+def keep_recent(
+    messages: list, token_totals: List[int], budget: int, first: int = 0
+) -> list:
+    """
+    Keeps the most recent messages that fit into the budget.
+
+    Args:
+        messages (list): Messages of the conversation.
+        token_totals (List[int]): Running token totals of the messages.
+        budget (int): Token budget for the messages.
+        first (int): Index of the first message not folded into the summary.
+
+    Returns:
+        list: Kept messages in chronological order.
+    """
+    if len(messages) <= first:
+        return []
+    return messages[_recent_start(token_totals, budget, first) :]
+
+
+def keep_intro_and_recent(
+    messages: list, token_totals: List[int], budget: int, first: int = 0
+) -> list:
+    """
+    Keeps the personality's intro message (the first message of the conversation,
+    which sets its tone) and the most recent messages that fit next to it. The
+    intro is kept even after it was folded into the summary.
+
+    Args:
+        messages (list): Messages of the conversation.
+        token_totals (List[int]): Running token totals of the messages.
+        budget (int): Token budget for the messages.
+        first (int): Index of the first message not folded into the summary.
+
+    Returns:
+        list: Kept messages in chronological order.
+    """
+    first = max(first, 1)
+    if len(messages) <= first:
+        return list(messages[:1])
+    intro_tokens = token_totals[1] - token_totals[0]
+    start = _recent_start(token_totals, budget - intro_tokens, first)
+    return messages[:1] + messages[start:]
+
+
+def keep_all(
+    messages: list, token_totals: List[int], budget: int, first: int = 0
+) -> list:
+    """
+    Keeps every message not folded into the summary regardless of the budget.
+
+    Args:
+        messages (list): Messages of the conversation.
+        token_totals (List[int]): Running token totals of the messages.
+        budget (int): Token budget for the messages (ignored).
+        first (int): Index of the first message not folded into the summary.
+
+    Returns:
+        list: All messages not folded into the summary.
+    """
+    return messages[first:]
+
+
+# Available truncation policies by name (see CONTEXT_TRUNCATION_POLICY). Additional
+# policies take the same arguments and return the kept messages.
+TRUNCATION_POLICIES: Dict[str, Callable[[list, List[int], int, int], list]] = {
+    "recent": keep_recent,
+    "intro_and_recent": keep_intro_and_recent,
+    "none": keep_all,
+}
+
+# endregion
+
+
+class ContextWindow:
+    def __init__(
+        self, max_tokens: int, response_tokens: int = 0, policy: str = "recent"
+    ) -> None:
+        """
+        Builds the messages sent to the model within a token budget.
+
+        Args:
+            max_tokens (int): Context size of the model in tokens.
+            response_tokens (int): Tokens reserved for the model's response.
+            policy (str): Name of the truncation policy in TRUNCATION_POLICIES.
+        """
+        if policy not in TRUNCATION_POLICIES:
+            raise ValueError(f"Unknown context truncation policy: {policy}")
+
+        self._budget: int = max_tokens - response_tokens
+        self._policy = TRUNCATION_POLICIES[policy]
+
+    def export(self, conversation) -> list:
+        """
+        Exports a conversation into the input of a model request, keeping the system
+        message and the messages selected by the truncation policy.
+
+        Args:
+            conversation (Conversation): Conversation to export.
+
+        Returns:
+            list: Message dictionaries in sequential order.
+        """
+        return conversation.export_context_window(self._budget, self._policy)
+
+
+def get_context_window(config: Mapping) -> ContextWindow:
+    """
+    Creates the context window for the model of the configuration.
+
+    Args:
+        config (Mapping): Application configuration (usually current_app.config).
+
+    Returns:
+        ContextWindow: Context window for the configured model and policy.
+    """
+    return ContextWindow(
+        config["MODEL_CONTEXT_TOKENS"].get(config["MODEL_ID"], DEFAULT_CONTEXT_TOKENS),
+        config["MODEL_RESPONSE_TOKENS"],
+        config["CONTEXT_TRUNCATION_POLICY"],
+    )
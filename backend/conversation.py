@@ -15,6 +15,12 @@ Conversation will store the following:
     personality image path
 """
 
+# region Backend Imports
+from backend.context_window import count_message_tokens
+from backend.utils import compile_system_prompt
+
+# endregion
+
 
 class Conversation:
     def __init__(
@@ -24,6 +30,11 @@ class Conversation:
         message_log: list = [],
         system_prompt_list: list = [],
         img: str = "",
+        saved_count: int = 0,
+        system_message: dict = None,
+        system_tokens: int = 0,
+        summary: str = None,
+        summary_count: int = 0,
     ):
         """
         Store and provide access to single conversation between user and personality.
@@ -54,18 +65,37 @@ class Conversation:
                 'user' and 'assistant'
             system_prompt_list (list): List of strings (str) containing system prompts
             img (str): Path to personality image in backend assets
+            saved_count (int):
+                Number of leading messages in message_log that are already stored in
+                the database
+            system_message (dict):
+                Precompiled system message joining system_prompt_list, if available.
+                It is shared and never modified by the conversation.
+            system_tokens (int): Token count of the precompiled system message
+            summary (str):
+                Running summary of the oldest messages, sent to the model in their
+                place
+            summary_count (int): Number of leading messages folded into the summary
         """
         self._id: str = id
         self._name: str = name
         self._message_log: list = message_log
         self._system_prompt_list: list = system_prompt_list
         self._img: str = img
+        self._saved_count: int = saved_count
+        self._system_message: dict = system_message
+        self._system_tokens: int = system_tokens
+        self._summary: str = summary
+        self._summary_count: int = summary_count if summary else 0
+        # Running token totals of message_log, extended as messages are added
+        self._token_totals: list = [0]
 
     def export_saved_messages(self) -> list:
         """
         Exports conversation into acceptable input format for model API request.
 
         Will presume that every item in the system prompt array list is a sentence.
+        The system message is compiled at most once and reused by later exports.
 
         Returns:
             List of dictionaries containing system prompt and messages in sequential
@@ -74,14 +104,11 @@ class Conversation:
         message_export = []
 
         # Create system message from system prompt list if exists
-        if self._system_prompt_list:
-            sys_prompt = {"role": "system", "content": ""}
-            for prompt in self._system_prompt_list:
-                if sys_prompt["content"] != "":
-                    sys_prompt["content"] = sys_prompt["content"] + " "
-                sys_prompt["content"] = sys_prompt["content"] + prompt
+        if self._system_message is None and self._system_prompt_list:
+            self._system_message, self._system_tokens = self._compile_system_message()
 
-            message_export.append(sys_prompt)
+        if self._system_message is not None:
+            message_export.append(self._system_message)
 
         # Add messages from message_log to export if exist and return
         if self._message_log is None:
@@ -90,6 +117,60 @@ class Conversation:
         else:
             return message_export + self._message_log
 
+    def export_context_window(self, budget: int, policy) -> list:
+        """
+        Exports conversation into model API input that fits into a token budget. The
+        system message and the summary of older messages (as a second system
+        message) are always included, the policy selects which of the remaining
+        messages fill the rest of the budget.
+
+        Arguments:
+            budget (int): Token budget for the system messages and messages.
+            policy (Callable):
+                Truncation policy (see context_window.TRUNCATION_POLICIES) called
+                with the messages, their running token totals, the budget left
+                after the system messages and the index of the first message not
+                folded into the summary.
+
+        Returns:
+            List of dictionaries containing system prompt, summary and selected
+            messages in sequential order.
+        """
+        message_export = []
+        budget -= self.get_system_tokens()
+        if self._system_message is not None:
+            message_export.append(self._system_message)
+
+        if self._summary:
+            summary_message = {
+                "role": "system",
+                "content": f"Summary of the earlier conversation: {self._summary}",
+            }
+            budget -= count_message_tokens(summary_message)
+            message_export.append(summary_message)
+
+        # Messages folded into the summary are only sent again if the policy
+        # anchors on them (like the intro message)
+        return message_export + policy(
+            self._message_log, self.get_token_totals(), budget, self._summary_count
+        )
+
+    def get_token_totals(self) -> list:
+        """
+        Retrieves the running token totals of the message_log list, counting only
+        messages added since the last call.
+
+        Returns:
+            list: Token totals where element i is the token count of the first i
+            messages, so it has one more element than the message_log list.
+        """
+        for message in self._message_log[len(self._token_totals) - 1 :]:
+            self._token_totals.append(
+                self._token_totals[-1] + count_message_tokens(message)
+            )
+
+        return self._token_totals
+
     def add_user_message(self, user_message: str) -> None:
         """
         Appends a user message to the message_log list.
@@ -110,6 +191,20 @@ class Conversation:
         # Append a system message into the system prompt list
         self._system_prompt_list.append(system_message)
 
+        # Precompiled system message is outdated and rebuilt on next export
+        self._system_message = None
+        self._system_tokens = 0
+
+    def _compile_system_message(self) -> (dict, int):
+        """
+        Joins the system prompt list into a single system message.
+
+        Returns:
+            tuple: System message dictionary and its token count.
+        """
+        content, tokens = compile_system_prompt(self._system_prompt_list)
+        return {"role": "system", "content": content}, tokens
+
     def add_assistant_message(self, assistant_message: str) -> None:
         """
         Appends an assistant message to the message_log list.
@@ -130,6 +225,41 @@ class Conversation:
         # Return the entire message log
         return self._message_log
 
+    def get_unsaved_messages(self) -> list:
+        """
+        Fetches the messages added since the conversation was last stored.
+
+        Returns:
+            list: Messages in the message_log list not yet stored in the database.
+        """
+        return self._message_log[self._saved_count :]
+
+    def get_saved_count(self) -> int:
+        """
+        Fetches the number of messages already stored in the database.
+
+        Returns:
+            int: Number of stored messages, which is also the sequence number of the
+            first unsaved message.
+        """
+        return self._saved_count
+
+    def mark_saved(self) -> None:
+        """
+        Marks every message in the message_log list as stored in the database.
+        """
+        self._saved_count = len(self._message_log)
+
+    def get_summary(self) -> (str, int):
+        """
+        Retrieves the running summary of the oldest messages.
+
+        Returns:
+            tuple: The summary (None if there is none) and the number of leading
+            messages in the message_log list folded into it.
+        """
+        return self._summary, self._summary_count
+
     def get_system_prompt(self) -> list:
         """
         Retrieves all system prompts from the system_prompt_list.
@@ -140,6 +270,18 @@ class Conversation:
         # Return the entire system prompt list
         return self._system_prompt_list
 
+    def get_system_tokens(self) -> int:
+        """
+        Retrieves the token count of the system message.
+
+        Returns:
+            int: Returns the token count of the system message, 0 if there is none.
+        """
+        if self._system_message is None and self._system_prompt_list:
+            self._system_message, self._system_tokens = self._compile_system_message()
+
+        return self._system_tokens
+
     def get_personality_name(self) -> str:
         """
         Fetches the personality name of the assistant.
@@ -11,42 +11,53 @@ Class for managing database usage.
 
 # region General/API Imports
 from sqlite3 import Connection
+from flask import current_app, g
 
 # endregion
 
 # region Backend Imports
-from backend.db import get_db
-from backend.utils import serialize_json, deserialize_json
+from backend.compression import get_codec
+from backend.chat_persister import get_persister
+from backend.db import get_chat_db, get_chat_db_path, get_db
+from backend.personality_cache import (
+    PERSONALITY_CACHE,
+    Personality,
+    bump_personality_generation,
+)
+from backend.utils import compile_system_prompt, serialize_json
 from backend.logger import LOGGER
 
 # endregion
 
+# Upper bound for message sequence numbers (largest SQLite integer)
+MAX_SEQ = 2**63 - 1
+
 
 class DatabaseManager:
     @staticmethod
     def get_all_personalities() -> list:
         """
-        Fetches all personalities from the database as a list of tuples.
+        Fetches all personalities from the personality cache as a list of tuples.
 
         Returns:
             list: A list of tuples where each tuple contains the following information
             for each personality, (ID, name, image file name, introduction message).
-            Will return None if no personalities are found in the database.
+            Will return an empty list if no personalities are found in the database.
         """
 
-        # Connect to the database
-        db: Connection = get_db()
-
-        # Execute SQL command to fetch all personalities from personalities table
-        personality_list = db.execute(
-            """
-            SELECT ID, NAME, IMAGE_PATH, INTRO_MESSAGE
-            FROM personalities
-            """
-        ).fetchall()
+        # Read parsed personalities from the worker cache
+        personalities = PERSONALITY_CACHE.get_personalities(get_db())
 
-        # Return the fetched list
-        return personality_list
+        # Return the list in the same format as the personalities table
+        return [
+            (
+                personality.id,
+                personality.name,
+                personality.image_path,
+                personality.intro_message,
+            )
+            for personality in personalities.values()
+        ]
 
     @staticmethod
     def get_chat_list(user_id: int) -> list:
@@ -60,32 +71,81 @@ class DatabaseManager:
         Returns:
             list: A list of tuples, where each tuple contains
             (Personality ID, Personality Name).
-            Will return None if no chat records found for the given user_id.
+            Will return an empty list if no chat records found for the given user_id.
         """
 
-        # Connect to the database
-        db: Connection = get_db()
+        # Connect to the user's chat database
+        db: Connection = get_chat_db(user_id)
 
         # Execute SQL command to fetch chat details corresponding to the user_id.
-        # Joining chats and personalities table to get the personality name.
-        personality_list = db.execute(
+        # Chats may live in a shard without personalities, so names are taken from
+        # the personality cache.
+        chat_rows = db.execute(
             """
-            SELECT chats.PERSONALITY_ID, personalities.NAME
+            SELECT PERSONALITY_ID
             FROM chats
-            JOIN personalities ON chats.PERSONALITY_ID = personalities.ID
-            WHERE chats.USER_ID = ?
+            WHERE USER_ID = ?
             """,
             (user_id,),
         ).fetchall()
+        personalities = PERSONALITY_CACHE.get_personalities(get_db())
 
-        # Return the fetched list
-        return personality_list
+        # Return the list of chats with known personalities
+        return [
+            (personality_id, personalities[personality_id].name)
+            for personality_id, in chat_rows
+            if personality_id in personalities
+        ]
+
+    @staticmethod
+    def get_contact_list(user_id: int) -> list:
+        """
+        Fetches every personality together with the preview of the user's
+        conversation with it. Personalities come from the personality cache, so only a
+        single query on the user's chat database is needed.
+
+        Args:
+            user_id (int): The ID of the user for whom to fetch contacts.
+
+        Returns:
+            list: A list of tuples where each tuple contains the following information
+            for each personality, (ID, name, image file name, last message,
+            last message timestamp, message count). Personalities without a
+            conversation use their introduction message as last message, no timestamp
+            and a message count of 0.
+        """
+
+        # Connect to the user's chat database
+        db: Connection = get_chat_db(user_id)
+
+        # Execute SQL command to fetch the user's conversation previews
+        preview_rows = db.execute(
+            """
+            SELECT PERSONALITY_ID, LAST_MESSAGE, LAST_MESSAGE_AT, MESSAGE_COUNT
+            FROM chats
+            WHERE USER_ID = ?
+            """,
+            (user_id,),
+        ).fetchall()
+        previews = {row[0]: tuple(row[1:]) for row in preview_rows}
+
+        # Join personalities with previews, falling back to the intro message
+        personalities = PERSONALITY_CACHE.get_personalities(get_db())
+        return [
+            (
+                personality.id,
+                personality.name,
+                personality.image_path,
+                *previews.get(personality.id, (personality.intro_message, None, 0)),
+            )
+            for personality in personalities.values()
+        ]
 
     @staticmethod
     def get_chat_from_id(user_id: int, personality_id: int):
         """
-        Fetches and deserializes the messages associated with the given user ID
-        and personality ID.
+        Fetches the messages associated with the given user ID and personality ID, in
+        the order they were sent. Compressed contents are decoded transparently.
 
         Args:
             user_id (int): The ID of the user for whom to fetch message details.
@@ -93,31 +153,141 @@ class DatabaseManager:
                 The ID of the personality related to the chat messages.
 
         Returns:
-            Deserialized JSON object (message list) if found, else None.
+            List of message dictionaries ({"role":, "content":}) if found, else None.
         """
 
-        # Connect to the database
-        db: Connection = get_db()
+        # Connect to the user's chat database
+        db: Connection = get_chat_db(user_id)
 
         # Execute SQL command to fetch messages corresponding to the user_id
-        # and personality_id from the chats table
-        messages = db.execute(
+        # and personality_id from the messages table
+        message_rows = db.execute(
             """
-            SELECT MESSAGES
+            SELECT ROLE, CONTENT, ENCODING
+            FROM messages
+            WHERE USER_ID = ? AND PERSONALITY_ID = ?
+            ORDER BY SEQ
+            """,
+            (user_id, personality_id),
+        ).fetchall()
+
+        # Return rebuilt message list if found, else return None
+        if not message_rows:
+            return None
+
+        codec = get_codec(current_app.config)
+        return [
+            {"role": role, "content": codec.decode(content, encoding)}
+            for role, content, encoding in message_rows
+        ]
+
+    @staticmethod
+    def get_chat_summary(user_id: int, personality_id: int) -> tuple:
+        """
+        Fetches the running summary of a conversation's older messages.
+
+        Args:
+            user_id (int): The ID of the user involved in the chat.
+            personality_id (int): The ID of the personality involved in the chat.
+
+        Returns:
+            tuple: The summary (None if there is none) and the number of leading
+            messages folded into it.
+        """
+        db: Connection = get_chat_db(user_id)
+        summary_row = db.execute(
+            """
+            SELECT SUMMARY, SUMMARY_COUNT
             FROM chats
             WHERE USER_ID = ? AND PERSONALITY_ID = ?
             """,
             (user_id, personality_id),
         ).fetchone()
 
-        # Return deserialized messages if found, else return None
-        return deserialize_json(messages[0]) if messages is not None else None
+        return tuple(summary_row) if summary_row else (None, 0)
+
+    @staticmethod
+    def get_chat_page(
+        user_id: int, personality_id: int, before_seq: int = None, limit: int = 50
+    ) -> (list, int):
+        """
+        Fetches the newest messages of a conversation older than the given cursor,
+        reading only the requested page through the primary key index. Compressed
+        contents are decoded transparently.
+
+        Args:
+            user_id (int): The ID of the user for whom to fetch message details.
+            personality_id (int):
+                The ID of the personality related to the chat messages.
+            before_seq (int):
+                Only messages with a lower sequence number are returned. None returns
+                the newest messages of the conversation.
+            limit (int): Maximum number of messages to return.
+
+        Returns:
+            tuple: List of message dictionaries ({"seq":, "role":, "content":,
+            "created_at":}) in chronological order, and the cursor for the next
+            (older) page, which is None if there are no older messages.
+        """
+
+        # Connect to the user's chat database
+        db: Connection = get_chat_db(user_id)
+
+        # Walk the index backwards from the cursor, fetching one extra row to know
+        # whether an older page exists
+        message_rows = db.execute(
+            """
+            SELECT SEQ, ROLE, CONTENT, CREATED_AT, ENCODING
+            FROM messages
+            WHERE USER_ID = ? AND PERSONALITY_ID = ? AND SEQ < ?
+            ORDER BY SEQ DESC
+            LIMIT ?
+            """,
+            (
+                user_id,
+                personality_id,
+                MAX_SEQ if before_seq is None else before_seq,
+                limit + 1,
+            ),
+        ).fetchall()
+
+        has_older = len(message_rows) > limit
+        message_rows = message_rows[:limit]
+        next_cursor = message_rows[-1][0] if has_older else None
+
+        codec = get_codec(current_app.config)
+        page = [
+            {
+                "seq": seq,
+                "role": role,
+                "content": codec.decode(content, encoding),
+                "created_at": created_at,
+            }
+            for seq, role, content, created_at, encoding in reversed(message_rows)
+        ]
+        return page, next_cursor
+
+    @staticmethod
+    def get_personality(personality_id: int) -> Personality:
+        """
+        Fetches the parsed personality record, including the precompiled system
+        message and its token count, from the personality cache.
+
+        The record is shared by all requests of the worker and must not be modified.
+
+        Args:
+            personality_id (int): The ID of the personality for whom to fetch details.
+
+        Returns:
+            Personality record if found; else None.
+        """
+        return PERSONALITY_CACHE.get_personalities(get_db()).get(personality_id)
 
     @staticmethod
     def get_personality_from_id(personality_id: int):
         """
-        Fetches and deserializes the personality details associated with the given
-        personality ID.
+        Fetches the parsed personality details associated with the given personality
+        ID from the personality cache.
 
         Args:
             personality_id (int): The ID of the personality for whom to fetch details.
@@ -127,27 +297,17 @@ class DatabaseManager:
             intro message, and image file path if found; else None.
         """
 
-        # Connect to the database
-        db: Connection = get_db()
+        # Read parsed personalities from the worker cache
+        personality = PERSONALITY_CACHE.get_personalities(get_db()).get(personality_id)
 
-        # Execute SQL command to fetch details corresponding to the personality_id
-        # from the personalities table
-        personality_row = db.execute(
-            """
-            SELECT NAME, SYSTEM_PROMPT, INTRO_MESSAGE, IMAGE_PATH
-            FROM personalities
-            WHERE ID = ?
-            """,
-            (personality_id,),
-        ).fetchone()
-
-        if personality_row is not None:
-            # If a personality row is found, return a tuple of deserialized data
+        if personality is not None:
+            # If a personality is found, return a tuple with a private copy of the
+            # system prompt so callers can extend it
             ret = (
-                personality_row[0],
-                deserialize_json(personality_row[1]),
-                personality_row[2],
-                personality_row[3],
+                personality.name,
+                list(personality.system_prompt),
+                personality.intro_message,
+                personality.image_path,
             )
         else:
             ret = None
@@ -156,42 +316,146 @@ class DatabaseManager:
         return ret
 
     @staticmethod
-    def save_chat(user_id: int, personality_id: int, messages_json) -> None:
+    def append_messages(
+        user_id: int, personality_id: int, messages: list, start_seq: int
+    ) -> bool:
         """
-        Saves a conversation with a personality in the chat table for
-        a specific user. The function will overwrite any existing conversation data
-        for an existing conversation.
+        Appends new messages of a conversation with a personality for a specific user.
+        Only the given messages are written, previously stored messages are left
+        untouched. The conversation is registered in the chats table on its first
+        write, and its last message preview is updated in the same transaction.
+        Contents are compressed according to the CHAT_COMPRESSION settings.
+
+        With CHAT_WRITE_BATCHING enabled the write is group committed together with
+        concurrent writes of the worker, and this function returns once it is
+        durably committed.
 
         Args:
             user_id (int): The ID of the user involved in the chat.
             personality_id (int): The ID of the personality involved in the chat.
-            messages_json: The JSON object representing the messages in the chat.
+            messages (list): Message dictionaries ({"role":, "content":}) to append.
+            start_seq (int):
+                Position of the first message within the conversation, i.e. the
+                number of messages already stored.
+
+        Returns:
+            bool: True if the messages were stored, False otherwise.
         """
 
-        # Check that messages_json is not None
-        # TODO: Remove assert statement and add checks on inputs instead
-        assert messages_json is not None
+        # Encode contents up front, so batched writes only execute statements
+        codec = get_codec(current_app.config)
+        message_rows = [
+            (
+                user_id,
+                personality_id,
+                seq,
+                message["role"],
+                *codec.encode(message["content"]),
+            )
+            for seq, message in enumerate(messages, start=start_seq)
+        ]
 
-        # Connect to database
-        db: Connection = get_db()
+        def write(db: Connection) -> None:
+            # Register the conversation if this is its first write
+            db.execute(
+                """
+                INSERT OR IGNORE INTO chats (USER_ID, PERSONALITY_ID)
+                VALUES (?, ?)
+                """,
+                (user_id, personality_id),
+            )
 
-        try:
-            # Insert or replace entire row in chats table
+            # Insert one row per new message. A conflicting sequence number means
+            # the conversation was extended concurrently and the write is rejected.
+            db.executemany(
+                """
+                INSERT INTO messages (
+                    USER_ID, PERSONALITY_ID, SEQ, ROLE, CONTENT, ENCODING
+                )
+                VALUES (?, ?, ?, ?, ?, ?)
+                """,
+                message_rows,
+            )
+
+            # Keep the conversation preview in sync with the appended messages
             db.execute(
                 """
-                INSERT OR REPLACE INTO chats (USER_ID, PERSONALITY_ID, MESSAGES) 
-                VALUES (?, ?, ?)
+                UPDATE chats
+                SET
+                    LAST_MESSAGE = ?,
+                    LAST_MESSAGE_AT = CURRENT_TIMESTAMP,
+                    MESSAGE_COUNT = ?
+                WHERE USER_ID = ? AND PERSONALITY_ID = ?
                 """,
-                (user_id, personality_id, serialize_json(messages_json)),
+                (
+                    messages[-1]["content"],
+                    start_seq + len(messages),
+                    user_id,
+                    personality_id,
+                ),
             )
+
+        # Hand the write to the worker's group committer if enabled
+        if current_app.config["CHAT_WRITE_BATCHING"]:
+            persister = get_persister(get_chat_db_path(user_id), current_app.config)
+            return persister.submit(write)
+
+        # Connect to the user's chat database
+        db: Connection = get_chat_db(user_id)
+
+        try:
+            write(db)
             db.commit()
+            return True
         except Exception as e:
             # Log errors
-            LOGGER.error("Cannot saver conversation to database! {e}")
+            db.rollback()
+            LOGGER.error(f"Cannot save conversation to database! {e}")
+            return False
+
+    @staticmethod
+    def save_chat_summary(
+        user_id: int,
+        personality_id: int,
+        summary: str,
+        summary_count: int,
+        previous_count: int,
+    ) -> bool:
+        """
+        Replaces the running summary of a conversation, unless it was replaced
+        concurrently since previous_count was read.
+
+        Args:
+            user_id (int): The ID of the user involved in the chat.
+            personality_id (int): The ID of the personality involved in the chat.
+            summary (str): New summary.
+            summary_count (int): Number of leading messages folded into the summary.
+            previous_count (int): SUMMARY_COUNT the new summary was built upon.
+
+        Returns:
+            bool: True if the summary was stored, False otherwise.
+        """
+        db: Connection = get_chat_db(user_id)
+
+        try:
+            cursor = db.execute(
+                """
+                UPDATE chats
+                SET SUMMARY = ?, SUMMARY_COUNT = ?
+                WHERE USER_ID = ? AND PERSONALITY_ID = ? AND SUMMARY_COUNT = ?
+                """,
+                (summary, summary_count, user_id, personality_id, previous_count),
+            )
+            db.commit()
+            return cursor.rowcount == 1
+        except Exception as e:
+            db.rollback()
+            LOGGER.error(f"Cannot save conversation summary to database! {e}")
+            return False
 
     @staticmethod
     def save_personality(
-        personality_id: int, nickname: str, system_prompt: str, img_file: str = None
+        personality_id: int, nickname: str, system_prompt: list, img_file: str = None
     ) -> None:
         """
         Saves or updates a personality in the personality table.
@@ -202,7 +466,8 @@ class DatabaseManager:
         Args:
             personality_id (int): The ID of the personality to be saved.
             nickname (str): The nickname for the personality.
-            system_prompt (str): The system_prompt related to the personality.
+            system_prompt (list):
+                The system prompt sentences (str) related to the personality.
             img_file (str): The image file path for the personality.
         """
 
@@ -213,28 +478,54 @@ class DatabaseManager:
         # Connect to database
         db: Connection = get_db()
 
+        # Precompile the system message sent to the model
+        system_message, system_tokens = compile_system_prompt(system_prompt)
+
         try:
             # If img_file is not provided, update only non-image columns
             if img_file is None:
                 db.execute(
                     """
                     UPDATE personalities
-                    SET NAME = ?, SYSTEM_PROMPT = ?
+                    SET
+                        NAME = ?,
+                        SYSTEM_PROMPT = ?,
+                        SYSTEM_MESSAGE = ?,
+                        SYSTEM_TOKENS = ?
                     WHERE ID = ?
                     """,
-                    (nickname, serialize_json(system_prompt), personality_id),
+                    (
+                        nickname,
+                        serialize_json(system_prompt),
+                        system_message,
+                        system_tokens,
+                        personality_id,
+                    ),
                 )
             # If img_file is provided, replace entire row including image
             else:
                 db.execute(
                     """
-                    INSERT OR REPLACE INTO personalities (ID, NAME, SYSTEM_PROMPT, IMAGE_PATH) 
-                    VALUES (?, ?, ?, ?)
+                    INSERT OR REPLACE INTO personalities (
+                        ID, NAME, SYSTEM_PROMPT, SYSTEM_MESSAGE, SYSTEM_TOKENS,
+                        IMAGE_PATH
+                    )
+                    VALUES (?, ?, ?, ?, ?, ?)
                     """,
-                    (personality_id, nickname, serialize_json(system_prompt), img_file),
+                    (
+                        personality_id,
+                        nickname,
+                        serialize_json(system_prompt),
+                        system_message,
+                        system_tokens,
+                        img_file,
+                    ),
                 )
 
+            # Invalidate the personality caches of all workers
+            bump_personality_generation(db)
             db.commit()
+            g.pop("personality_generation", None)
         except Exception as e:
             # Log errors
             LOGGER.error(f"Cannot save personality in database! {e}")
@@ -9,71 +9,376 @@ Contact: csw73@cornell.edu
 This file provides functionality for accessing the sqlite3 databases.
 """
 # region Imports
+import collections
+import os
 import click
 import sqlite3
+import threading
+import zlib
 from sqlite3 import Connection
+from typing import List, Mapping
 from flask import current_app, g
 
 # endregion
 
+# region Backend Imports
+from backend.compression import build_dictionary, get_codec
+from backend.migrations import migrate_db, stamp_schema_version
+from backend.utils import run_in_threadpool
+
+# endregion
+
+# Tables holding per-user chat data. They are stored in the user's chat shard and
+# moved together when shards are rebalanced.
+CHAT_TABLES = ("chats", "messages")
+
+# Connections are kept open and reused across requests by the thread (and process)
+# that opened them, keyed by database path.
+_pool = threading.local()
+
+# With SQLITE_SHARED_POOL, idle connections are instead shared by every thread (or
+# greenlet) of the process, keyed by database path, and checked out per request.
+_shared_pool: dict = {}
+_shared_pool_lock = threading.Lock()
+_shared_pool_pid: int = None
+
+
+class ThreadpoolCursor(sqlite3.Cursor):
+    def __init__(self, *args, **kwargs) -> None:
+        """
+        Cursor running every statement to completion on gevent's threadpool (see
+        SERVER_THREADPOOL), so a greenlet waiting for SQLite (disk I/O or locks held
+        by other connections) lets the other greenlets of its worker run. The result
+        rows are buffered, so fetching them does not touch the database.
+        """
+        super().__init__(*args, **kwargs)
+        self._rows: collections.deque = collections.deque()
+
+    def execute(self, sql: str, parameters=()) -> "ThreadpoolCursor":
+        return self._run(super().execute, sql, parameters)
+
+    def executemany(self, sql: str, seq_of_parameters) -> "ThreadpoolCursor":
+        return self._run(super().executemany, sql, seq_of_parameters)
+
+    def executescript(self, sql_script: str) -> "ThreadpoolCursor":
+        return self._run(super().executescript, sql_script)
+
+    def fetchone(self):
+        return self._rows.popleft() if self._rows else None
+
+    def fetchmany(self, size: int = None) -> list:
+        size = self.arraysize if size is None else size
+        return [self._rows.popleft() for _ in range(min(size, len(self._rows)))]
+
+    def fetchall(self) -> list:
+        rows = list(self._rows)
+        self._rows.clear()
+        return rows
+
+    def __next__(self):
+        if not self._rows:
+            raise StopIteration
+        return self._rows.popleft()
+
+    def _run(self, method, *args) -> "ThreadpoolCursor":
+        """
+        Runs a statement method on the threadpool and buffers its result rows.
+
+        Args:
+            method (Callable): Bound statement method of sqlite3.Cursor.
+            *args: Arguments of the method.
+
+        Returns:
+            ThreadpoolCursor: The cursor itself, like sqlite3.Cursor.
+        """
+        fetchall = super().fetchall
+
+        def run() -> list:
+            method(*args)
+            return fetchall()
+
+        self._rows = collections.deque(run_in_threadpool(run))
+        return self
+
+
+class ThreadpoolConnection(Connection):
+    """
+    Connection running its statements, commits and rollbacks on gevent's threadpool,
+    see ThreadpoolCursor.
+    """
+
+    def cursor(self, factory=ThreadpoolCursor) -> sqlite3.Cursor:
+        return super().cursor(factory)
+
+    def execute(self, sql: str, parameters=()) -> sqlite3.Cursor:
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql: str, seq_of_parameters) -> sqlite3.Cursor:
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def executescript(self, sql_script: str) -> sqlite3.Cursor:
+        return self.cursor().executescript(sql_script)
+
+    def commit(self) -> None:
+        run_in_threadpool(super().commit)
+
+    def rollback(self) -> None:
+        run_in_threadpool(super().rollback)
+
+
+def connect(database: str, config: Mapping) -> Connection:
+    """
+    Opens a new connection to the SQLite3 database, tuned with the SQLITE_* settings
+    of the given configuration. With SERVER_THREADPOOL, the connection runs its
+    statements on gevent's threadpool (see ThreadpoolConnection).
+
+    Args:
+        database (str): Path to the database file.
+        config (Mapping): Application configuration (usually current_app.config).
+
+    Returns:
+        A connection object for the SQLite3 database.
+    """
+    # Connect to the SQLite3 Database, waiting on locks held by other connections.
+    # Shared connections and connections running on the threadpool move between
+    # threads, but never serve two at once.
+    db = sqlite3.connect(
+        database=database,
+        detect_types=sqlite3.PARSE_DECLTYPES,
+        timeout=config["SQLITE_BUSY_TIMEOUT"],
+        check_same_thread=not (
+            config["SQLITE_SHARED_POOL"] or config["SERVER_THREADPOOL"]
+        ),
+        factory=ThreadpoolConnection if config["SERVER_THREADPOOL"] else Connection,
+    )
+    # Row factory makes rows behave like Python dictionaries
+    db.row_factory = sqlite3.Row
+
+    # WAL lets readers proceed while a writer commits, and NORMAL synchronous mode
+    # only syncs the WAL on checkpoints, which is safe in WAL mode
+    db.execute(f"PRAGMA journal_mode = {config['SQLITE_JOURNAL_MODE']}")
+    db.execute(f"PRAGMA synchronous = {config['SQLITE_SYNCHRONOUS']}")
+    db.execute(f"PRAGMA mmap_size = {int(config['SQLITE_MMAP_SIZE'])}")
+    db.execute(f"PRAGMA cache_size = {int(config['SQLITE_CACHE_SIZE'])}")
+
+    return db
+
+
+def get_pooled_connection(database: str) -> Connection:
+    """
+    Returns the connection to the given database owned by the current thread, opening
+    it on first use. Connections inherited from a parent process (e.g. when gunicorn
+    forks workers) are never reused.
+
+    With SQLITE_SHARED_POOL, the connection is instead checked out of the process'
+    shared pool for the current application context, see checkout_connection.
+
+    Args:
+        database (str): Path to the database file.
+
+    Returns:
+        A connection object for the SQLite3 database.
+    """
+    if current_app.config["SQLITE_SHARED_POOL"]:
+        return checkout_connection(database)
+
+    # Discard connections of the parent process after a fork
+    if getattr(_pool, "pid", None) != os.getpid():
+        _pool.pid = os.getpid()
+        _pool.connections = {}
+
+    if database not in _pool.connections:
+        _pool.connections[database] = connect(database, current_app.config)
+
+    return _pool.connections[database]
+
+
+def checkout_connection(database: str) -> Connection:
+    """
+    Checks a connection to the given database out of the process' shared pool, for
+    servers running many more concurrent requests than threads (e.g. gevent
+    workers, where thread-local connections would be opened for every request).
+    The connection is held until the application context ends (see close_db).
+
+    Args:
+        database (str): Path to the database file.
+
+    Returns:
+        A connection object for the SQLite3 database.
+    """
+    global _shared_pool_pid
+
+    if "pooled_connections" not in g:
+        g.pooled_connections = {}
+
+    if database not in g.pooled_connections:
+        with _shared_pool_lock:
+            # Discard connections of the parent process after a fork
+            if _shared_pool_pid != os.getpid():
+                _shared_pool_pid = os.getpid()
+                _shared_pool.clear()
+            idle = _shared_pool.setdefault(database, [])
+            db = idle.pop() if idle else None
+
+        g.pooled_connections[database] = db or connect(database, current_app.config)
+
+    return g.pooled_connections[database]
+
 
 def get_db() -> Connection:
     """
     Establishes and returns a connection to the SQLite3 database.
 
     Checks if a database connection already exists in the application context.
-    If not, creates a new connection and sets it as the database for the current
-    application context.
+    If not, takes the pooled connection of the current thread and sets it as the
+    database for the current application context.
 
     Returns:
         A connection object for the SQLite3 database.
     """
     # Check if there's no DB connection
     if "db" not in g:
-        # Connect to the SQLite3 Database
-        g.db = sqlite3.connect(
-            database=current_app.config["DATABASE"],
-            detect_types=sqlite3.PARSE_DECLTYPES,
-        )
-        # Row factory makes rows behave like Python dictionaries
-        g.db.row_factory = sqlite3.Row
+        g.db = get_pooled_connection(current_app.config["DATABASE"])
 
     return g.db
 
 
+def get_shard_index(user_id: int, shard_count: int) -> int:
+    """
+    Maps a user to one of the chat shards. The mapping is stable across processes
+    and splitting N shards into k * N shards only moves users of shard s to shards
+    s + j * N.
+
+    Args:
+        user_id (int): User identifier.
+        shard_count (int): Number of chat shards.
+
+    Returns:
+        int: Index of the user's shard.
+    """
+    return zlib.crc32(str(user_id).encode("utf-8")) % shard_count
+
+
+def get_chat_db_path(user_id: int) -> str:
+    """
+    Returns the path of the SQLite3 database storing the chats of the given user.
+
+    Args:
+        user_id (int): User identifier.
+
+    Returns:
+        str: Path to the user's chat shard, or the main database without shards.
+    """
+    shards = current_app.config["CHAT_SHARDS"]
+    if not shards:
+        return current_app.config["DATABASE"]
+
+    return shards[get_shard_index(user_id, len(shards))]
+
+
+def get_chat_db(user_id: int) -> Connection:
+    """
+    Establishes and returns a connection to the SQLite3 database storing the chats of
+    the given user.
+
+    With CHAT_SHARDS configured, the user is routed to one of the shard databases,
+    otherwise chats are stored in the main database.
+
+    Args:
+        user_id (int): User identifier.
+
+    Returns:
+        A connection object for the user's chat database.
+    """
+    if not current_app.config["CHAT_SHARDS"]:
+        return get_db()
+
+    # Check if there's no DB connection for the shard yet
+    path = get_chat_db_path(user_id)
+    if "chat_dbs" not in g:
+        g.chat_dbs = {}
+    if path not in g.chat_dbs:
+        g.chat_dbs[path] = get_pooled_connection(path)
+
+    return g.chat_dbs[path]
+
+
+def get_all_dbs() -> List[Connection]:
+    """
+    Establishes and returns connections to the main database and every chat shard,
+    e.g. for maintenance commands.
+
+    Returns:
+        List of connection objects, starting with the main database.
+    """
+    dbs = [get_db()]
+    for path in current_app.config["CHAT_SHARDS"]:
+        if path != current_app.config["DATABASE"]:
+            dbs.append(get_pooled_connection(path))
+
+    return dbs
+
+
+def get_chat_dbs() -> List[Connection]:
+    """
+    Establishes and returns connections to every database storing chats.
+
+    Returns:
+        List of connection objects.
+    """
+    shards = current_app.config["CHAT_SHARDS"]
+    if not shards:
+        return [get_db()]
+
+    return [get_pooled_connection(path) for path in shards]
+
+
 def close_db(e=None) -> None:
     """
-    Closes the SQLite3 database connection.
+    Releases the SQLite3 database connections back to the pool.
 
-    This function pops the "db" object from the global context of the application
-    and closes the connection to the database if it exists.
+    This function pops the "db" object and any chat shard connections from the
+    global context of the application and rolls back any transaction left open, so
+    the connections can be reused by the next request.
 
     Args:
         e (Exception, optional): An error instance passed in after failure of a
         request context. Default is None, which means no error has occurred.
     """
-    # Remove the DB object from global context
-    db = g.pop("db", None)
+    # Remove the DB objects from global context
+    dbs = [g.pop("db", None), *g.pop("chat_dbs", {}).values()]
+    checked_out = g.pop("pooled_connections", {})
 
-    # Close the DB connection if it exists
-    if db is not None:
-        db.close()
+    # Never hand an open transaction to the next request
+    for db in [*dbs, *checked_out.values()]:
+        if db is not None and db.in_transaction:
+            db.rollback()
+
+    # Return connections checked out of the shared pool
+    with _shared_pool_lock:
+        if _shared_pool_pid == os.getpid():
+            for database, db in checked_out.items():
+                _shared_pool.setdefault(database, []).append(db)
 
 
 def init_db() -> None:
     """
-    Initializes the database by creating tables according to schema.sql.
+    Initializes the database and every chat shard by creating tables according to
+    schema.sql. Shards receive the full schema but only their chat tables are used.
 
     Example:
         To initialize the database, simply call this function:
             >>> init_db()
     """
-    # Get the DB connection
-    db = get_db()
-
-    # Execute script from 'schema.sql' file
     with current_app.open_resource("schema.sql") as f:
-        db.executescript(f.read().decode("utf8"))
+        schema = f.read().decode("utf8")
+
+    for db in get_all_dbs():
+        # Execute script from 'schema.sql' file
+        db.executescript(schema)
+
+        # schema.sql is always the latest schema, so no migration is pending
+        stamp_schema_version(db)
 
 
 @click.command(name="init-db")
@@ -87,13 +392,62 @@ def init_db_command() -> None:
     click.echo("Initialized the database.")
 
 
+@click.command(name="migrate-db")
+def migrate_db_command() -> None:
+    """
+    Command to upgrade an existing database to the latest schema without losing data.
+    """
+    # Apply any pending migrations to the database and every chat shard
+    for db in get_all_dbs():
+        applied = migrate_db(db)
+        # Print the success message
+        database = db.execute("PRAGMA database_list").fetchone()[2]
+        click.echo(f"Applied {applied} migration(s) to {database}.")
+
+
+@click.command(name="build-chat-dictionary")
+@click.argument("output_path")
+@click.option("--samples", default=2000, help="Number of recent messages to sample.")
+def build_chat_dictionary_command(output_path: str, samples: int) -> None:
+    """
+    Command to build a zlib preset dictionary for chat compression from the most
+    recent stored messages.
+    """
+    # Sample the most recent messages of every chat database, decoding any
+    # compressed contents
+    codec = get_codec(current_app.config)
+    chat_dbs = get_chat_dbs()
+    message_rows = []
+    for db in chat_dbs:
+        message_rows += db.execute(
+            """
+            SELECT CREATED_AT, CONTENT, ENCODING
+            FROM messages
+            ORDER BY CREATED_AT DESC
+            LIMIT ?
+            """,
+            (samples // len(chat_dbs),),
+        ).fetchall()
+
+    # Most recent messages go last, where zlib finds matches most cheaply
+    dictionary = build_dictionary(
+        codec.decode(content, encoding)
+        for _, content, encoding in sorted(message_rows, key=lambda row: row[0])
+    )
+    with open(output_path, "wb") as f:
+        f.write(dictionary)
+
+    # Print the success message
+    click.echo(f"Wrote {len(dictionary)} byte dictionary to {output_path}.")
+
+
 def init_app(app) -> None:
     """
     Set up database related hooks on the given Flask application instance.
 
     This function does two things:
-    1. Registers a new command that initializes the database to the Flask
-       application instance.
+    1. Registers new commands that initialize, migrate and maintain the database to
+       the Flask application instance.
     2. Configures the application to call the 'close_db' function at the end
        of each request, even if unhandled exceptions are raised.
 
@@ -110,5 +464,7 @@ def init_app(app) -> None:
     # successful or not
     app.teardown_appcontext(close_db)
 
-    # Add the command to the application instance
+    # Add the commands to the application instance
     app.cli.add_command(init_db_command)
+    app.cli.add_command(migrate_db_command)
+    app.cli.add_command(build_chat_dictionary_command)
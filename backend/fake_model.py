@@ -0,0 +1,296 @@
+"""
+fake_model.py
+
+Author: Christian Welling
+Date: 10/18/2026
+Company: ImposterAI
+Contact: csw73@cornell.edu
+
+Fake AI model for benchmarks and offline development (MODEL_CLIENT = "fake", see
+FAKE_MODEL_* in config.py). FakeModelServer.py serves the same fake model over
+the chat completions wire format, to benchmark the real HTTP clients against it.
+
+Replies are rendered from a template, so they are deterministic for a given
+conversation. Latencies are drawn from a configurable distribution:
+    none                  : no latency
+    fixed:<s>             : always <s> seconds
+    uniform:<min>:<max>   : uniformly between <min> and <max> seconds
+    normal:<mean>:<std>   : normally distributed (never negative)
+    lognormal:<median>:<sigma>
+                          : log-normally distributed, with a long tail like real
+                            model latencies
+Requests fail with a server error at the configured error rate, and requests
+beyond the configured requests per minute are rejected as rate limited.
+"""
+# region General/API Imports
+import collections
+import math
+import random
+import threading
+import time
+from typing import Generator, List, Mapping, Optional
+
+# endregion
+
+# region Backend Imports
+from backend.ai_model import AIModel, ModelError
+from backend.logger import LOGGER
+
+# endregion
+
+
+class FakeProfile:
+    def __init__(
+        self,
+        reply: str = "Fake reply to: {message}",
+        latency: str = "none",
+        chunk_delay: float = 0.0,
+        error_rate: float = 0.0,
+        requests_per_minute: int = 0,
+        seed: Optional[int] = None,
+    ) -> None:
+        """
+        Behavior of the fake model, shared by FakeModel and the fake model server.
+
+        Args:
+            reply (str):
+                Reply template, formatted with message (content of the last
+                message), messages (number of messages) and personality_id.
+            latency (str): Latency distribution of a response (see module docs).
+            chunk_delay (float): Seconds between the chunks of a streamed response.
+            error_rate (float): Share of requests failing with a server error.
+            requests_per_minute (int): Rate limit of the fake model (0 = none).
+            seed (int): Seed of the latencies and errors, for reproducible runs.
+        """
+        self._reply: str = reply
+        self._latency: tuple = self._parse_latency(latency)
+        self.chunk_delay: float = chunk_delay
+        self._error_rate: float = error_rate
+        self._requests_per_minute: int = requests_per_minute
+
+        self._lock = threading.Lock()
+        self._random = random.Random(seed)
+        # Times of the requests of the last minute, for the rate limit
+        self._requests: collections.deque = collections.deque()
+
+    @staticmethod
+    def _parse_latency(spec: str) -> tuple:
+        """
+        Parses a latency distribution.
+
+        Args:
+            spec (str): Latency distribution (see module docs).
+
+        Returns:
+            tuple: Name of the distribution and its parameters.
+        """
+        name, *params = spec.split(":")
+        arity = {"none": 0, "fixed": 1, "uniform": 2, "normal": 2, "lognormal": 2}
+        if arity.get(name) != len(params):
+            raise ValueError(f"Invalid fake model latency: {spec}")
+        return (name, *(float(param) for param in params))
+
+    def get_latency(self) -> float:
+        """
+        Draws the latency of a response.
+
+        Returns:
+            float: Seconds until the response (or its first chunk).
+        """
+        name, *params = self._latency
+        with self._lock:
+            if name == "fixed":
+                return params[0]
+            if name == "uniform":
+                return self._random.uniform(*params)
+            if name == "normal":
+                return max(0.0, self._random.gauss(*params))
+            if name == "lognormal":
+                return self._random.lognormvariate(math.log(params[0]), params[1])
+            return 0.0
+
+    def get_error(self) -> Optional[int]:
+        """
+        Decides whether a request fails, counting it against the rate limit.
+
+        Returns:
+            int: HTTP status of the failure (429 if rate limited, 500 for an
+            injected error), or None if the request succeeds.
+        """
+        with self._lock:
+            if self._requests_per_minute:
+                now = time.monotonic()
+                while self._requests and self._requests[0] <= now - 60:
+                    self._requests.popleft()
+                if len(self._requests) >= self._requests_per_minute:
+                    return 429
+                self._requests.append(now)
+
+            if self._random.random() < self._error_rate:
+                return 500
+            return None
+
+    def get_reply(self, conversation_messages, personality_id=None) -> str:
+        """
+        Renders the reply to a conversation.
+
+        Args:
+            conversation_messages (json): Input messages of the request.
+            personality_id (int): Personality of the conversation, if known.
+
+        Returns:
+            str: Reply content.
+        """
+        message = conversation_messages[-1]["content"] if conversation_messages else ""
+        return self._reply.format(
+            message=message,
+            messages=len(conversation_messages),
+            personality_id=personality_id,
+        )
+
+    @staticmethod
+    def split_chunks(content: str) -> List[str]:
+        """
+        Splits a reply into the chunks of a streamed response (one per word).
+
+        Args:
+            content (str): Reply content.
+
+        Returns:
+            List[str]: Chunks, joining to the content.
+        """
+        words = content.split(" ")
+        return [words[0]] + [" " + word for word in words[1:]]
+
+
+class FakeModel(AIModel):
+    def __init__(self, profile: FakeProfile) -> None:
+        """
+        AI model answering locally from a fake profile, without any API calls.
+
+        Args:
+            profile (FakeProfile): Behavior of the model.
+        """
+        self._profile: FakeProfile = profile
+
+    def make_request(self, conversation_messages, **kwargs) -> Optional[dict]:
+        """
+        Makes a request to the fake model.
+
+        Args:
+            conversation_messages (json): Input messages for the api call.
+            **kwargs: Request context (personality_id, user_id, timeout).
+
+        Returns:
+            The message response, or None if there's an error.
+        """
+        # Like a client, give up on a response slower than the timeout
+        latency = self._profile.get_latency()
+        timeout = kwargs.get("timeout")
+        if timeout is not None and latency > timeout:
+            time.sleep(max(timeout, 0))
+            self._fail("Fake model request timed out")
+            return None
+
+        time.sleep(latency)
+        if not self._check_error():
+            return None
+
+        return {
+            "role": "assistant",
+            "content": self._profile.get_reply(
+                conversation_messages, kwargs.get("personality_id")
+            ),
+        }
+
+    def stream_request(
+        self, conversation_messages, **kwargs
+    ) -> Generator[str, None, bool]:
+        """
+        Makes a streaming request to the fake model.
+
+        Args:
+            conversation_messages (json): Input messages for the api call.
+            **kwargs: Request context (personality_id, user_id, timeout).
+
+        Yields:
+            str: Content chunks of the response.
+
+        Returns:
+            bool: True if the response was received completely.
+        """
+        # Like a client, give up on a stream not finished within the timeout
+        timeout = kwargs.get("timeout")
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        latency = self._profile.get_latency()
+        if timeout is not None and latency > timeout:
+            time.sleep(max(timeout, 0))
+            return self._fail("Fake model request timed out")
+
+        time.sleep(latency)
+        if not self._check_error():
+            return False
+
+        content = self._profile.get_reply(
+            conversation_messages, kwargs.get("personality_id")
+        )
+        for i, chunk in enumerate(self._profile.split_chunks(content)):
+            if i:
+                delay = self._profile.chunk_delay
+                if deadline is not None and time.monotonic() + delay > deadline:
+                    time.sleep(max(deadline - time.monotonic(), 0))
+                    return self._fail("Fake model response stream timed out")
+                time.sleep(delay)
+            yield chunk
+        return True
+
+    def _check_error(self) -> bool:
+        """
+        Injects the profile's errors: logs them, or raises them as a ModelError if
+        raise_errors is set.
+
+        Returns:
+            bool: True if the request succeeds.
+        """
+        status = self._profile.get_error()
+        if status is None:
+            return True
+
+        return self._fail(f"Fake model returned status {status}")
+
+    def _fail(self, message: str) -> bool:
+        """
+        Logs a (retryable) error, or raises it as a ModelError if raise_errors is
+        set.
+
+        Args:
+            message (str): Description of the error.
+
+        Returns:
+            bool: Always False.
+        """
+        if self.raise_errors:
+            raise ModelError(message, retryable=True)
+        LOGGER.error(message)
+        return False
+
+
+def create_fake_profile(config: Mapping) -> FakeProfile:
+    """
+    Creates the fake model profile of the FAKE_MODEL_* settings.
+
+    Args:
+        config (Mapping): Application configuration (usually current_app.config).
+
+    Returns:
+        FakeProfile: Behavior of the fake model.
+    """
+    return FakeProfile(
+        config["FAKE_MODEL_REPLY"],
+        config["FAKE_MODEL_LATENCY"],
+        config["FAKE_MODEL_CHUNK_DELAY"],
+        config["FAKE_MODEL_ERROR_RATE"],
+        config["FAKE_MODEL_REQUESTS_PER_MINUTE"],
+        config["FAKE_MODEL_SEED"],
+    )
@@ -14,15 +14,25 @@ make a successful OpenAI API request.
 # region General/API Imports
 import os
 import openai
+from typing import Generator
 
 # endregion
 
 # region Backend Imports
-from backend.ai_model import AIModel
+from backend.ai_model import AIModel, ModelError
 from backend.logger import LOGGER
 
 # endregion
 
+# Transient errors after which a request may succeed when repeated
+RETRYABLE_ERRORS = (
+    openai.error.APIConnectionError,
+    openai.error.ServiceUnavailableError,
+    openai.error.RateLimitError,
+    openai.error.Timeout,
+    openai.error.TryAgain,
+)
+
 
 class GPTModel(AIModel):
     def __init__(self):
@@ -43,12 +53,13 @@ class GPTModel(AIModel):
         # Set the model id
         self._model_id = model_id
 
-    def make_request(self, conversation_messages):
+    def make_request(self, conversation_messages, **kwargs):
         """
         Makes a request to the model.
 
         Args:
             conversation_messages (json): Input messages for the api call.
+            **kwargs: Request context, only timeout (seconds) is used.
 
         Returns:
             JSON: The message response received from the "assistant".
@@ -66,9 +77,72 @@ class GPTModel(AIModel):
                 model=self._model_id,
                 messages=conversation_messages,
                 temperature=1.2,
+                request_timeout=kwargs.get("timeout"),
             )
             ret = completion.choices[0].message
+        except Exception as e:
+            self._handle_api_error(e)
+
+        return ret
 
+    def stream_request(
+        self, conversation_messages, **kwargs
+    ) -> Generator[str, None, bool]:
+        """
+        Makes a streaming request to the model.
+
+        Args:
+            conversation_messages (json): Input messages for the api call.
+            **kwargs: Request context, only timeout (seconds) is used.
+
+        Yields:
+            str: Content chunks of the "assistant" response as they arrive. The
+                 stream ends early if there's an error.
+
+        Returns:
+            bool: True if the response was received completely.
+        """
+        openai.api_key = os.getenv("OPENAI_API_KEY")
+
+        # Make streaming API request
+        try:
+            for chunk in openai.ChatCompletion.create(
+                model=self._model_id,
+                messages=conversation_messages,
+                temperature=1.2,
+                stream=True,
+                request_timeout=kwargs.get("timeout"),
+            ):
+                content = chunk.choices[0].delta.get("content")
+                if content:
+                    yield content
+                # The last chunk of a complete response states why it finished
+                if chunk.choices[0].get("finish_reason"):
+                    return True
+
+            raise openai.error.APIConnectionError(
+                "Response stream ended before the response finished"
+            )
+        except Exception as e:
+            self._handle_api_error(e)
+            return False
+
+    def _handle_api_error(self, error: Exception) -> None:
+        """
+        Logs an error raised by an API request, or raises it as a ModelError if
+        raise_errors is set.
+
+        Args:
+            error (Exception): The error raised by the request.
+        """
+        if self.raise_errors:
+            raise ModelError(
+                f"OpenAI API request failed: {error}",
+                retryable=isinstance(error, RETRYABLE_ERRORS),
+            ) from error
+
+        try:
+            raise error
         # Error handling for different types of API errors, correctly categorized
         # Section 1: Service Errors
         except openai.error.APIConnectionError as e:
@@ -103,5 +177,3 @@ class GPTModel(AIModel):
         except Exception as e:
             # Handle any other unknown errors
             LOGGER.error(f"An unknown error occurred: {e}")
-
-        return ret
@@ -0,0 +1,321 @@
+"""
+idempotency.py
+
+Author: Tim Duggan
+Date: 10/18/2026
+Company: ImposterAI
+Contact: csw73@cornell.edu
+
+Idempotency keys of message requests (see IDEMPOTENCY_* in config.py).
+
+A client sending a message may include an Idempotency-Key header, unique per
+message it sends. Requests repeating a key of the same user (double clicks, client
+retries) do not send the message again:
+    in flight : while the first request is still running, duplicates wait for it
+                and return its response, so the model is called once
+    completed : within IDEMPOTENCY_TTL seconds, duplicates return the stored
+                response of the first request
+    failed    : requests that did not store a response (e.g. the model did not
+                respond) release their key, so a retry sends the message again
+Keys are stored in a SQLite file shared by every worker, so duplicates are caught
+whichever worker they reach. Reusing a key for a different message is rejected.
+"""
+# region General/API Imports
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Callable, Mapping, Optional, Tuple
+from flask import current_app
+
+# endregion
+
+# region Backend Imports
+from backend.db import connect
+from backend.logger import LOGGER
+from backend.metrics import METRICS
+
+# endregion
+
+_lock = threading.Lock()
+
+
+class IdempotencyError(Exception):
+    def __init__(self, message: str, status: int) -> None:
+        """
+        Error of a request whose idempotency key cannot be used.
+
+        Args:
+            message (str): Description of the error.
+            status (int): HTTP status to answer the request with.
+        """
+        super().__init__(message)
+        self.status: int = status
+
+
+class IdempotencyStore:
+    def __init__(
+        self,
+        path: str,
+        ttl: float,
+        wait: float,
+        poll_interval: float,
+        config: Mapping,
+    ) -> None:
+        """
+        Idempotency keys and the stored responses of their requests, shared by every
+        worker through a SQLite file.
+
+        Args:
+            path (str): Path to the key database file.
+            ttl (float): Seconds a key and its response are kept.
+            wait (float):
+                Maximum seconds a duplicate waits for the request in flight. A key
+                in flight for longer than that is considered abandoned (e.g. its
+                worker died) and taken over.
+            poll_interval (float):
+                Seconds between checks of a request in flight in another worker.
+            config (Mapping): Application configuration (usually current_app.config).
+        """
+        self._path: str = path
+        self._ttl: float = ttl
+        self._wait: float = wait
+        self._poll_interval: float = poll_interval
+        self._config: Mapping = dict(config)
+        self._local = threading.local()
+
+        self._lock = threading.Lock()
+        # Completion events of the requests in flight in this worker, by key
+        self._in_flight: dict = {}
+
+    def _get_db(self) -> sqlite3.Connection:
+        """
+        Returns the calling thread's connection to the key database, creating the
+        key table on first use.
+
+        Returns:
+            Connection: Connection to the key database.
+        """
+        if getattr(self._local, "pid", None) != os.getpid():
+            db = connect(self._path, self._config)
+            db.isolation_level = None
+            db.execute(
+                """
+                CREATE TABLE IF NOT EXISTS idempotency_keys (
+                  "USER_ID" INTEGER NOT NULL,
+                  "KEY" TEXT NOT NULL,
+                  "FINGERPRINT" TEXT NOT NULL,
+                  "RESPONSE" TEXT,
+                  "CREATED_AT" REAL NOT NULL,
+                  PRIMARY KEY ("USER_ID", "KEY")
+                )
+                """
+            )
+            db.execute(
+                "CREATE INDEX IF NOT EXISTS idempotency_keys_created_at "
+                + "ON idempotency_keys (CREATED_AT)"
+            )
+            self._local.db = db
+            self._local.pid = os.getpid()
+
+        return self._local.db
+
+    def execute(
+        self,
+        user_id: int,
+        key: str,
+        payload: dict,
+        handler: Callable[[], Tuple[dict, bool]],
+    ) -> dict:
+        """
+        Runs a request once per idempotency key.
+
+        Args:
+            user_id (int): The ID of the user making the request.
+            key (str): Idempotency key sent by the client.
+            payload (dict): Request payload, which duplicates must repeat.
+            handler (Callable[[], Tuple[dict, bool]]):
+                Handles the request, returning its response and whether the
+                response should be replayed to duplicates (False for failures that
+                may be retried).
+
+        Returns:
+            dict: Response of the request, or the stored response of the first
+            request with the key.
+
+        Raises:
+            IdempotencyError:
+                If the key was used for another payload (422), or a duplicate
+                waited too long for the request in flight (409).
+        """
+        fingerprint = hashlib.sha256(
+            json.dumps(payload, sort_keys=True).encode("utf-8")
+        ).hexdigest()
+        deadline = time.monotonic() + self._wait
+
+        # [1] Claim the key, or wait for the request in flight to finish
+        while True:
+            state, response = self._claim(user_id, key, fingerprint)
+            if state == "claimed":
+                break
+            if state == "completed":
+                METRICS.increment("idempotency.replays")
+                return response
+            if state == "mismatch":
+                raise IdempotencyError(
+                    "Idempotency key was already used for another message.", 422
+                )
+
+            METRICS.increment("idempotency.coalesced")
+            if time.monotonic() >= deadline:
+                raise IdempotencyError("Message is still being processed.", 409)
+            self._wait_for(user_id, key, deadline)
+
+        # [2] Run the request, storing its response or releasing the key
+        event = threading.Event()
+        with self._lock:
+            self._in_flight[(user_id, key)] = event
+        response, replayable = None, False
+        try:
+            response, replayable = handler()
+            return response
+        finally:
+            self._finish(user_id, key, response if replayable else None)
+            with self._lock:
+                del self._in_flight[(user_id, key)]
+            event.set()
+
+    def _claim(
+        self, user_id: int, key: str, fingerprint: str
+    ) -> Tuple[str, Optional[dict]]:
+        """
+        Claims a key unless another request holds it, removing expired keys.
+
+        Args:
+            user_id (int): The ID of the user making the request.
+            key (str): Idempotency key.
+            fingerprint (str): Hash of the request payload.
+
+        Returns:
+            Tuple[str, Optional[dict]]: State of the key ("claimed", "in_flight",
+            "completed" or "mismatch") and the stored response if completed.
+        """
+        db = self._get_db()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            now = time.time()
+            db.execute(
+                "DELETE FROM idempotency_keys WHERE CREATED_AT <= ?", (now - self._ttl,)
+            )
+            row = db.execute(
+                "SELECT FINGERPRINT, RESPONSE, CREATED_AT FROM idempotency_keys "
+                + "WHERE USER_ID = ? AND KEY = ?",
+                (user_id, key),
+            ).fetchone()
+
+            if row is not None and row[0] != fingerprint:
+                state, response = "mismatch", None
+            elif row is not None and row[1] is not None:
+                state, response = "completed", json.loads(row[1])
+            elif row is not None and row[2] > now - self._wait:
+                state, response = "in_flight", None
+            else:
+                # New key, or a key abandoned in flight
+                db.execute(
+                    """
+                    INSERT OR REPLACE INTO idempotency_keys (
+                        USER_ID, KEY, FINGERPRINT, RESPONSE, CREATED_AT
+                    )
+                    VALUES (?, ?, ?, NULL, ?)
+                    """,
+                    (user_id, key, fingerprint, now),
+                )
+                state, response = "claimed", None
+
+            db.execute("COMMIT")
+            return state, response
+        except Exception:
+            db.execute("ROLLBACK")
+            raise
+
+    def _finish(self, user_id: int, key: str, response: Optional[dict]) -> None:
+        """
+        Stores the response of a claimed key, or releases the key.
+
+        Args:
+            user_id (int): The ID of the user making the request.
+            key (str): Idempotency key.
+            response (dict): Response to replay, or None to release the key.
+        """
+        db = self._get_db()
+        try:
+            if response is None:
+                db.execute(
+                    "DELETE FROM idempotency_keys WHERE USER_ID = ? AND KEY = ?",
+                    (user_id, key),
+                )
+            else:
+                db.execute(
+                    "UPDATE idempotency_keys SET RESPONSE = ? "
+                    + "WHERE USER_ID = ? AND KEY = ?",
+                    (json.dumps(response), user_id, key),
+                )
+        except sqlite3.Error as e:
+            LOGGER.error(f"Cannot store idempotency key! {e}")
+
+    def _wait_for(self, user_id: int, key: str, deadline: float) -> None:
+        """
+        Waits until a request in flight may have finished: until it finishes if it
+        runs in this worker, else for the poll interval.
+
+        Args:
+            user_id (int): The ID of the user making the request.
+            key (str): Idempotency key.
+            deadline (float): Monotonic time after which to stop waiting.
+        """
+        with self._lock:
+            event = self._in_flight.get((user_id, key))
+
+        timeout = max(0.0, deadline - time.monotonic())
+        if event is not None:
+            event.wait(timeout)
+        else:
+            time.sleep(min(self._poll_interval, timeout))
+
+
+def create_idempotency_store(config: Mapping) -> IdempotencyStore:
+    """
+    Creates the idempotency key store of the IDEMPOTENCY_* settings.
+
+    Args:
+        config (Mapping): Application configuration (usually current_app.config).
+
+    Returns:
+        IdempotencyStore: Store shared by every worker.
+    """
+    return IdempotencyStore(
+        config["IDEMPOTENCY_PATH"],
+        config["IDEMPOTENCY_TTL"],
+        config["IDEMPOTENCY_WAIT"],
+        config["IDEMPOTENCY_POLL_INTERVAL"],
+        config,
+    )
+
+
+def get_idempotency_store() -> IdempotencyStore:
+    """
+    Returns the idempotency key store of the current application, creating it on
+    first use.
+
+    Returns:
+        IdempotencyStore: Shared store.
+    """
+    extensions = current_app.extensions
+    if "idempotency" not in extensions:
+        with _lock:
+            if "idempotency" not in extensions:
+                extensions["idempotency"] = create_idempotency_store(current_app.config)
+
+    return extensions["idempotency"]
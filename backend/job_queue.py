@@ -0,0 +1,486 @@
+"""
+job_queue.py
+
+Author: Tim Duggan
+Date: 10/18/2026
+Company: ImposterAI
+Contact: csw73@cornell.edu
+
+Durable queue of reply generation jobs (see MESSAGE_JOBS in config.py).
+
+With MESSAGE_JOBS enabled, /api/send_user_message stores the user's message,
+enqueues a job generating the reply and returns right away with the job's id. A
+separate pool of job workers (flask --app app run-job-workers) makes the model
+requests and stores the replies, so the web workers never wait for the model.
+Clients poll the job or subscribe to its result.
+
+Jobs are stored in a SQLite file. A claimed job is leased to its worker for
+JOB_LEASE seconds: jobs of a worker that died (e.g. on a restart) are claimed again
+once their lease expires, up to JOB_MAX_ATTEMPTS times. Every claim is an attempt
+of the job, and only its latest attempt may store a reply and finish the job, so a
+worker that outlived its lease cannot overwrite the result of the worker that took
+the job over. Every conversation has at most one unfinished job, so replies are
+generated in order.
+"""
+# region General/API Imports
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Mapping, Optional
+
+import click
+from flask import current_app
+
+# endregion
+
+# region Backend Imports
+from backend.chat_manager import ChatManager
+from backend.context_window import get_context_window
+from backend.db import connect
+from backend.logger import LOGGER
+from backend.metrics import METRICS
+from backend.model_factory import get_model, get_summarizer
+
+# endregion
+
+_lock = threading.Lock()
+
+# Job states. Reserved jobs are only claimed after the user's message was stored.
+RESERVED, QUEUED, RUNNING, DONE, FAILED = (
+    "reserved",
+    "queued",
+    "running",
+    "done",
+    "failed",
+)
+
+
+class JobQueue:
+    def __init__(
+        self, path: str, lease: float, max_attempts: int, ttl: float, config: Mapping
+    ) -> None:
+        """
+        Queue of reply generation jobs, shared by every worker through a SQLite
+        file.
+
+        Args:
+            path (str): Path to the queue database file.
+            lease (float): Seconds a job is leased to the worker running it.
+            max_attempts (int): Maximum number of times a job is claimed.
+            ttl (float): Seconds finished jobs and their results are kept.
+            config (Mapping): Application configuration (usually current_app.config).
+        """
+        self._path: str = path
+        self._lease: float = lease
+        self._max_attempts: int = max_attempts
+        self._ttl: float = ttl
+        self._config: Mapping = dict(config)
+        self._local = threading.local()
+
+    def _get_db(self) -> sqlite3.Connection:
+        """
+        Returns the calling thread's connection to the queue database, creating the
+        job table on first use.
+
+        Returns:
+            Connection: Connection to the queue database.
+        """
+        if getattr(self._local, "pid", None) != os.getpid():
+            db = connect(self._path, self._config)
+            db.isolation_level = None
+            db.execute(
+                """
+                CREATE TABLE IF NOT EXISTS generation_jobs (
+                  "ID" TEXT PRIMARY KEY,
+                  "USER_ID" INTEGER NOT NULL,
+                  "CONV_ID" INTEGER NOT NULL,
+                  "STATUS" TEXT NOT NULL,
+                  "RESULT" TEXT,
+                  "ATTEMPTS" INTEGER NOT NULL DEFAULT 0,
+                  "LEASE_EXPIRES_AT" REAL,
+                  "CREATED_AT" REAL NOT NULL,
+                  "UPDATED_AT" REAL NOT NULL
+                )
+                """
+            )
+            db.execute(
+                "CREATE INDEX IF NOT EXISTS generation_jobs_status "
+                + "ON generation_jobs (STATUS, CREATED_AT)"
+            )
+            db.execute(
+                "CREATE INDEX IF NOT EXISTS generation_jobs_conversation "
+                + "ON generation_jobs (USER_ID, CONV_ID, STATUS)"
+            )
+            self._local.db = db
+            self._local.pid = os.getpid()
+
+        return self._local.db
+
+    def reserve(self, user_id: int, conv_id: int) -> Optional[str]:
+        """
+        Creates a job for a conversation, to be enqueued once the user's message is
+        stored. Reserved jobs of a request that died are claimed after their lease.
+
+        Args:
+            user_id (int): The ID of the user.
+            conv_id (int): Conversation id
+
+        Returns:
+            str: Id of the job, or None if the conversation has an unfinished job.
+        """
+        db = self._get_db()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            now = time.time()
+            unfinished = db.execute(
+                "SELECT 1 FROM generation_jobs "
+                + "WHERE USER_ID = ? AND CONV_ID = ? AND STATUS IN (?, ?, ?)",
+                (user_id, conv_id, RESERVED, QUEUED, RUNNING),
+            ).fetchone()
+            if unfinished is not None:
+                db.execute("COMMIT")
+                return None
+
+            job_id = uuid.uuid4().hex
+            db.execute(
+                """
+                INSERT INTO generation_jobs (
+                    ID, USER_ID, CONV_ID, STATUS, LEASE_EXPIRES_AT, CREATED_AT,
+                    UPDATED_AT
+                )
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                """,
+                (job_id, user_id, conv_id, RESERVED, now + self._lease, now, now),
+            )
+            db.execute("COMMIT")
+            return job_id
+        except Exception:
+            db.execute("ROLLBACK")
+            raise
+
+    def enqueue(self, job_id: str) -> None:
+        """
+        Makes a reserved job available to the job workers.
+
+        Args:
+            job_id (str): Id of the job.
+        """
+        self._get_db().execute(
+            "UPDATE generation_jobs SET STATUS = ?, UPDATED_AT = ? "
+            + "WHERE ID = ? AND STATUS = ?",
+            (QUEUED, time.time(), job_id, RESERVED),
+        )
+        METRICS.increment("job_queue.enqueued")
+
+    def cancel(self, job_id: str) -> None:
+        """
+        Removes a reserved job whose message could not be stored.
+
+        Args:
+            job_id (str): Id of the job.
+        """
+        self._get_db().execute(
+            "DELETE FROM generation_jobs WHERE ID = ? AND STATUS = ?",
+            (job_id, RESERVED),
+        )
+
+    def claim(self) -> Optional[dict]:
+        """
+        Leases the oldest job that is queued, or whose worker (or request) died,
+        removing expired finished jobs.
+
+        Returns:
+            dict: {"id":, "user_id":, "conv_id":, "attempts":} of the job, or None
+            if no job is available.
+        """
+        db = self._get_db()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            now = time.time()
+            db.execute(
+                "DELETE FROM generation_jobs "
+                + "WHERE STATUS IN (?, ?) AND UPDATED_AT <= ?",
+                (DONE, FAILED, now - self._ttl),
+            )
+
+            while True:
+                row = db.execute(
+                    """
+                    SELECT ID, USER_ID, CONV_ID, ATTEMPTS FROM generation_jobs
+                    WHERE STATUS = ?
+                    OR (STATUS IN (?, ?) AND LEASE_EXPIRES_AT <= ?)
+                    ORDER BY CREATED_AT
+                    LIMIT 1
+                    """,
+                    (QUEUED, RESERVED, RUNNING, now),
+                ).fetchone()
+                if row is None:
+                    db.execute("COMMIT")
+                    return None
+
+                job_id, user_id, conv_id, attempts = row
+                if attempts < self._max_attempts:
+                    break
+
+                # Give up on jobs that keep killing their workers
+                LOGGER.error(f"Job {job_id} failed after {attempts} attempts!")
+                METRICS.increment("job_queue.abandoned")
+                db.execute(
+                    "UPDATE generation_jobs SET STATUS = ?, UPDATED_AT = ? "
+                    + "WHERE ID = ?",
+                    (FAILED, now, job_id),
+                )
+
+            db.execute(
+                """
+                UPDATE generation_jobs
+                SET STATUS = ?, ATTEMPTS = ATTEMPTS + 1, LEASE_EXPIRES_AT = ?,
+                    UPDATED_AT = ?
+                WHERE ID = ?
+                """,
+                (RUNNING, now + self._lease, now, job_id),
+            )
+            db.execute("COMMIT")
+            return {
+                "id": job_id,
+                "user_id": user_id,
+                "conv_id": conv_id,
+                "attempts": attempts + 1,
+            }
+        except Exception:
+            db.execute("ROLLBACK")
+            raise
+
+    def owns(self, job: dict) -> bool:
+        """
+        Checks whether a claimed job is still running as the given attempt, i.e. it
+        was not claimed again after the lease of the attempt expired.
+
+        Args:
+            job (dict): Job returned by claim.
+
+        Returns:
+            bool: True if the attempt may still store the reply.
+        """
+        row = self._get_db().execute(
+            "SELECT 1 FROM generation_jobs "
+            + "WHERE ID = ? AND STATUS = ? AND ATTEMPTS = ?",
+            (job["id"], RUNNING, job["attempts"]),
+        ).fetchone()
+        return row is not None
+
+    def finish(self, job: dict, result: dict) -> bool:
+        """
+        Stores the result of a job, unless the job was taken over by another
+        attempt.
+
+        Args:
+            job (dict): Job returned by claim.
+            result (dict): Reply of the job, see ChatManager.generate_reply.
+
+        Returns:
+            bool: True if the result was stored.
+        """
+        status = FAILED if result.get("error") else DONE
+        cursor = self._get_db().execute(
+            "UPDATE generation_jobs SET STATUS = ?, RESULT = ?, UPDATED_AT = ? "
+            + "WHERE ID = ? AND STATUS = ? AND ATTEMPTS = ?",
+            (
+                status,
+                json.dumps(result),
+                time.time(),
+                job["id"],
+                RUNNING,
+                job["attempts"],
+            ),
+        )
+        if cursor.rowcount == 0:
+            LOGGER.warning(f"Job {job['id']} was taken over, dropping its result.")
+            METRICS.increment("job_queue.superseded")
+            return False
+
+        METRICS.increment(f"job_queue.{status}")
+        return True
+
+    def get(self, user_id: int, job_id: str) -> Optional[dict]:
+        """
+        Looks up a job of a user.
+
+        Args:
+            user_id (int): The ID of the user.
+            job_id (str): Id of the job.
+
+        Returns:
+            dict: {"id":, "status":, "result":} of the job, where the result is None
+            until the job is finished, or None if the user has no such job.
+        """
+        row = self._get_db().execute(
+            "SELECT STATUS, RESULT FROM generation_jobs WHERE ID = ? AND USER_ID = ?",
+            (job_id, user_id),
+        ).fetchone()
+        if row is None:
+            return None
+
+        status, result = row
+        if status == RESERVED:
+            status = QUEUED
+        return {
+            "id": job_id,
+            "status": status,
+            "result": json.loads(result) if result is not None else None,
+        }
+
+
+class JobWorkerPool:
+    def __init__(self, app, queue: JobQueue, workers: int, poll_interval: float):
+        """
+        Threads claiming jobs from the queue and generating their replies.
+
+        Args:
+            app (Flask): Application whose context the jobs run in.
+            queue (JobQueue): Queue of the jobs.
+            workers (int): Number of worker threads.
+            poll_interval (float): Seconds an idle worker waits before polling.
+        """
+        self._app = app
+        self._queue: JobQueue = queue
+        self._workers: int = workers
+        self._poll_interval: float = poll_interval
+        self._stopped = threading.Event()
+
+    def run(self) -> None:
+        """
+        Runs the worker threads until stop is called (or the process is
+        interrupted).
+        """
+        threads = [
+            threading.Thread(target=self._work, name=f"job-worker-{i}", daemon=True)
+            for i in range(self._workers)
+        ]
+        for thread in threads:
+            thread.start()
+        try:
+            for thread in threads:
+                while thread.is_alive():
+                    thread.join(1.0)
+        except KeyboardInterrupt:
+            self.stop()
+
+    def stop(self) -> None:
+        """
+        Stops the workers once their current jobs are done.
+        """
+        self._stopped.set()
+
+    def _work(self) -> None:
+        """
+        Claims and runs jobs until stopped.
+        """
+        while not self._stopped.is_set():
+            try:
+                job = self._queue.claim()
+            except sqlite3.Error as e:
+                LOGGER.error(f"Cannot claim job! {e}")
+                job = None
+
+            if job is None:
+                self._stopped.wait(self._poll_interval)
+                continue
+
+            with self._app.app_context():
+                self._run_job(job)
+
+    def _run_job(self, job: dict) -> None:
+        """
+        Generates the reply of a job and stores its result. Errors fail the job,
+        and nothing is stored once the job was taken over by another attempt.
+
+        Args:
+            job (dict): Claimed job.
+        """
+        started = time.monotonic()
+        try:
+            chat_manager = ChatManager(
+                job["user_id"],
+                get_model(),
+                get_context_window(current_app.config),
+                get_summarizer(),
+            )
+            result = chat_manager.generate_reply(
+                job["conv_id"], lambda: self._queue.owns(job)
+            )
+        except Exception as e:
+            LOGGER.error(f"Job {job['id']} failed! {e}")
+            result = {
+                "content": ChatManager.ERROR_MESSAGE,
+                "id": job["conv_id"],
+                "error": True,
+            }
+
+        METRICS.observe("job_queue.run_seconds", time.monotonic() - started)
+        self._queue.finish(job, result)
+
+
+def create_job_queue(config: Mapping) -> JobQueue:
+    """
+    Creates the job queue of the JOB_* settings.
+
+    Args:
+        config (Mapping): Application configuration (usually current_app.config).
+
+    Returns:
+        JobQueue: Queue shared by every worker.
+    """
+    return JobQueue(
+        config["JOB_QUEUE_PATH"],
+        config["JOB_LEASE"],
+        config["JOB_MAX_ATTEMPTS"],
+        config["JOB_RESULT_TTL"],
+        config,
+    )
+
+
+def get_job_queue() -> JobQueue:
+    """
+    Returns the job queue of the current application, creating it on first use.
+
+    Returns:
+        JobQueue: Shared queue.
+    """
+    extensions = current_app.extensions
+    if "job_queue" not in extensions:
+        with _lock:
+            if "job_queue" not in extensions:
+                extensions["job_queue"] = create_job_queue(current_app.config)
+
+    return extensions["job_queue"]
+
+
+@click.command(name="run-job-workers")
+@click.option("--workers", type=int, default=None, help="Number of worker threads.")
+def run_job_workers_command(workers: Optional[int]) -> None:
+    """
+    Command to run the job workers generating replies until interrupted.
+    """
+    config = current_app.config
+    workers = workers or config["JOB_WORKERS"]
+    click.echo(f"Running {workers} job workers.")
+    JobWorkerPool(
+        current_app._get_current_object(),
+        get_job_queue(),
+        workers,
+        config["JOB_POLL_INTERVAL"],
+    ).run()
+
+
+def init_app(app) -> None:
+    """
+    Registers the job worker command on the given Flask application instance.
+
+    Args:
+        app (Flask): the Flask application instance to configure.
+    """
+    app.cli.add_command(run_job_workers_command)
@@ -0,0 +1,108 @@
+"""
+metrics.py
+
+Author: Tim Duggan
+Date: 10/18/2026
+Company: ImposterAI
+Contact: csw73@cornell.edu
+
+In-process metrics of the worker (counters and value summaries), exposed through
+the /backend/metrics endpoint. Every worker process reports its own values.
+"""
+# region Imports
+import collections
+import threading
+
+# endregion
+
+# Number of most recent values of a summary its percentiles are computed from
+SUMMARY_WINDOW = 1000
+
+
+class Metrics:
+    def __init__(self) -> None:
+        """
+        Thread-safe registry of named counters and summaries.
+        """
+        self._lock = threading.Lock()
+        self._counters: dict = {}
+        self._summaries: dict = {}
+
+    def increment(self, name: str, value: int = 1) -> None:
+        """
+        Increments a counter, creating it on first use.
+
+        Args:
+            name (str): Counter name.
+            value (int): Amount to add.
+        """
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def observe(self, name: str, value: float) -> None:
+        """
+        Records a value (e.g. a latency in seconds) in a summary, creating it on first
+        use.
+
+        Args:
+            name (str): Summary name.
+            value (float): Observed value.
+        """
+        with self._lock:
+            summary = self._summaries.setdefault(
+                name,
+                {
+                    "count": 0,
+                    "sum": 0.0,
+                    "max": 0.0,
+                    "recent": collections.deque(maxlen=SUMMARY_WINDOW),
+                },
+            )
+            summary["count"] += 1
+            summary["sum"] += value
+            summary["max"] = max(summary["max"], value)
+            summary["recent"].append(value)
+
+    def get_counter(self, name: str) -> int:
+        """
+        Retrieves the value of a counter.
+
+        Args:
+            name (str): Counter name.
+
+        Returns:
+            int: Counter value, 0 if it was never incremented.
+        """
+        with self._lock:
+            return self._counters.get(name, 0)
+
+    def snapshot(self) -> dict:
+        """
+        Copies the current values of every metric.
+
+        Returns:
+            dict: {"counters": {name: value}, "summaries": {name: {"count":, "sum":,
+            "max":, "p50":, "p95":, "p99":}}} where the percentiles cover the most
+            recent SUMMARY_WINDOW values.
+        """
+        with self._lock:
+            summaries = {}
+            for name, summary in self._summaries.items():
+                recent = sorted(summary["recent"])
+                summaries[name] = {
+                    "count": summary["count"],
+                    "sum": summary["sum"],
+                    "max": summary["max"],
+                    **{
+                        f"p{percentile}": recent[
+                            min(len(recent) - 1, len(recent) * percentile // 100)
+                        ]
+                        for percentile in (50, 95, 99)
+                    },
+                }
+
+            return {"counters": dict(self._counters), "summaries": summaries}
+
+
+# Metrics of the current worker process
+METRICS = Metrics()
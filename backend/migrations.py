@@ -0,0 +1,280 @@
+"""
+migrations.py
+
+Author: Tim Duggan
+Date: 10/18/2026
+Company: ImposterAI
+Contact: csw73@cornell.edu
+
+Incremental schema migrations for existing ImposterAI databases.
+
+Every database stores the number of migrations applied to it in SQLite's
+'user_version' pragma. Freshly initialized databases (see schema.sql) already contain
+the latest schema and are stamped with the length of MIGRATIONS, while older
+databases are brought up to date one migration at a time.
+"""
+# region Imports
+from sqlite3 import Connection
+from typing import Callable, List
+
+# endregion
+
+# region Backend Imports
+from backend.logger import LOGGER
+from backend.utils import compile_system_prompt, deserialize_json
+
+# endregion
+
+
+# region Migrations
+def _split_chat_blobs_into_messages(db: Connection) -> None:
+    """
+    Moves every serialized conversation in chats.MESSAGES into one row per message in
+    the messages table, then rebuilds the chats table without the MESSAGES column.
+
+    Args:
+        db (Connection): Connection to the database being migrated.
+    """
+    # [1] Create the normalized messages table
+    db.execute(
+        """
+        CREATE TABLE messages (
+          "USER_ID" INTEGER NOT NULL,
+          "PERSONALITY_ID" INTEGER NOT NULL,
+          "SEQ" INTEGER NOT NULL,
+          "ROLE" TEXT NOT NULL,
+          "CONTENT" TEXT NOT NULL,
+          "CREATED_AT" TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+          PRIMARY KEY ("USER_ID", "PERSONALITY_ID", "SEQ"),
+          FOREIGN KEY ("USER_ID", "PERSONALITY_ID")
+            REFERENCES chats ("USER_ID", "PERSONALITY_ID")
+        ) WITHOUT ROWID
+        """
+    )
+
+    # [2] Copy every message of every stored conversation into its own row
+    chat_rows = db.execute(
+        "SELECT USER_ID, PERSONALITY_ID, MESSAGES FROM chats"
+    ).fetchall()
+    for user_id, personality_id, messages in chat_rows:
+        db.executemany(
+            """
+            INSERT INTO messages (USER_ID, PERSONALITY_ID, SEQ, ROLE, CONTENT)
+            VALUES (?, ?, ?, ?, ?)
+            """,
+            [
+                (user_id, personality_id, seq, message["role"], message["content"])
+                for seq, message in enumerate(deserialize_json(messages))
+            ],
+        )
+
+    # [3] Rebuild chats without the serialized MESSAGES column
+    db.execute(
+        """
+        CREATE TABLE chats_migrated (
+          "ID" INTEGER PRIMARY KEY AUTOINCREMENT,
+          "USER_ID" INTEGER NOT NULL,
+          "PERSONALITY_ID" INTEGER NOT NULL,
+          UNIQUE ("USER_ID", "PERSONALITY_ID"),
+          FOREIGN KEY ("USER_ID") REFERENCES users ("ID"),
+          FOREIGN KEY ("PERSONALITY_ID") REFERENCES personalities ("ID")
+        )
+        """
+    )
+    db.execute(
+        """
+        INSERT INTO chats_migrated (ID, USER_ID, PERSONALITY_ID)
+        SELECT ID, USER_ID, PERSONALITY_ID FROM chats
+        """
+    )
+    db.execute("DROP TABLE chats")
+    db.execute("ALTER TABLE chats_migrated RENAME TO chats")
+
+    LOGGER.info(f"Migrated {len(chat_rows)} conversations into the messages table.")
+
+
+def _add_chat_previews(db: Connection) -> None:
+    """
+    Adds the denormalized last message preview columns to the chats table and fills
+    them from the messages table.
+
+    Args:
+        db (Connection): Connection to the database being migrated.
+    """
+    # [1] Add preview columns
+    db.execute('ALTER TABLE chats ADD COLUMN "LAST_MESSAGE" TEXT')
+    db.execute('ALTER TABLE chats ADD COLUMN "LAST_MESSAGE_AT" TEXT')
+    db.execute(
+        'ALTER TABLE chats ADD COLUMN "MESSAGE_COUNT" INTEGER NOT NULL DEFAULT 0'
+    )
+
+    # [2] Backfill previews from the latest message of every conversation
+    db.execute(
+        """
+        UPDATE chats
+        SET
+            LAST_MESSAGE = (
+                SELECT CONTENT FROM messages
+                WHERE messages.USER_ID = chats.USER_ID
+                    AND messages.PERSONALITY_ID = chats.PERSONALITY_ID
+                ORDER BY SEQ DESC LIMIT 1
+            ),
+            LAST_MESSAGE_AT = (
+                SELECT CREATED_AT FROM messages
+                WHERE messages.USER_ID = chats.USER_ID
+                    AND messages.PERSONALITY_ID = chats.PERSONALITY_ID
+                ORDER BY SEQ DESC LIMIT 1
+            ),
+            MESSAGE_COUNT = (
+                SELECT COUNT(*) FROM messages
+                WHERE messages.USER_ID = chats.USER_ID
+                    AND messages.PERSONALITY_ID = chats.PERSONALITY_ID
+            )
+        """
+    )
+
+
+def _add_generations(db: Connection) -> None:
+    """
+    Adds the generations table holding the counters used to invalidate the worker
+    caches, starting with the personality generation.
+
+    Args:
+        db (Connection): Connection to the database being migrated.
+    """
+    db.execute(
+        """
+        CREATE TABLE generations (
+          "NAME" TEXT PRIMARY KEY,
+          "VALUE" INTEGER NOT NULL DEFAULT 0
+        )
+        """
+    )
+    db.execute("INSERT INTO generations (NAME) VALUES ('personalities')")
+
+
+def _add_compiled_system_prompts(db: Connection) -> None:
+    """
+    Adds the precompiled system message and its token count to the personalities
+    table and compiles them for every existing personality.
+
+    Args:
+        db (Connection): Connection to the database being migrated.
+    """
+    # [1] Add compiled system prompt columns
+    db.execute(
+        "ALTER TABLE personalities ADD COLUMN SYSTEM_MESSAGE TEXT NOT NULL DEFAULT ('')"
+    )
+    db.execute(
+        "ALTER TABLE personalities ADD COLUMN SYSTEM_TOKENS INTEGER NOT NULL DEFAULT 0"
+    )
+
+    # [2] Compile the system prompt of every personality
+    personality_rows = db.execute("SELECT ID, SYSTEM_PROMPT FROM personalities")
+    for personality_id, system_prompt in personality_rows.fetchall():
+        db.execute(
+            """
+            UPDATE personalities
+            SET SYSTEM_MESSAGE = ?, SYSTEM_TOKENS = ?
+            WHERE ID = ?
+            """,
+            (*compile_system_prompt(deserialize_json(system_prompt)), personality_id),
+        )
+
+    # [3] Invalidate personality caches of running workers
+    db.execute("UPDATE generations SET VALUE = VALUE + 1 WHERE NAME = 'personalities'")
+
+
+def _add_message_encoding(db: Connection) -> None:
+    """
+    Adds the per message content encoding used for compressed contents. Existing
+    messages keep a NULL encoding, i.e. plain text.
+
+    Args:
+        db (Connection): Connection to the database being migrated.
+    """
+    db.execute('ALTER TABLE messages ADD COLUMN "ENCODING" TEXT')
+
+
+def _add_chat_summaries(db: Connection) -> None:
+    """
+    Adds the running summary of older messages to the chats table. SUMMARY_COUNT is
+    the number of leading messages folded into the summary.
+
+    Args:
+        db (Connection): Connection to the database being migrated.
+    """
+    db.execute('ALTER TABLE chats ADD COLUMN "SUMMARY" TEXT')
+    db.execute(
+        'ALTER TABLE chats ADD COLUMN "SUMMARY_COUNT" INTEGER NOT NULL DEFAULT 0'
+    )
+
+
+# Ordered list of migrations. Never reorder or remove entries, only append new ones.
+MIGRATIONS: List[Callable[[Connection], None]] = [
+    _split_chat_blobs_into_messages,
+    _add_chat_previews,
+    _add_generations,
+    _add_compiled_system_prompts,
+    _add_message_encoding,
+    _add_chat_summaries,
+]
+
+# endregion
+
+
+# region Migration Runner
+def get_schema_version(db: Connection) -> int:
+    """
+    Retrieves the number of migrations applied to the database.
+
+    Args:
+        db (Connection): Database connection.
+
+    Returns:
+        int: Schema version stored in the 'user_version' pragma.
+    """
+    return db.execute("PRAGMA user_version").fetchone()[0]
+
+
+def stamp_schema_version(db: Connection) -> None:
+    """
+    Marks a freshly initialized database as having every migration applied.
+
+    Args:
+        db (Connection): Database connection.
+    """
+    db.execute(f"PRAGMA user_version = {len(MIGRATIONS)}")
+    db.commit()
+
+
+def migrate_db(db: Connection) -> int:
+    """
+    Applies all pending migrations to the database. Each migration runs in its own
+    transaction together with the update of the schema version, so an interrupted
+    migration can simply be re-run.
+
+    Args:
+        db (Connection): Database connection.
+
+    Returns:
+        int: Number of migrations that were applied.
+    """
+    applied = 0
+    for version in range(get_schema_version(db), len(MIGRATIONS)):
+        migration = MIGRATIONS[version]
+        LOGGER.info(f"Applying migration {version + 1}: {migration.__name__}")
+        try:
+            db.execute("BEGIN")
+            migration(db)
+            db.execute(f"PRAGMA user_version = {version + 1}")
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        applied += 1
+
+    return applied
+
+
+# endregion
@@ -0,0 +1,189 @@
+"""
+model_factory.py
+
+Author: Christian Welling
+Date: 10/18/2026
+Company: ImposterAI
+Contact: csw73@cornell.edu
+
+Creates the AI model used to answer user messages, as selected by the MODEL_*
+settings of the configuration (possibly a router over a fallback chain of
+models), and the conversation summarizer using it. Both are created once per
+application and shared by every request, so long-lived clients (and their
+connection pools) are reused.
+"""
+# region General/API Imports
+import threading
+from typing import Mapping, Optional
+from flask import current_app
+
+# endregion
+
+# region Backend Imports
+from backend.ai_model import AIModel
+from backend.async_gpt_model import AsyncGPTModel
+from backend.context_window import DEFAULT_CONTEXT_TOKENS
+from backend.fake_model import FakeModel, create_fake_profile
+from backend.gpt_model import GPTModel
+from backend.model_router import ModelRouter, Route
+from backend.rate_limiter import RateLimitedModel, create_scheduler
+from backend.resilient_model import CircuitBreaker, ResilientModel
+from backend.response_cache import CachedModel, create_response_cache
+from backend.summarizer import ConversationSummarizer, create_summarizer
+
+# endregion
+
+_lock = threading.Lock()
+
+
+def create_model(config: Mapping) -> AIModel:
+    """
+    Creates the model selected by the configuration: the client of MODEL_ID or,
+    with MODEL_FALLBACKS, a router over the clients of every model in the chain.
+    Every client has its own view of the optional response cache, keyed by its
+    model, so a reply of a fallback model is never replayed as the primary's.
+
+    Args:
+        config (Mapping): Application configuration (usually current_app.config).
+
+    Returns:
+        AIModel: New model instance.
+    """
+    cache = create_response_cache(config) if config["RESPONSE_CACHE"] else None
+    if config["MODEL_FALLBACKS"]:
+        model_ids = [config["MODEL_ID"], *config["MODEL_FALLBACKS"]]
+        routes = []
+        for i, model_id in enumerate(model_ids):
+            # Every model but the last gives up early to leave time for fallbacks
+            deadline = config["MODEL_REQUEST_DEADLINE"]
+            if i < len(model_ids) - 1:
+                deadline = min(deadline, config["MODEL_ROUTE_DEADLINE"])
+            route_config = {
+                **config,
+                "MODEL_ID": model_id,
+                "MODEL_REQUEST_DEADLINE": deadline,
+            }
+            routes.append(
+                Route(
+                    model_id,
+                    create_client(route_config, cache),
+                    config["MODEL_CONTEXT_TOKENS"].get(
+                        model_id, DEFAULT_CONTEXT_TOKENS
+                    ),
+                )
+            )
+
+        model = ModelRouter(
+            routes,
+            config["MODEL_ROUTE_PREFERENCES"],
+            config["MODEL_RESPONSE_TOKENS"],
+            config["MODEL_ROUTE_LATENCY_TARGET"],
+            config["MODEL_ROUTE_MAX_ERROR_RATE"],
+            config["MODEL_REQUEST_DEADLINE"],
+        )
+    else:
+        model = create_client(config, cache)
+
+    return model
+
+
+def create_client(config: Mapping, cache=None) -> AIModel:
+    """
+    Creates the client of MODEL_ID selected by the configuration, wrapped by the
+    optional rate limiter (innermost, so every attempt is counted), the resilience
+    layer and the response cache (outermost, so hits skip everything).
+
+    Args:
+        config (Mapping): Application configuration (usually current_app.config).
+        cache (MemoryResponseCache | SqliteResponseCache):
+            Response cache shared by every client, or None to disable caching.
+
+    Returns:
+        AIModel: New model instance.
+    """
+    client = config["MODEL_CLIENT"]
+    if client == "aiohttp":
+        model = AsyncGPTModel(config)
+    elif client == "openai":
+        model = GPTModel()
+        model.set_model(config["MODEL_ID"])
+    elif client == "fake":
+        model = FakeModel(create_fake_profile(config))
+    else:
+        raise ValueError(f"Unknown model client: {client}")
+
+    rate_limits = (
+        config["RATE_LIMIT_REQUESTS_PER_MINUTE"],
+        config["RATE_LIMIT_TOKENS_PER_MINUTE"],
+    )
+    if any(rate_limits):
+        model = RateLimitedModel(
+            model,
+            create_scheduler(config),
+            config["MODEL_RESPONSE_TOKENS"],
+            config["RATE_LIMIT_MAX_WAIT"],
+        )
+
+    if config["MODEL_RETRIES"] is not None:
+        model = ResilientModel(
+            model,
+            config["MODEL_RETRIES"],
+            config["MODEL_RETRY_BASE_DELAY"],
+            config["MODEL_RETRY_MAX_DELAY"],
+            config["MODEL_REQUEST_DEADLINE"],
+            CircuitBreaker(
+                config["MODEL_CIRCUIT_FAILURES"], config["MODEL_CIRCUIT_RESET"]
+            ),
+            config["MODEL_HEDGING"],
+            config["MODEL_HEDGE_MIN_DELAY"],
+            config["MODEL_HEDGE_PERCENTILE"],
+            config["MODEL_REQUEST_WORKERS"],
+        )
+
+    if cache is not None:
+        model = CachedModel(
+            model,
+            cache,
+            config["RESPONSE_CACHE_PERSONALITIES"],
+            {"model": config["MODEL_ID"]},
+        )
+
+    return model
+
+
+def get_model() -> AIModel:
+    """
+    Returns the model shared by every request of the current application, creating
+    it on first use.
+
+    Returns:
+        AIModel: Shared model instance.
+    """
+    extensions = current_app.extensions
+    if "model" not in extensions:
+        with _lock:
+            if "model" not in extensions:
+                extensions["model"] = create_model(current_app.config)
+
+    return extensions["model"]
+
+
+def get_summarizer() -> Optional[ConversationSummarizer]:
+    """
+    Returns the conversation summarizer shared by every request of the current
+    application, creating it on first use.
+
+    Returns:
+        ConversationSummarizer: Shared summarizer, or None if CHAT_SUMMARIES is off.
+    """
+    if not current_app.config["CHAT_SUMMARIES"]:
+        return None
+
+    extensions = current_app.extensions
+    if "summarizer" not in extensions:
+        model = get_model()
+        with _lock:
+            if "summarizer" not in extensions:
+                extensions["summarizer"] = create_summarizer(model, current_app.config)
+
+    return extensions["summarizer"]
@@ -0,0 +1,288 @@
+"""
+model_router.py
+
+Author: Christian Welling
+Date: 10/18/2026
+Company: ImposterAI
+Contact: csw73@cornell.edu
+
+Latency-aware routing of model requests over a fallback chain of models (see
+MODEL_FALLBACKS in config.py).
+
+For every request the router orders the configured models by preference (the
+personality's preferred model first, then the primary MODEL_ID, then the
+fallbacks in order), skips models whose context is too small for the prompt and
+moves models that are currently slow or failing to the end. The request is sent to
+the first model and falls back to the next one when it fails or exceeds its
+deadline. All models share the deadline of the request: every model is given the
+time left as its timeout, and no further model is tried once it is used up. Every
+decision is counted in the metrics registry.
+"""
+# region General/API Imports
+import collections
+import threading
+import time
+from typing import Generator, List, Mapping
+
+# endregion
+
+# region Backend Imports
+from backend.ai_model import AIModel, start_deadline
+from backend.context_window import count_message_tokens
+from backend.logger import LOGGER
+from backend.metrics import METRICS
+
+# endregion
+
+
+class RouteStats:
+    def __init__(self, window: float = 60.0) -> None:
+        """
+        Outcomes and latencies of a model's recent requests. Requests older than the
+        window are forgotten, so a model tried last after failures gets traffic again
+        once it had time to recover.
+
+        Args:
+            window (float): Seconds of recent requests considered.
+        """
+        self._window: float = window
+        self._lock = threading.Lock()
+        # (monotonic time, success, latency) of recent requests, oldest first
+        self._requests: collections.deque = collections.deque()
+
+    def record(self, success: bool, latency: float) -> None:
+        """
+        Records the outcome of a request.
+
+        Args:
+            success (bool): Whether the model responded.
+            latency (float): Duration of the request in seconds.
+        """
+        with self._lock:
+            self._requests.append((time.monotonic(), success, latency))
+
+    def error_rate(self) -> float:
+        """
+        Returns:
+            float: Share of recent requests that failed (0 without requests).
+        """
+        with self._lock:
+            self._expire()
+            if not self._requests:
+                return 0.0
+            failures = sum(not success for _, success, _ in self._requests)
+            return failures / len(self._requests)
+
+    def p95_latency(self) -> float:
+        """
+        Returns:
+            float: 95th percentile latency of recent successful requests in
+            seconds (0 with fewer than 10 samples).
+        """
+        with self._lock:
+            self._expire()
+            latencies = sorted(
+                latency for _, success, latency in self._requests if success
+            )
+            if len(latencies) < 10:
+                return 0.0
+            return latencies[len(latencies) * 95 // 100]
+
+    def _expire(self) -> None:
+        """
+        Forgets requests older than the window. Must be called while holding the
+        lock.
+        """
+        horizon = time.monotonic() - self._window
+        while self._requests and self._requests[0][0] < horizon:
+            self._requests.popleft()
+
+
+class Route:
+    def __init__(self, model_id: str, model: AIModel, context_tokens: int) -> None:
+        """
+        A model the router can send requests to.
+
+        Args:
+            model_id (str): Id of the model.
+            model (AIModel): Model instance (including its own resilience layer).
+            context_tokens (int): Context size of the model in tokens.
+        """
+        self.model_id: str = model_id
+        self.model: AIModel = model
+        self.context_tokens: int = context_tokens
+        self.stats: RouteStats = RouteStats()
+
+
+class ModelRouter(AIModel):
+    def __init__(
+        self,
+        routes: List[Route],
+        preferences: Mapping[int, str] = None,
+        response_tokens: int = 0,
+        latency_target: float = None,
+        max_error_rate: float = 0.5,
+        deadline: float = 60.0,
+    ) -> None:
+        """
+        Routes requests over a fallback chain of models.
+
+        Args:
+            routes (List[Route]): Models in order of preference.
+            preferences (Mapping[int, str]): Preferred model id by personality id.
+            response_tokens (int): Tokens reserved for the response.
+            latency_target (float):
+                Models whose recent p95 latency exceeds this many seconds are tried
+                last. None disables the latency check.
+            max_error_rate (float):
+                Models whose recent error rate exceeds this share are tried last.
+            deadline (float):
+                Maximum duration (seconds) of a request over all its models.
+        """
+        self._routes: List[Route] = routes
+        self._preferences: dict = dict(preferences or {})
+        self._response_tokens: int = response_tokens
+        self._latency_target: float = latency_target
+        self._max_error_rate: float = max_error_rate
+        self._deadline: float = deadline
+
+    def make_request(self, conversation_messages, **kwargs):
+        """
+        Sends the request to the best model, falling back to the next ones if it
+        fails.
+
+        Args:
+            conversation_messages (json): Input messages for the api call.
+            **kwargs: Request context (personality_id, user_id, timeout).
+
+        Returns:
+            The message response, or None if every model failed.
+        """
+        deadline = start_deadline(kwargs, self._deadline)
+        for route in self._select_routes(conversation_messages, kwargs):
+            started = time.monotonic()
+            if started >= deadline:
+                self._deadline_exceeded()
+                return None
+
+            resp = route.model.make_request(
+                conversation_messages, **kwargs, timeout=deadline - started
+            )
+            self._record(route, resp is not None, time.monotonic() - started)
+            if resp is not None:
+                return resp
+
+        LOGGER.error("Every routed model failed!")
+        return None
+
+    def stream_request(
+        self, conversation_messages, **kwargs
+    ) -> Generator[str, None, bool]:
+        """
+        Streams the response of the best model. Falls back to the next model if a
+        model fails before its first chunk. The latency of a streamed request is
+        the time to its first chunk.
+
+        Args:
+            conversation_messages (json): Input messages for the api call.
+            **kwargs: Request context (personality_id, user_id, timeout).
+
+        Yields:
+            str: Content chunks of the response.
+
+        Returns:
+            bool: True if the response was received completely.
+        """
+        deadline = start_deadline(kwargs, self._deadline)
+        for route in self._select_routes(conversation_messages, kwargs):
+            started = time.monotonic()
+            if started >= deadline:
+                self._deadline_exceeded()
+                return False
+
+            chunks = route.model.stream_request(
+                conversation_messages, **kwargs, timeout=deadline - started
+            )
+            first_chunk = next(chunks, None)
+            self._record(route, first_chunk is not None, time.monotonic() - started)
+            if first_chunk is not None:
+                yield first_chunk
+                return (yield from chunks)
+
+        LOGGER.error("Every routed model failed!")
+        return False
+
+    def _deadline_exceeded(self) -> None:
+        """
+        Records a request abandoned because its deadline passed before every model
+        was tried.
+        """
+        METRICS.increment("router.deadline_exceeded")
+        LOGGER.error("Model request deadline exceeded, not falling back further!")
+
+    def _select_routes(self, conversation_messages, context: dict) -> List[Route]:
+        """
+        Orders the models to try for a request.
+
+        Args:
+            conversation_messages (json): Input messages for the api call.
+            context (dict): Request context.
+
+        Returns:
+            List[Route]: Routes in the order they should be tried.
+        """
+        # [1] Personality preference first, then the configured order
+        preferred = self._preferences.get(context.get("personality_id"))
+        routes = sorted(self._routes, key=lambda route: route.model_id != preferred)
+
+        # [2] Skip models too small for the prompt (unless none is big enough)
+        tokens = self._response_tokens + sum(
+            count_message_tokens(message) for message in conversation_messages
+        )
+        fitting = [route for route in routes if route.context_tokens >= tokens]
+        for route in routes:
+            if route not in fitting:
+                METRICS.increment(f"router.skipped_context.{route.model_id}")
+        routes = fitting or [max(routes, key=lambda route: route.context_tokens)]
+
+        # [3] Try slow or failing models last
+        healthy = [route for route in routes if self._is_healthy(route)]
+        unhealthy = [route for route in routes if route not in healthy]
+        for route in unhealthy:
+            METRICS.increment(f"router.deprioritized.{route.model_id}")
+
+        return healthy + unhealthy
+
+    def _is_healthy(self, route: Route) -> bool:
+        """
+        Checks a model's recent error rate and latency.
+
+        Args:
+            route (Route): The model's route.
+
+        Returns:
+            bool: False if the model is currently failing or too slow.
+        """
+        if route.stats.error_rate() > self._max_error_rate:
+            return False
+        if self._latency_target is not None:
+            return route.stats.p95_latency() <= self._latency_target
+        return True
+
+    def _record(self, route: Route, success: bool, latency: float) -> None:
+        """
+        Records the outcome of a routed request in the route's statistics and the
+        metrics registry.
+
+        Args:
+            route (Route): The model's route.
+            success (bool): Whether the model responded.
+            latency (float): Duration of the request in seconds.
+        """
+        route.stats.record(success, latency)
+        METRICS.increment(f"router.requests.{route.model_id}")
+        if success:
+            METRICS.observe(f"router.latency.{route.model_id}", latency)
+        else:
+            METRICS.increment(f"router.fallbacks.{route.model_id}")
+            LOGGER.warning(f"Model {route.model_id} failed, falling back.")
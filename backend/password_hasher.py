@@ -0,0 +1,291 @@
+"""
+password_hasher.py
+
+Author: Tim Duggan
+Date: 10/18/2026
+Company: ImposterAI
+Contact: csw73@cornell.edu
+
+Password hashing of registrations and logins (see PASSWORD_HASH_* in config.py).
+
+Hashing a password is deliberately slow CPU work. Run on the request thread, a
+burst of sign-ups or login attempts would hold the worker's CPU (and the GIL) and
+starve the chat requests it serves, so hashes are computed by a small pool of
+processes instead:
+    pool        : PASSWORD_HASH_WORKERS processes per web worker (0 hashes on the
+                  request thread). gevent workers hash on gevent's threadpool
+                  instead (see SERVER_THREADPOOL): the process pool's manager
+                  thread and pipes are not safe under gevent's monkey patching,
+                  and the hash functions release the GIL, so threads suffice.
+    concurrency : at most PASSWORD_HASH_CONCURRENCY hashes per web worker are
+                  queued or running, further requests wait for a slot up to
+                  PASSWORD_HASH_WAIT seconds and are then rejected
+    method      : PASSWORD_HASH_METHOD, any werkzeug method with its cost (e.g.
+                  "pbkdf2:sha256:600000" or "scrypt:32768:8:1"). Stored hashes of
+                  another method are replaced on the next successful login.
+"""
+# region General/API Imports
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Mapping, Optional, Tuple
+
+from flask import current_app
+from werkzeug.security import (
+    DEFAULT_PBKDF2_ITERATIONS,
+    check_password_hash,
+    generate_password_hash,
+)
+
+# endregion
+
+# region Backend Imports
+from backend.metrics import METRICS
+from backend.utils import run_in_threadpool
+
+# endregion
+
+_lock = threading.Lock()
+
+
+# region Pool Functions
+def _hash_password(password: str, method: str) -> Tuple[str, float]:
+    """
+    Hashes a password, in a pool process.
+
+    Args:
+        password (str): The password.
+        method (str): werkzeug hash method.
+
+    Returns:
+        Tuple[str, float]: The hash and the seconds spent computing it.
+    """
+    started = time.perf_counter()
+    pwhash = generate_password_hash(password, method)
+    return pwhash, time.perf_counter() - started
+
+
+def _check_password(pwhash: str, password: str) -> Tuple[bool, float]:
+    """
+    Checks a password against its hash, in a pool process.
+
+    Args:
+        pwhash (str): The stored hash.
+        password (str): The password.
+
+    Returns:
+        Tuple[bool, float]: Whether the password matches and the seconds spent
+        checking it.
+    """
+    started = time.perf_counter()
+    matches = check_password_hash(pwhash, password)
+    return matches, time.perf_counter() - started
+
+
+# endregion
+
+
+def get_method_prefix(method: str) -> str:
+    """
+    Resolves a werkzeug hash method to the prefix ("method:params") of its hashes,
+    filling in werkzeug's default parameters (e.g. "scrypt" to "scrypt:32768:8:1").
+
+    Args:
+        method (str): werkzeug hash method.
+
+    Returns:
+        str: Prefix of the hashes of the method.
+
+    Raises:
+        ValueError: If the method has the wrong number of parameters.
+    """
+    name, *params = method.split(":")
+    if name == "scrypt":
+        if not params:
+            params = ["32768", "8", "1"]
+        elif len(params) != 3:
+            raise ValueError("'scrypt' takes 3 arguments.")
+        return ":".join([name, *(str(int(param)) for param in params)])
+
+    if name == "pbkdf2":
+        if len(params) > 2:
+            raise ValueError("'pbkdf2' takes 2 arguments.")
+        hash_name = params[0] if params else "sha256"
+        iterations = int(params[1]) if len(params) == 2 else DEFAULT_PBKDF2_ITERATIONS
+        return f"pbkdf2:{hash_name}:{iterations}"
+
+    return method
+
+
+class PasswordHashingBusyError(Exception):
+    """
+    Raised when a password cannot be hashed because too many hashes are pending.
+    """
+
+
+class PasswordHasher:
+    def __init__(
+        self,
+        method: str,
+        workers: int,
+        max_concurrency: int,
+        wait: float,
+        threadpool: bool = False,
+    ) -> None:
+        """
+        Hashes and checks passwords on a bounded process pool.
+
+        Args:
+            method (str): werkzeug hash method of new hashes, including its cost.
+            workers (int): Pool processes, or 0 to hash on the calling thread.
+            max_concurrency (int): Maximum hashes queued or running at once.
+            wait (float): Maximum seconds to wait for a free slot.
+            threadpool (bool):
+                Hash on gevent's threadpool instead of the process pool.
+        """
+        self._method: str = method
+        self._workers: int = workers
+        self._threadpool: bool = threadpool
+        self._wait: float = wait
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+
+        self._lock = threading.Lock()
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pool_pid: Optional[int] = None
+        # Prefix ("method:params") of the hashes of the configured method
+        self._method_prefix: str = get_method_prefix(method)
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        """
+        Returns the process pool of the calling worker process, starting it on first
+        use. Pool processes are spawned rather than forked, so they do not inherit
+        the worker's threads, locks or connections.
+
+        Returns:
+            ProcessPoolExecutor: The pool.
+        """
+        with self._lock:
+            if self._pool_pid != os.getpid():
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self._workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+                self._pool_pid = os.getpid()
+
+            return self._pool
+
+    def _run(self, function: Callable, *args) -> object:
+        """
+        Runs a hashing function within the concurrency cap, recording its queue time
+        (waiting for a slot and a pool process) and run time.
+
+        Args:
+            function (Callable): _hash_password or _check_password.
+            *args: Arguments of the function.
+
+        Returns:
+            object: Result of the function.
+
+        Raises:
+            PasswordHashingBusyError: If no slot is free within the wait time.
+        """
+        # [1] Take a slot
+        started = time.perf_counter()
+        if not self._slots.acquire(timeout=self._wait):
+            METRICS.increment("password_hash.rejected")
+            raise PasswordHashingBusyError("Too many pending password hashes.")
+
+        # [2] Hash on gevent's threadpool, the process pool, or inline without one
+        try:
+            if self._threadpool:
+                result, seconds = run_in_threadpool(function, *args)
+            elif self._workers > 0:
+                result, seconds = self._get_pool().submit(function, *args).result()
+            else:
+                result, seconds = function(*args)
+        finally:
+            self._slots.release()
+
+        METRICS.observe("password_hash.time", seconds)
+        METRICS.observe(
+            "password_hash.queue_time", time.perf_counter() - started - seconds
+        )
+        return result
+
+    def hash(self, password: str) -> str:
+        """
+        Hashes a password with the configured method.
+
+        Args:
+            password (str): The password.
+
+        Returns:
+            str: The hash to store.
+        """
+        return self._run(_hash_password, password, self._method)
+
+    def check(self, pwhash: str, password: str) -> bool:
+        """
+        Checks a password against its stored hash.
+
+        Args:
+            pwhash (str): The stored hash.
+            password (str): The password.
+
+        Returns:
+            bool: True if the password matches.
+        """
+        return self._run(_check_password, pwhash, password)
+
+    def needs_rehash(self, pwhash: str) -> bool:
+        """
+        Checks whether a stored hash was made with another method or cost than the
+        configured one, so it should be replaced.
+
+        Args:
+            pwhash (str): The stored hash.
+
+        Returns:
+            bool: True if the hash should be replaced.
+        """
+        return pwhash.split("$", 1)[0] != self._method_prefix
+
+
+def create_password_hasher(config: Mapping) -> PasswordHasher:
+    """
+    Creates the password hasher of the PASSWORD_HASH_* settings.
+
+    Args:
+        config (Mapping): Application configuration (usually current_app.config).
+
+    Returns:
+        PasswordHasher: Hasher of a worker process.
+    """
+    return PasswordHasher(
+        config["PASSWORD_HASH_METHOD"],
+        config["PASSWORD_HASH_WORKERS"],
+        config["PASSWORD_HASH_CONCURRENCY"],
+        config["PASSWORD_HASH_WAIT"],
+        config["SERVER_THREADPOOL"],
+    )
+
+
+def get_password_hasher() -> PasswordHasher:
+    """
+    Returns the password hasher of the current application, creating it on first
+    use.
+
+    Returns:
+        PasswordHasher: Shared hasher.
+    """
+    extensions = current_app.extensions
+    if "password_hasher" not in extensions:
+        with _lock:
+            if "password_hasher" not in extensions:
+                extensions["password_hasher"] = create_password_hasher(
+                    current_app.config
+                )
+
+    return extensions["password_hasher"]
@@ -0,0 +1,156 @@
+"""
+personality_cache.py
+
+Author: Christian Welling
+Date: 10/18/2026
+Company: ImposterAI
+Contact: csw73@cornell.edu
+
+Per-worker cache of parsed personality records.
+
+Personalities only change when ManagePersonalityDatabase.py or
+DatabaseManager.save_personality writes them, and both bump the 'personalities'
+generation counter in the generations table. Every worker compares its cached
+generation with the stored one (at most once per request) and reloads all
+personalities when they differ, so edits are picked up without a restart.
+"""
+# region General/API Imports
+import threading
+from collections import namedtuple
+from sqlite3 import Connection
+from flask import g, has_app_context
+
+# endregion
+
+# region Backend Imports
+from backend.utils import deserialize_json
+from backend.logger import LOGGER
+
+# endregion
+
+# Name of the generation counter bumped on every personality change
+PERSONALITY_GENERATION = "personalities"
+
+# Parsed personality record. system_prompt is a tuple of prompt strings,
+# system_message the precompiled system message dictionary sent to the model (None
+# without system prompt) and system_tokens its token count.
+Personality = namedtuple(
+    "Personality",
+    [
+        "id",
+        "name",
+        "system_prompt",
+        "intro_message",
+        "image_path",
+        "system_message",
+        "system_tokens",
+    ],
+)
+
+
+def bump_personality_generation(db: Connection) -> None:
+    """
+    Invalidates the personality caches of all workers. Must be executed in the same
+    transaction as the personality change itself.
+
+    Args:
+        db (Connection): Database connection used for the personality change.
+    """
+    db.execute(
+        "UPDATE generations SET VALUE = VALUE + 1 WHERE NAME = ?",
+        (PERSONALITY_GENERATION,),
+    )
+
+
+class PersonalityCache:
+    def __init__(self) -> None:
+        """
+        Caches every personality of the database, keyed by personality id.
+        """
+        self._lock = threading.Lock()
+        self._generation: int = None
+        self._personalities: dict = {}
+
+    def get_personalities(self, db: Connection) -> dict:
+        """
+        Fetches all personality records, reloading them if they changed since they
+        were cached.
+
+        Args:
+            db (Connection): Database connection.
+
+        Returns:
+            dict: Personality records keyed by personality id.
+        """
+        generation = self._stored_generation(db)
+        if generation != self._generation:
+            with self._lock:
+                if generation != self._generation:
+                    self._reload(db, generation)
+
+        return self._personalities
+
+    def _stored_generation(self, db: Connection) -> int:
+        """
+        Reads the stored personality generation. Within a request the value is only
+        read once.
+
+        Args:
+            db (Connection): Database connection.
+
+        Returns:
+            int: Current personality generation.
+        """
+        if has_app_context() and "personality_generation" in g:
+            return g.personality_generation
+
+        generation = db.execute(
+            "SELECT VALUE FROM generations WHERE NAME = ?", (PERSONALITY_GENERATION,)
+        ).fetchone()[0]
+
+        if has_app_context():
+            g.personality_generation = generation
+        return generation
+
+    def _reload(self, db: Connection, generation: int) -> None:
+        """
+        Loads and parses every personality from the database.
+
+        Args:
+            db (Connection): Database connection.
+            generation (int): Generation the loaded records belong to.
+        """
+        LOGGER.info(f"Loading personalities (generation {generation}).")
+        personality_rows = db.execute(
+            """
+            SELECT
+                ID, NAME, SYSTEM_PROMPT, INTRO_MESSAGE, IMAGE_PATH, SYSTEM_MESSAGE,
+                SYSTEM_TOKENS
+            FROM personalities
+            ORDER BY ID
+            """
+        ).fetchall()
+
+        personalities = {}
+        for row in personality_rows:
+            personality_id, name, system_prompt, intro_message, img = row[:5]
+            system_message, system_tokens = row[5:]
+            personalities[personality_id] = Personality(
+                personality_id,
+                name,
+                tuple(deserialize_json(system_prompt)),
+                intro_message,
+                img,
+                {"role": "system", "content": system_message}
+                if system_message
+                else None,
+                system_tokens,
+            )
+
+        # Swap in the new records before publishing their generation
+        self._personalities = personalities
+        self._generation = generation
+
+
+# Cache shared by every request of the worker
+PERSONALITY_CACHE = PersonalityCache()
@@ -0,0 +1,379 @@
+"""
+rate_limiter.py
+
+Author: Tim Duggan
+Date: 10/18/2026
+Company: ImposterAI
+Contact: csw73@cornell.edu
+
+Rate limiting of model requests (see RATE_LIMIT_* in config.py).
+
+Every worker shares the same API key, so the provider's requests and tokens per
+minute limits are enforced with token buckets stored in a local SQLite file that
+all workers update atomically. Within a worker, requests waiting for the buckets
+are served round-robin per user, so a single chatty user cannot starve the
+others. Requests that would wait longer than RATE_LIMIT_MAX_WAIT are rejected.
+"""
+# region General/API Imports
+import collections
+import os
+import sqlite3
+import threading
+import time
+from typing import Generator, Mapping, Optional
+
+# endregion
+
+# region Backend Imports
+from backend.ai_model import AIModel, ModelError
+from backend.context_window import count_message_tokens
+from backend.db import connect
+from backend.logger import LOGGER
+from backend.metrics import METRICS
+
+# endregion
+
+
+class TokenBuckets:
+    def __init__(
+        self, path: str, namespace: str, limits: Mapping[str, float], config: Mapping
+    ) -> None:
+        """
+        Token buckets shared by every worker through a SQLite file. Each bucket
+        holds up to a minute's worth of its limit and refills continuously.
+
+        Args:
+            path (str): Path to the bucket database file.
+            namespace (str): Prefix of the stored bucket names (the model id, as
+                providers limit every model separately).
+            limits (Mapping[str, float]):
+                Per minute limit of each bucket by name. Costs of other buckets are
+                ignored.
+            config (Mapping): Application configuration (usually current_app.config).
+        """
+        self._path: str = path
+        self._namespace: str = namespace
+        self._limits: dict = dict(limits)
+        self._config: Mapping = dict(config)
+        self._local = threading.local()
+
+    def _get_db(self) -> sqlite3.Connection:
+        """
+        Returns the calling thread's connection to the bucket database, creating
+        the bucket table on first use.
+
+        Returns:
+            Connection: Connection to the bucket database.
+        """
+        if getattr(self._local, "pid", None) != os.getpid():
+            db = connect(self._path, self._config)
+            db.isolation_level = None
+            db.execute(
+                """
+                CREATE TABLE IF NOT EXISTS rate_limit_buckets (
+                  "NAME" TEXT PRIMARY KEY,
+                  "TOKENS" REAL NOT NULL,
+                  "UPDATED_AT" REAL NOT NULL
+                )
+                """
+            )
+            self._local.db = db
+            self._local.pid = os.getpid()
+
+        return self._local.db
+
+    def try_acquire(self, costs: Mapping[str, float]) -> float:
+        """
+        Takes the given amounts from the buckets if all of them have enough.
+
+        Args:
+            costs (Mapping[str, float]): Amount to take from each bucket by name.
+
+        Returns:
+            float: 0 if the amounts were taken, else the seconds until the buckets
+            are expected to have enough.
+        """
+        # Unlimited buckets are not stored
+        costs = {name: cost for name, cost in costs.items() if name in self._limits}
+
+        db = self._get_db()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            now = time.time()
+            names = [self._stored_name(name) for name in costs]
+            stored = {
+                name: (tokens, updated_at)
+                for name, tokens, updated_at in db.execute(
+                    "SELECT NAME, TOKENS, UPDATED_AT FROM rate_limit_buckets "
+                    + f"WHERE NAME IN ({', '.join('?' for _ in names)})",
+                    names,
+                )
+            }
+
+            # [1] Refill every bucket for the time since its last update
+            levels = {}
+            wait = 0.0
+            for name, cost in costs.items():
+                limit = self._limits[name]
+                tokens, updated_at = stored.get(self._stored_name(name), (limit, now))
+                levels[name] = min(limit, tokens + (now - updated_at) * limit / 60)
+
+                # Requests larger than a bucket only wait for a full bucket
+                missing = min(cost, limit) - levels[name]
+                if missing > 0:
+                    wait = max(wait, missing * 60 / limit)
+
+            # [2] Take the costs only if every bucket has enough
+            if wait == 0:
+                for name, cost in costs.items():
+                    levels[name] -= min(cost, self._limits[name])
+
+            db.executemany(
+                """
+                INSERT OR REPLACE INTO rate_limit_buckets (NAME, TOKENS, UPDATED_AT)
+                VALUES (?, ?, ?)
+                """,
+                [
+                    (self._stored_name(name), tokens, now)
+                    for name, tokens in levels.items()
+                ],
+            )
+            db.execute("COMMIT")
+            return wait
+        except Exception:
+            db.execute("ROLLBACK")
+            raise
+
+    def _stored_name(self, name: str) -> str:
+        """
+        Prefixes a bucket name with the namespace.
+
+        Args:
+            name (str): Bucket name.
+
+        Returns:
+            str: Name of the stored bucket.
+        """
+        return f"{self._namespace}:{name}"
+
+
+class FairScheduler:
+    def __init__(self, buckets: TokenBuckets) -> None:
+        """
+        Queues requests waiting for the token buckets and lets them through
+        round-robin per user.
+
+        Args:
+            buckets (TokenBuckets): Buckets shared by every worker.
+        """
+        self._buckets: TokenBuckets = buckets
+        self._condition = threading.Condition()
+        # Waiting requests by user, in round-robin order of the users
+        self._queues: collections.OrderedDict = collections.OrderedDict()
+
+    def acquire(self, user_id, costs: Mapping[str, float], max_wait: float) -> bool:
+        """
+        Waits for the user's turn and until the buckets have enough for the
+        request, then takes the costs from them.
+
+        Args:
+            user_id: The ID of the user making the request (None for requests
+                without a user).
+            costs (Mapping[str, float]): Amount to take from each bucket by name.
+            max_wait (float): Maximum seconds to wait.
+
+        Returns:
+            bool: True if the request may be sent, False if it waited too long.
+        """
+        ticket = object()
+        started = time.monotonic()
+        deadline = started + max_wait
+
+        with self._condition:
+            self._queues.setdefault(user_id, collections.deque()).append(ticket)
+
+        try:
+            while True:
+                # [1] Wait until the request is the next one to be served
+                with self._condition:
+                    while self._next_ticket() is not ticket:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            return False
+                        self._condition.wait(remaining)
+
+                # [2] Take the costs, or wait until the buckets refilled enough. The
+                # limiter fails open, as the provider enforces its limits anyway.
+                try:
+                    wait = self._buckets.try_acquire(costs)
+                except sqlite3.Error as e:
+                    LOGGER.error(f"Cannot access rate limit buckets! {e}")
+                    wait = 0
+                if wait == 0:
+                    METRICS.observe(
+                        "rate_limiter.queue_seconds", time.monotonic() - started
+                    )
+                    return True
+
+                remaining = deadline - time.monotonic()
+                if wait > remaining:
+                    return False
+                time.sleep(wait)
+        finally:
+            self._dequeue(user_id, ticket)
+
+    def _next_ticket(self) -> Optional[object]:
+        """
+        Returns the request to serve next: the oldest request of the user whose
+        turn it is. Must be called while holding the condition.
+
+        Returns:
+            object: Ticket of the request, or None if no request is waiting.
+        """
+        for queue in self._queues.values():
+            return queue[0]
+        return None
+
+    def _dequeue(self, user_id, ticket: object) -> None:
+        """
+        Removes a served or abandoned request, moving its user to the end of the
+        round-robin order, and wakes up the other waiting requests.
+
+        Args:
+            user_id: The ID of the user making the request.
+            ticket (object): Ticket of the request.
+        """
+        with self._condition:
+            queue = self._queues[user_id]
+            queue.remove(ticket)
+            if queue:
+                self._queues.move_to_end(user_id)
+            else:
+                del self._queues[user_id]
+            self._condition.notify_all()
+
+
+class RateLimitedModel(AIModel):
+    def __init__(
+        self,
+        model: AIModel,
+        scheduler: FairScheduler,
+        response_tokens: int,
+        max_wait: float,
+    ) -> None:
+        """
+        Wraps a model, admitting requests within the shared rate limits.
+
+        Args:
+            model (AIModel): Wrapped model.
+            scheduler (FairScheduler): Scheduler of the worker.
+            response_tokens (int): Tokens counted for the response of a request.
+            max_wait (float): Maximum seconds a request waits before rejection.
+        """
+        self._model: AIModel = model
+        self._scheduler: FairScheduler = scheduler
+        self._response_tokens: int = response_tokens
+        self._max_wait: float = max_wait
+
+    @property
+    def raise_errors(self) -> bool:
+        """
+        Whether errors are raised as ModelError, shared with the wrapped model.
+        """
+        return self._model.raise_errors
+
+    @raise_errors.setter
+    def raise_errors(self, value: bool) -> None:
+        self._model.raise_errors = value
+
+    def make_request(self, conversation_messages, **kwargs):
+        """
+        Makes a request to the model once the rate limits admit it.
+
+        Args:
+            conversation_messages (json): Input messages for the api call.
+            **kwargs: Request context (personality_id, user_id, timeout).
+
+        Returns:
+            The message response, or None if there's an error.
+        """
+        if not self._admit(conversation_messages, kwargs):
+            return None
+        return self._model.make_request(conversation_messages, **kwargs)
+
+    def stream_request(
+        self, conversation_messages, **kwargs
+    ) -> Generator[str, None, bool]:
+        """
+        Makes a streaming request to the model once the rate limits admit it.
+
+        Args:
+            conversation_messages (json): Input messages for the api call.
+            **kwargs: Request context (personality_id, user_id, timeout).
+
+        Yields:
+            str: Content chunks of the response.
+
+        Returns:
+            bool: True if the response was received completely.
+        """
+        if not self._admit(conversation_messages, kwargs):
+            return False
+        return (yield from self._model.stream_request(conversation_messages, **kwargs))
+
+    def _admit(self, conversation_messages, context: dict) -> bool:
+        """
+        Waits for the request's turn within the rate limits. The wait counts
+        against the timeout of the request, which is shortened by it.
+
+        Args:
+            conversation_messages (json): Input messages for the api call.
+            context (dict): Request context, updated in place.
+
+        Returns:
+            bool: True if the request may be sent. Rejected requests raise a
+            ModelError instead if raise_errors is set.
+        """
+        tokens = self._response_tokens + sum(
+            count_message_tokens(message) for message in conversation_messages
+        )
+        started = time.monotonic()
+        max_wait = self._max_wait
+        if context.get("timeout") is not None:
+            max_wait = min(max_wait, context["timeout"])
+        if self._scheduler.acquire(
+            context.get("user_id"), {"requests": 1, "tokens": tokens}, max_wait
+        ):
+            if context.get("timeout") is not None:
+                context["timeout"] -= time.monotonic() - started
+            return True
+
+        METRICS.increment("rate_limiter.rejections")
+        if self.raise_errors:
+            raise ModelError("Model request rejected by the rate limiter!")
+        LOGGER.error("Model request rejected by the rate limiter!")
+        return False
+
+
+def create_scheduler(config: Mapping) -> FairScheduler:
+    """
+    Creates the scheduler for the RATE_LIMIT_* settings of the configuration. A
+    missing limit is treated as unlimited.
+
+    Args:
+        config (Mapping): Application configuration (usually current_app.config).
+
+    Returns:
+        FairScheduler: Scheduler using the shared token buckets.
+    """
+    limits = {
+        name: limit
+        for name, limit in (
+            ("requests", config["RATE_LIMIT_REQUESTS_PER_MINUTE"]),
+            ("tokens", config["RATE_LIMIT_TOKENS_PER_MINUTE"]),
+        )
+        if limit
+    }
+    return FairScheduler(
+        TokenBuckets(config["RATE_LIMIT_PATH"], config["MODEL_ID"], limits, config)
+    )
@@ -0,0 +1,416 @@
+"""
+resilient_model.py
+
+Author: Christian Welling
+Date: 10/18/2026
+Company: ImposterAI
+Contact: csw73@cornell.edu
+
+Resilience layer around any AI model (see MODEL_RETRIES and related settings in
+config.py):
+    retries      : retryable errors (rate limits, timeouts, unavailable service)
+                   are retried with jittered exponential backoff
+    deadline     : a request, including its retries, never takes longer than the
+                   configured deadline. Attempts receive the time left as their
+                   timeout, so the client aborts an attempt the deadline abandoned
+                   instead of leaving it to occupy an executor thread.
+    circuit      : after repeated upstream failures requests fail fast for a
+                   while instead of piling up on a service that is down
+    hedging      : optionally, a duplicate request is sent when the first one takes
+                   longer than the recent p95 latency, and the first response wins
+"""
+# region General/API Imports
+import collections
+import os
+import random
+import threading
+import time
+from concurrent import futures
+from typing import Generator
+
+# endregion
+
+# region Backend Imports
+from backend.ai_model import AIModel, ModelError, start_deadline
+from backend.logger import LOGGER
+from backend.metrics import METRICS
+
+# endregion
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold: int, reset_timeout: float) -> None:
+        """
+        Tracks consecutive upstream failures. The circuit opens after
+        failure_threshold failures and rejects requests for reset_timeout seconds,
+        then lets a single trial request through (half-open) which closes it again
+        on success.
+
+        Args:
+            failure_threshold (int): Consecutive failures opening the circuit.
+            reset_timeout (float): Seconds the circuit stays open.
+        """
+        self._failure_threshold: int = failure_threshold
+        self._reset_timeout: float = reset_timeout
+        self._lock = threading.Lock()
+        self._failures: int = 0
+        self._opened_at: float = None
+        self._trial_running: bool = False
+
+    def allow(self) -> bool:
+        """
+        Checks whether a request may be sent.
+
+        Returns:
+            bool: False while the circuit is open.
+        """
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at < self._reset_timeout:
+                return False
+            if self._trial_running:
+                return False
+
+            # Half-open: let one trial request through
+            self._trial_running = True
+            return True
+
+    def record_success(self) -> None:
+        """
+        Records a successful request, closing the circuit.
+        """
+        with self._lock:
+            if self._opened_at is not None:
+                LOGGER.info("Model circuit closed.")
+            self._failures = 0
+            self._opened_at = None
+            self._trial_running = False
+
+    def record_failure(self) -> None:
+        """
+        Records a failed request, opening the circuit once the threshold is reached
+        or when the trial request of a half-open circuit failed.
+        """
+        with self._lock:
+            self._failures += 1
+            if self._trial_running or (
+                self._opened_at is None and self._failures >= self._failure_threshold
+            ):
+                LOGGER.error(f"Model circuit opened after {self._failures} failures!")
+                METRICS.increment("model.circuit_opened")
+                self._opened_at = time.monotonic()
+            self._trial_running = False
+
+
+class ResilientModel(AIModel):
+    def __init__(
+        self,
+        model: AIModel,
+        retries: int = 3,
+        base_delay: float = 0.5,
+        max_delay: float = 8.0,
+        deadline: float = 60.0,
+        circuit_breaker: CircuitBreaker = None,
+        hedging: bool = False,
+        hedge_min_delay: float = 1.0,
+        hedge_percentile: float = 95,
+        max_workers: int = 32,
+    ) -> None:
+        """
+        Wraps a model with retries, deadlines, a circuit breaker and hedging.
+
+        Args:
+            model (AIModel): Wrapped model, switched to raising ModelError.
+            retries (int): Maximum number of retries of a request.
+            base_delay (float): Backoff delay (seconds) before the first retry.
+            max_delay (float): Maximum backoff delay (seconds).
+            deadline (float): Maximum duration (seconds) of a request and retries.
+            circuit_breaker (CircuitBreaker): Breaker shared by every request.
+            hedging (bool): Send hedged duplicate requests.
+            hedge_min_delay (float): Minimum delay (seconds) before hedging.
+            hedge_percentile (float):
+                Latency percentile of recent requests after which to hedge.
+            max_workers (int): Maximum number of concurrent attempts per worker.
+        """
+        model.raise_errors = True
+        self._model: AIModel = model
+        self._retries: int = retries
+        self._base_delay: float = base_delay
+        self._max_delay: float = max_delay
+        self._deadline: float = deadline
+        self._circuit_breaker: CircuitBreaker = circuit_breaker
+        self._hedging: bool = hedging
+        self._hedge_min_delay: float = hedge_min_delay
+        self._hedge_percentile: float = hedge_percentile
+        self._max_workers: int = max_workers
+
+        self._lock = threading.Lock()
+        # Durations of recent successful attempts, for the hedging delay
+        self._latencies: collections.deque = collections.deque(maxlen=200)
+        self._pid: int = None
+        self._executor: futures.ThreadPoolExecutor = None
+
+    def make_request(self, conversation_messages, **kwargs):
+        """
+        Makes a request to the model, retrying retryable errors.
+
+        Args:
+            conversation_messages (json): Input messages for the api call.
+            **kwargs: Request context (personality_id, user_id, timeout).
+
+        Returns:
+            The message response, or None if the request failed.
+        """
+        deadline = start_deadline(kwargs, self._deadline)
+        for attempt in range(self._retries + 1):
+            if not self._allow():
+                return None
+
+            try:
+                resp = self._attempt(conversation_messages, kwargs, deadline)
+                self._record_success()
+                return resp
+            except ModelError as e:
+                if not self._should_retry(e, attempt, deadline):
+                    return None
+            except Exception:
+                self._record_failure()
+                raise
+
+    def stream_request(
+        self, conversation_messages, **kwargs
+    ) -> Generator[str, None, bool]:
+        """
+        Makes a streaming request to the model. Errors before the first chunk are
+        retried, a stream interrupted later ends early. A stream still running at
+        the deadline is abandoned.
+
+        Args:
+            conversation_messages (json): Input messages for the api call.
+            **kwargs: Request context (personality_id, user_id, timeout).
+
+        Yields:
+            str: Content chunks of the response.
+
+        Returns:
+            bool: True if the response was received completely.
+        """
+        deadline = start_deadline(kwargs, self._deadline)
+        for attempt in range(self._retries + 1):
+            if not self._allow():
+                return False
+
+            chunks = self._model.stream_request(
+                conversation_messages,
+                **kwargs,
+                timeout=max(deadline - time.monotonic(), 0),
+            )
+            try:
+                first_chunk = next(chunks, None)
+            except ModelError as e:
+                if not self._should_retry(e, attempt, deadline):
+                    return False
+                continue
+            except Exception:
+                self._record_failure()
+                raise
+
+            self._record_success()
+            if first_chunk is None:
+                return False
+
+            try:
+                yield first_chunk
+                while time.monotonic() < deadline:
+                    try:
+                        chunk = next(chunks)
+                    except StopIteration as stop:
+                        return stop.value
+                    yield chunk
+            except ModelError as e:
+                LOGGER.error(f"Model response stream interrupted! {e}")
+                return False
+
+            chunks.close()
+            METRICS.increment("model.failures")
+            LOGGER.error("Model response stream exceeded the deadline!")
+            return False
+
+        return False
+
+    def _allow(self) -> bool:
+        """
+        Checks the circuit breaker before an attempt.
+
+        Returns:
+            bool: False if the request has to fail fast.
+        """
+        if self._circuit_breaker is None or self._circuit_breaker.allow():
+            return True
+
+        METRICS.increment("model.circuit_rejections")
+        LOGGER.error("Model circuit is open, failing request fast!")
+        return False
+
+    def _record_success(self) -> None:
+        """
+        Records a successful attempt with the circuit breaker.
+        """
+        if self._circuit_breaker is not None:
+            self._circuit_breaker.record_success()
+
+    def _record_failure(self) -> None:
+        """
+        Records an attempt that failed with an unexpected error (e.g. a malformed
+        response) with the circuit breaker, so that a failed trial request of a
+        half-open circuit opens it again instead of leaving it half-open forever.
+        """
+        if self._circuit_breaker is not None:
+            self._circuit_breaker.record_failure()
+
+    def _should_retry(self, error: ModelError, attempt: int, deadline: float) -> bool:
+        """
+        Records a failed attempt and waits for the backoff delay if it is retried.
+
+        Args:
+            error (ModelError): Error of the attempt.
+            attempt (int): Number of the failed attempt, starting at 0.
+            deadline (float): Monotonic time by which the request must be done.
+
+        Returns:
+            bool: True if the request should be attempted again.
+        """
+        # Only transient errors indicate an unhealthy upstream
+        if self._circuit_breaker is not None:
+            if error.retryable:
+                self._circuit_breaker.record_failure()
+            else:
+                self._circuit_breaker.record_success()
+
+        if not error.retryable or attempt >= self._retries:
+            METRICS.increment("model.failures")
+            LOGGER.error(f"Model request failed after {attempt + 1} attempts! {error}")
+            return False
+
+        # Full jitter: a random delay up to the exponential backoff
+        delay = random.uniform(
+            0, min(self._max_delay, self._base_delay * 2**attempt)
+        )
+        if time.monotonic() + delay >= deadline:
+            METRICS.increment("model.failures")
+            LOGGER.error(f"Model request deadline exceeded! {error}")
+            return False
+
+        METRICS.increment("model.retries")
+        LOGGER.warning(f"Retrying model request in {delay:.2f}s: {error}")
+        time.sleep(delay)
+        return True
+
+    def _attempt(self, conversation_messages, context: dict, deadline: float):
+        """
+        Makes a single (possibly hedged) attempt within the deadline.
+
+        Args:
+            conversation_messages (json): Input messages for the api call.
+            context (dict): Request context.
+            deadline (float): Monotonic time by which the request must be done.
+
+        Returns:
+            The message response of the first successful request.
+        """
+        executor = self._get_executor()
+        started = time.monotonic()
+        pending = {self._submit(executor, conversation_messages, context, deadline)}
+        hedge_delay = self._get_hedge_delay()
+        error = None
+
+        while pending:
+            timeout = deadline - time.monotonic()
+            if hedge_delay is not None:
+                timeout = min(timeout, started + hedge_delay - time.monotonic())
+            done, pending = futures.wait(
+                pending, max(timeout, 0), return_when=futures.FIRST_COMPLETED
+            )
+
+            for future in done:
+                try:
+                    resp = future.result()
+                except ModelError as e:
+                    error = e
+                    continue
+                self._latencies.append(time.monotonic() - started)
+                return resp
+
+            if done:
+                continue
+
+            # Send a hedged duplicate once, when the first request is slow
+            if hedge_delay is not None and time.monotonic() < deadline:
+                METRICS.increment("model.hedged_requests")
+                pending.add(
+                    self._submit(executor, conversation_messages, context, deadline)
+                )
+                hedge_delay = None
+                continue
+
+            raise ModelError("Model request deadline exceeded!", retryable=True)
+
+        raise error
+
+    def _submit(
+        self,
+        executor: futures.ThreadPoolExecutor,
+        conversation_messages,
+        context: dict,
+        deadline: float,
+    ) -> futures.Future:
+        """
+        Starts a request on the executor, timing out when the deadline passes.
+
+        Args:
+            executor (ThreadPoolExecutor): Executor of the current process.
+            conversation_messages (json): Input messages for the api call.
+            context (dict): Request context.
+            deadline (float): Monotonic time by which the request must be done.
+
+        Returns:
+            Future: Future of the message response.
+        """
+        return executor.submit(
+            self._model.make_request,
+            conversation_messages,
+            **context,
+            timeout=max(deadline - time.monotonic(), 0),
+        )
+
+    def _get_hedge_delay(self):
+        """
+        Computes after how long a hedged request is sent.
+
+        Returns:
+            float: Delay in seconds, or None if hedging is disabled or there are
+            too few latency samples yet.
+        """
+        if not self._hedging or len(self._latencies) < 20:
+            return None
+
+        latencies = sorted(self._latencies)
+        index = int(len(latencies) * self._hedge_percentile / 100)
+        return max(self._hedge_min_delay, latencies[min(index, len(latencies) - 1)])
+
+    def _get_executor(self) -> futures.ThreadPoolExecutor:
+        """
+        Returns the executor running the attempts, starting it on first use.
+        Executors are never shared with forked processes.
+
+        Returns:
+            ThreadPoolExecutor: Executor of the current process.
+        """
+        with self._lock:
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._executor = futures.ThreadPoolExecutor(
+                    self._max_workers, thread_name_prefix="model-request"
+                )
+            return self._executor
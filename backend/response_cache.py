@@ -0,0 +1,355 @@
+"""
+response_cache.py
+
+Author: Christian Welling
+Date: 10/18/2026
+Company: ImposterAI
+Contact: csw73@cornell.edu
+
+Exact-match cache of model responses (see RESPONSE_CACHE in config.py).
+
+Responses are keyed by a hash of the exported message list and the model
+parameters, so only requests sending exactly the same messages (e.g. the first
+"hi" to a personality right after its intro message) share a response. Caching
+is opt-in per personality, as cached personalities always answer identical
+conversations identically.
+
+Entries expire after a TTL and the least recently used ones are evicted beyond a
+maximum number of entries. The cache either lives in the worker's memory or in a
+SQLite file shared by every worker.
+"""
+# region General/API Imports
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Generator, Iterable, Mapping, Optional
+
+# endregion
+
+# region Backend Imports
+from backend.ai_model import AIModel
+from backend.db import connect
+from backend.logger import LOGGER
+from backend.metrics import METRICS
+
+# endregion
+
+
+class MemoryResponseCache:
+    def __init__(self, max_entries: int, ttl: float) -> None:
+        """
+        In-process LRU cache of response contents.
+
+        Args:
+            max_entries (int): Maximum number of cached responses.
+            ttl (float): Seconds after which a cached response expires.
+        """
+        self._max_entries: int = max_entries
+        self._ttl: float = ttl
+        self._lock = threading.Lock()
+        self._entries: OrderedDict = OrderedDict()
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Looks up a response.
+
+        Args:
+            key (str): Request hash.
+
+        Returns:
+            str: Cached response content, or None if missing or expired.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+
+            content, expires_at = entry
+            if expires_at <= time.time():
+                del self._entries[key]
+                return None
+
+            self._entries.move_to_end(key)
+            return content
+
+    def set(self, key: str, content: str) -> None:
+        """
+        Caches a response, evicting the least recently used ones if full.
+
+        Args:
+            key (str): Request hash.
+            content (str): Response content.
+        """
+        with self._lock:
+            self._entries[key] = (content, time.time() + self._ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+
+
+class SqliteResponseCache:
+    def __init__(self, path: str, max_entries: int, ttl: float, config: Mapping):
+        """
+        LRU cache of response contents in a SQLite file shared by every worker.
+
+        Args:
+            path (str): Path to the cache database file.
+            max_entries (int): Maximum number of cached responses.
+            ttl (float): Seconds after which a cached response expires.
+            config (Mapping): Application configuration (usually current_app.config).
+        """
+        self._path: str = path
+        self._max_entries: int = max_entries
+        self._ttl: float = ttl
+        self._config: Mapping = dict(config)
+        self._local = threading.local()
+
+    def _get_db(self) -> sqlite3.Connection:
+        """
+        Returns the calling thread's connection to the cache database, creating the
+        cache table on first use.
+
+        Returns:
+            Connection: Connection to the cache database.
+        """
+        if getattr(self._local, "pid", None) != os.getpid():
+            db = connect(self._path, self._config)
+            db.execute(
+                """
+                CREATE TABLE IF NOT EXISTS response_cache (
+                  "KEY" TEXT PRIMARY KEY,
+                  "CONTENT" TEXT NOT NULL,
+                  "EXPIRES_AT" REAL NOT NULL,
+                  "USED_AT" REAL NOT NULL
+                )
+                """
+            )
+            db.execute(
+                "CREATE INDEX IF NOT EXISTS response_cache_used_at "
+                + "ON response_cache (USED_AT)"
+            )
+            db.commit()
+            self._local.db = db
+            self._local.pid = os.getpid()
+
+        return self._local.db
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Looks up a response.
+
+        Args:
+            key (str): Request hash.
+
+        Returns:
+            str: Cached response content, or None if missing or expired.
+        """
+        db = self._get_db()
+        now = time.time()
+        try:
+            entry = db.execute(
+                "SELECT CONTENT FROM response_cache WHERE KEY = ? AND EXPIRES_AT > ?",
+                (key, now),
+            ).fetchone()
+            if entry is None:
+                return None
+
+            db.execute(
+                "UPDATE response_cache SET USED_AT = ? WHERE KEY = ?", (now, key)
+            )
+            db.commit()
+            return entry[0]
+        except sqlite3.Error as e:
+            db.rollback()
+            LOGGER.error(f"Cannot read response cache! {e}")
+            return None
+
+    def set(self, key: str, content: str) -> None:
+        """
+        Caches a response, evicting expired and least recently used ones if full.
+
+        Args:
+            key (str): Request hash.
+            content (str): Response content.
+        """
+        db = self._get_db()
+        now = time.time()
+        try:
+            db.execute(
+                """
+                INSERT OR REPLACE INTO response_cache (
+                    KEY, CONTENT, EXPIRES_AT, USED_AT
+                )
+                VALUES (?, ?, ?, ?)
+                """,
+                (key, content, now + self._ttl, now),
+            )
+            db.execute("DELETE FROM response_cache WHERE EXPIRES_AT <= ?", (now,))
+            db.execute(
+                """
+                DELETE FROM response_cache
+                WHERE USED_AT < (
+                    SELECT USED_AT FROM response_cache
+                    ORDER BY USED_AT DESC LIMIT 1 OFFSET ?
+                )
+                """,
+                (self._max_entries - 1,),
+            )
+            db.commit()
+        except sqlite3.Error as e:
+            db.rollback()
+            LOGGER.error(f"Cannot write response cache! {e}")
+
+
+class CachedModel(AIModel):
+    def __init__(
+        self, model: AIModel, cache, personality_ids: Iterable[int], params: dict
+    ) -> None:
+        """
+        Wraps a model, answering repeated requests from the cache.
+
+        Args:
+            model (AIModel): Model answering uncached requests.
+            cache (MemoryResponseCache | SqliteResponseCache): Response cache.
+            personality_ids (Iterable[int]):
+                Personalities whose requests are cached. Requests without a
+                personality_id are never cached.
+            params (dict): Model parameters included in every cache key.
+        """
+        self._model: AIModel = model
+        self._cache = cache
+        self._personality_ids: frozenset = frozenset(personality_ids)
+        self._params: dict = params
+
+    def make_request(self, conversation_messages, **kwargs):
+        """
+        Makes a request to the model unless its response is cached.
+
+        Args:
+            conversation_messages (json): Input messages for the api call.
+            **kwargs: Request context (personality_id, user_id).
+
+        Returns:
+            The message response, or None if there's an error.
+        """
+        key = self._get_key(conversation_messages, kwargs)
+        if key is not None:
+            content = self._lookup(key)
+            if content is not None:
+                return {"role": "assistant", "content": content}
+
+        resp = self._model.make_request(conversation_messages, **kwargs)
+        if key is not None and resp and resp["content"]:
+            self._cache.set(key, resp["content"])
+        return resp
+
+    def stream_request(
+        self, conversation_messages, **kwargs
+    ) -> Generator[str, None, bool]:
+        """
+        Streams the model's response, or the cached response as a single chunk.
+        Only responses the model reports as completely received are cached, never
+        streams that ended early.
+
+        Args:
+            conversation_messages (json): Input messages for the api call.
+            **kwargs: Request context (personality_id, user_id).
+
+        Yields:
+            str: Content chunks of the response.
+
+        Returns:
+            bool: True if the response was received completely.
+        """
+        key = self._get_key(conversation_messages, kwargs)
+        if key is not None:
+            content = self._lookup(key)
+            if content is not None:
+                yield content
+                return True
+
+        # Forward the chunks, keeping the stream's return value
+        stream = self._model.stream_request(conversation_messages, **kwargs)
+        chunks = []
+        while True:
+            try:
+                chunk = next(stream)
+            except StopIteration as stop:
+                completed = bool(stop.value)
+                break
+            chunks.append(chunk)
+            yield chunk
+
+        if key is not None and chunks and completed:
+            self._cache.set(key, "".join(chunks))
+        elif key is not None and chunks:
+            METRICS.increment("response_cache.incomplete")
+        return completed
+
+    def _get_key(self, conversation_messages, context: dict) -> Optional[str]:
+        """
+        Computes the cache key of a request.
+
+        Args:
+            conversation_messages (json): Input messages for the api call.
+            context (dict): Request context.
+
+        Returns:
+            str: SHA-256 hash of the messages and model parameters, or None if the
+            request's personality is not cached.
+        """
+        if context.get("personality_id") not in self._personality_ids:
+            return None
+
+        request = json.dumps(
+            {"params": self._params, "messages": conversation_messages},
+            sort_keys=True,
+            separators=(",", ":"),
+        )
+        return hashlib.sha256(request.encode("utf-8")).hexdigest()
+
+    def _lookup(self, key: str) -> Optional[str]:
+        """
+        Looks up a cached response and counts the hit or miss.
+
+        Args:
+            key (str): Request hash.
+
+        Returns:
+            str: Cached response content, or None.
+        """
+        content = self._cache.get(key)
+        METRICS.increment(
+            "response_cache.hits" if content is not None else "response_cache.misses"
+        )
+        return content
+
+
+def create_response_cache(config: Mapping):
+    """
+    Creates the response cache selected by the RESPONSE_CACHE_* settings.
+
+    Args:
+        config (Mapping): Application configuration (usually current_app.config).
+
+    Returns:
+        MemoryResponseCache | SqliteResponseCache: Response cache.
+    """
+    backend = config["RESPONSE_CACHE"]
+    if backend == "memory":
+        return MemoryResponseCache(
+            config["RESPONSE_CACHE_MAX_ENTRIES"], config["RESPONSE_CACHE_TTL"]
+        )
+    if backend == "sqlite":
+        return SqliteResponseCache(
+            config["RESPONSE_CACHE_PATH"],
+            config["RESPONSE_CACHE_MAX_ENTRIES"],
+            config["RESPONSE_CACHE_TTL"],
+            config,
+        )
+
+    raise ValueError(f"Unknown response cache: {backend}")
@@ -1,6 +1,8 @@
 DROP TABLE IF EXISTS user;
 DROP TABLE IF EXISTS chat;
+DROP TABLE IF EXISTS messages;
 DROP TABLE IF EXISTS personalities;
+DROP TABLE IF EXISTS generations;
 
 CREATE TABLE users (
   "ID" INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -12,16 +14,42 @@ CREATE TABLE chats (
   "ID" INTEGER PRIMARY KEY AUTOINCREMENT,
   "USER_ID" INTEGER NOT NULL,
   "PERSONALITY_ID" INTEGER NOT NULL,
-  "MESSAGES" TEXT NOT NULL,
+  "LAST_MESSAGE" TEXT,
+  "LAST_MESSAGE_AT" TEXT,
+  "MESSAGE_COUNT" INTEGER NOT NULL DEFAULT 0,
+  "SUMMARY" TEXT,
+  "SUMMARY_COUNT" INTEGER NOT NULL DEFAULT 0,
   UNIQUE ("USER_ID", "PERSONALITY_ID"),
   FOREIGN KEY ("USER_ID") REFERENCES users (id),
   FOREIGN KEY ("PERSONALITY_ID") REFERENCES personalities ("ID")
 );
 
+CREATE TABLE messages (
+  "USER_ID" INTEGER NOT NULL,
+  "PERSONALITY_ID" INTEGER NOT NULL,
+  "SEQ" INTEGER NOT NULL,
+  "ROLE" TEXT NOT NULL,
+  "CONTENT" TEXT NOT NULL,
+  "ENCODING" TEXT,
+  "CREATED_AT" TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  PRIMARY KEY ("USER_ID", "PERSONALITY_ID", "SEQ"),
+  FOREIGN KEY ("USER_ID", "PERSONALITY_ID")
+    REFERENCES chats ("USER_ID", "PERSONALITY_ID")
+) WITHOUT ROWID;
+
 CREATE TABLE personalities (
   ID INTEGER PRIMARY KEY AUTOINCREMENT,
   NAME TEXT NOT NULL,
   SYSTEM_PROMPT TEXT NOT NULL, 
+  SYSTEM_MESSAGE TEXT NOT NULL DEFAULT (''),
+  SYSTEM_TOKENS INTEGER NOT NULL DEFAULT 0,
   INTRO_MESSAGE TEXT NOT NULL DEFAULT ('Hi!'), 
   IMAGE_PATH TEXT NOT NULL DEFAULT ('TestImage.jpeg')
-);
\ No newline at end of file
+);
+
+CREATE TABLE generations (
+  "NAME" TEXT PRIMARY KEY,
+  "VALUE" INTEGER NOT NULL DEFAULT 0
+);
+
+INSERT INTO generations (NAME) VALUES ('personalities');
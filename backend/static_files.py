@@ -0,0 +1,311 @@
+"""
+static_files.py
+
+Author: Tim Duggan
+Date: 10/18/2026
+Company: ImposterAI
+Contact: csw73@cornell.edu
+
+Serving of the frontend build and the backend assets (see STATIC_* in config.py).
+
+Every worker reads a file once and then serves it from memory, so requests for
+index.html and the assets do not touch the filesystem:
+    caching     : content-hashed files (e.g. static/js/main.4f8252a0.js) are
+                  cached by browsers for a year as immutable, every other file
+                  (e.g. index.html) is revalidated with its ETag on every use
+    etags       : strong ETags derived from the file contents, answered with
+                  304 Not Modified when the browser already has the file
+    compression : gzip (.gz) and brotli (.br) variants written next to the files
+                  by the compress-static-files command after a frontend build are
+                  sent to browsers accepting them, so workers never compress.
+                  Brotli needs the optional brotli package.
+Workers must be restarted to serve a new build (which deployments do anyway).
+"""
+# region General/API Imports
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+import threading
+from typing import Mapping, Optional
+
+import click
+from flask import Response, current_app, request
+from werkzeug.exceptions import NotFound
+from werkzeug.security import safe_join
+
+try:
+    import brotli
+except ImportError:
+    # Brotli variants are only written if the brotli package is installed
+    brotli = None
+
+# endregion
+
+# region Backend Imports
+from backend.logger import LOGGER
+
+# endregion
+
+# Content encodings of the precompressed variants, in order of preference, and the
+# suffixes of their files
+ENCODINGS = {"br": ".br", "gzip": ".gz"}
+
+# Decompressors checking the variants, brotli variants are only served if the
+# brotli package is installed
+DECOMPRESSORS = {"gzip": gzip.decompress}
+if brotli is not None:
+    DECOMPRESSORS["br"] = brotli.decompress
+
+# Content types worth compressing, images and fonts are compressed already
+COMPRESSIBLE_TYPES = re.compile(
+    r"^(text/.*|application/(javascript|json|manifest\+json|xml)|image/svg\+xml"
+    + r"|image/(x-icon|vnd\.microsoft\.icon))$"
+)
+
+
+class StaticFiles:
+    def __init__(
+        self, root: str, immutable_pattern: str, max_age: int, cache: bool
+    ) -> None:
+        """
+        Files of a directory, served from memory with caching headers, ETags and
+        precompressed variants.
+
+        Args:
+            root (str): Directory of the files.
+            immutable_pattern (str):
+                Regular expression matching the paths of content-hashed files.
+            max_age (int):
+                Seconds browsers may cache other files without revalidating them.
+            cache (bool): Keep files in memory, else read them on every request.
+        """
+        self.root: str = root
+        self._immutable_pattern = re.compile(immutable_pattern)
+        self._max_age: int = max_age
+        self._cache: bool = cache
+
+        self._lock = threading.Lock()
+        # Loaded files by path, see _load
+        self._files: dict = {}
+
+    def _load(self, path: str) -> Optional[dict]:
+        """
+        Reads a file and its precompressed variants.
+
+        Args:
+            path (str): Path of the file, relative to the root.
+
+        Returns:
+            dict: The file's "content_type", "cache_control" and "variants"
+            ((body, etag) by content encoding, None for the uncompressed file), or
+            None if there is no such file.
+        """
+        # [1] Read the file, refusing paths outside of the root
+        full_path = safe_join(self.root, path)
+        if full_path is None or not os.path.isfile(full_path):
+            return None
+
+        with open(full_path, "rb") as f:
+            body = f.read()
+        etag = hashlib.sha256(body).hexdigest()[:32]
+        variants = {None: (body, etag)}
+
+        # [2] Read the precompressed variants, skipping variants of an older build
+        for encoding, decompress in DECOMPRESSORS.items():
+            variant_path = full_path + ENCODINGS[encoding]
+            if not os.path.isfile(variant_path):
+                continue
+            with open(variant_path, "rb") as f:
+                variant = f.read()
+            if decompress(variant) == body:
+                variants[encoding] = (variant, f"{etag}-{encoding}")
+            else:
+                LOGGER.warning(f"Ignoring stale {variant_path}!")
+
+        # [3] Work out the headers
+        content_type = mimetypes.guess_type(full_path)[0] or "application/octet-stream"
+        if content_type.startswith("text/") or content_type == "application/javascript":
+            content_type += "; charset=utf-8"
+
+        if self._immutable_pattern.search(path):
+            cache_control = "public, max-age=31536000, immutable"
+        elif self._max_age > 0:
+            cache_control = f"public, max-age={self._max_age}"
+        else:
+            cache_control = "no-cache"
+
+        return {
+            "content_type": content_type,
+            "cache_control": cache_control,
+            "variants": variants,
+        }
+
+    def _get(self, path: str) -> Optional[dict]:
+        """
+        Returns a file, loading it on first use.
+
+        Args:
+            path (str): Path of the file, relative to the root.
+
+        Returns:
+            dict: The file (see _load), or None if there is no such file.
+        """
+        file = self._files.get(path)
+        if file is None:
+            file = self._load(path)
+            # Missing paths are not remembered, as anyone can request any number
+            if file is not None and self._cache:
+                with self._lock:
+                    self._files[path] = file
+
+        return file
+
+    def serve(self, path: str) -> Response:
+        """
+        Builds the response of a request for a file, in the best content encoding
+        the client accepts.
+
+        Args:
+            path (str): Path of the file, relative to the root.
+
+        Returns:
+            Response: The file, or 304 Not Modified if the client has it already.
+
+        Raises:
+            NotFound: If there is no such file.
+        """
+        file = self._get(path)
+        if file is None:
+            raise NotFound()
+
+        # [1] Pick the variant
+        encoding = request.accept_encodings.best_match(
+            [encoding for encoding in ENCODINGS if encoding in file["variants"]]
+        )
+        body, etag = file["variants"][encoding]
+
+        # [2] Build the response, reduced to 304 if the client's ETag matches
+        response = Response(body, content_type=file["content_type"])
+        response.headers["Cache-Control"] = file["cache_control"]
+        if encoding is not None:
+            response.headers["Content-Encoding"] = encoding
+        if len(file["variants"]) > 1:
+            response.vary.add("Accept-Encoding")
+        response.set_etag(etag)
+
+        return response.make_conditional(request)
+
+
+def create_static_files(root: str, config: Mapping) -> StaticFiles:
+    """
+    Creates the static files of a directory with the STATIC_* settings.
+
+    Args:
+        root (str): Directory of the files.
+        config (Mapping): Application configuration (usually current_app.config).
+
+    Returns:
+        StaticFiles: Files of a worker process.
+    """
+    return StaticFiles(
+        root,
+        config["STATIC_IMMUTABLE_PATTERN"],
+        config["STATIC_MAX_AGE"],
+        config["STATIC_MEMORY_CACHE"],
+    )
+
+
+def get_static_files(name: str) -> StaticFiles:
+    """
+    Returns static files of the current application.
+
+    Args:
+        name (str): "frontend" (the frontend build) or "backend_assets".
+
+    Returns:
+        StaticFiles: Shared files.
+    """
+    return current_app.extensions["static_files"][name]
+
+
+# region Commands
+def compress_file(path: str, min_size: int) -> int:
+    """
+    Writes the precompressed variants of a file, removing variants that would not
+    be smaller than the file.
+
+    Args:
+        path (str): Path of the file.
+        min_size (int): Files smaller than that are not compressed.
+
+    Returns:
+        int: Number of variants written.
+    """
+    with open(path, "rb") as f:
+        body = f.read()
+
+    compressors = {"gzip": lambda data: gzip.compress(data, 9, mtime=0)}
+    if brotli is not None:
+        compressors["br"] = lambda data: brotli.compress(data, quality=11)
+
+    written = 0
+    for encoding, compress in compressors.items():
+        variant_path = path + ENCODINGS[encoding]
+        variant = compress(body) if len(body) >= min_size else body
+        if len(variant) < len(body):
+            with open(variant_path, "wb") as f:
+                f.write(variant)
+            written += 1
+        elif os.path.exists(variant_path):
+            os.remove(variant_path)
+
+    return written
+
+
+@click.command(name="compress-static-files")
+def compress_static_files_command() -> None:
+    """
+    Command to write the gzip and brotli variants of the static files, to run after
+    every frontend build.
+    """
+    if brotli is None:
+        click.echo("The brotli package is not installed, writing gzip variants only.")
+
+    for static_files in current_app.extensions["static_files"].values():
+        written = 0
+        for directory, _, file_names in os.walk(static_files.root):
+            for file_name in file_names:
+                content_type = mimetypes.guess_type(file_name)[0] or ""
+                if file_name.endswith(tuple(ENCODINGS.values())):
+                    continue
+                if not COMPRESSIBLE_TYPES.match(content_type):
+                    continue
+                written += compress_file(
+                    os.path.join(directory, file_name),
+                    current_app.config["STATIC_COMPRESS_MIN_SIZE"],
+                )
+
+        # Print the success message
+        click.echo(f"Wrote {written} compressed variant(s) in {static_files.root}.")
+
+
+# endregion
+
+
+def init_app(app) -> None:
+    """
+    Creates the static files of the frontend build and the backend assets, and
+    registers the compression command on the given Flask application instance.
+
+    Args:
+        app (Flask): the Flask application instance to configure.
+    """
+    app.extensions["static_files"] = {
+        "frontend": create_static_files(app.static_folder, app.config),
+        "backend_assets": create_static_files(
+            os.path.join(app.root_path, "backend", "static", "assets"), app.config
+        ),
+    }
+    app.cli.add_command(compress_static_files_command)
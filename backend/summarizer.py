@@ -0,0 +1,246 @@
+"""
+summarizer.py
+
+Author: Christian Welling
+Date: 10/18/2026
+Company: ImposterAI
+Contact: csw73@cornell.edu
+
+Incremental rolling summaries of long conversations (see CHAT_SUMMARIES in
+config.py).
+
+Only the most recent SUMMARY_KEEP_MESSAGES messages of a conversation are sent to
+the model verbatim. Once at least SUMMARY_BATCH_MESSAGES older messages are not
+covered by the conversation's summary yet, a background job asks the model to fold
+them into the stored running summary, which Conversation sends as a system message
+in their place. Every job only reads the previous summary and the newly aged out
+messages, so the cost of a summary update does not grow with the conversation.
+"""
+# region General/API Imports
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Mapping, Optional
+from flask import current_app
+
+# endregion
+
+# region Backend Imports
+from backend.ai_model import AIModel
+from backend.conversation import Conversation
+from backend.database_manager import DatabaseManager as dbm
+from backend.logger import LOGGER
+
+# endregion
+
+SUMMARY_PROMPT = (
+    "You maintain a running summary of a conversation between a user and {name}. "
+    + "Update the current summary with the new messages. Keep names, facts, "
+    + "preferences, promises and unresolved topics, drop small talk. Write in the "
+    + "third person and use at most {max_words} words. Reply with the summary only."
+)
+
+
+class ConversationSummarizer:
+    def __init__(
+        self,
+        model: AIModel,
+        keep_messages: int = 20,
+        batch_messages: int = 10,
+        max_words: int = 200,
+        workers: int = 2,
+    ) -> None:
+        """
+        Folds old messages of conversations into their running summaries.
+
+        Args:
+            model (AIModel): Model writing the summaries.
+            keep_messages (int): Number of most recent messages never summarized.
+            batch_messages (int):
+                Minimum number of aged out messages before the summary is updated.
+            max_words (int): Requested maximum length of a summary.
+            workers (int): Number of background summary jobs per worker process.
+        """
+        self._model: AIModel = model
+        self._keep_messages: int = keep_messages
+        self._batch_messages: int = batch_messages
+        self._max_words: int = max_words
+        self._workers: int = workers
+
+        self._lock = threading.Lock()
+        self._pid: int = None
+        self._executor: ThreadPoolExecutor = None
+        # Conversations ((user_id, personality_id)) with a job in progress
+        self._pending: set = set()
+
+    def summarize(
+        self, name: str, summary: Optional[str], messages: list, **context
+    ) -> Optional[str]:
+        """
+        Folds messages into a summary.
+
+        Args:
+            name (str): Name of the personality in the conversation.
+            summary (str): Current summary, or None for the first summary.
+            messages (list): Message dictionaries to fold into the summary.
+            **context:
+                Request context of the conversation (user_id, personality_id),
+                so the request is scheduled and routed like the user's messages.
+
+        Returns:
+            str: The updated summary, or None if the model did not respond.
+        """
+        transcript = "\n".join(
+            f"{name if message['role'] == 'assistant' else 'User'}: "
+            + message["content"]
+            for message in messages
+        )
+        resp = self._model.make_request(
+            [
+                {
+                    "role": "system",
+                    "content": SUMMARY_PROMPT.format(
+                        name=name, max_words=self._max_words
+                    ),
+                },
+                {
+                    "role": "user",
+                    "content": f"Current summary:\n{summary or '(none)'}\n\n"
+                    + f"New messages:\n{transcript}",
+                },
+            ],
+            **context,
+        )
+        if not resp or not resp["content"]:
+            return None
+        return resp["content"].strip()
+
+    def get_aged_messages(self, conversation: Conversation) -> list:
+        """
+        Fetches the messages of a conversation that are due to be summarized.
+
+        Args:
+            conversation (Conversation): The conversation.
+
+        Returns:
+            list: Messages older than the kept window that are not summarized yet,
+            or an empty list if there are fewer than the batch size.
+        """
+        _, summary_count = conversation.get_summary()
+        aged_count = (
+            len(conversation.get_messages()) - self._keep_messages - summary_count
+        )
+        if aged_count < self._batch_messages:
+            return []
+        return conversation.get_messages()[summary_count : summary_count + aged_count]
+
+    def schedule(
+        self, user_id: int, conv_id: int, conversation: Conversation
+    ) -> None:
+        """
+        Starts a background job updating the summary of a stored conversation if
+        enough messages aged out of the kept window. At most one job runs per
+        conversation.
+
+        Args:
+            user_id (int): The ID of the user involved in the chat.
+            conv_id (int): Conversation id (matching personality id)
+            conversation (Conversation): The conversation, as stored.
+        """
+        messages = self.get_aged_messages(conversation)
+        if not messages:
+            return
+
+        key = (user_id, conv_id)
+        with self._lock:
+            executor = self._get_executor()
+            if key in self._pending:
+                return
+            self._pending.add(key)
+
+            summary, summary_count = conversation.get_summary()
+            executor.submit(
+                self._run,
+                current_app._get_current_object(),
+                key,
+                conversation.get_personality_name(),
+                summary,
+                summary_count,
+                messages,
+            )
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        """
+        Returns the executor running the summary jobs, starting it on first use.
+        Executors are never shared with forked processes.
+
+        Returns:
+            ThreadPoolExecutor: Executor of the current process.
+        """
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._pending.clear()
+            self._executor = ThreadPoolExecutor(
+                self._workers, thread_name_prefix="summarizer"
+            )
+        return self._executor
+
+    def _run(
+        self,
+        app,
+        key: tuple,
+        name: str,
+        summary: Optional[str],
+        summary_count: int,
+        messages: list,
+    ) -> None:
+        """
+        Summary job: updates the summary and stores it.
+
+        Args:
+            app (Flask): Application whose databases store the conversation.
+            key (tuple): User ID and personality ID of the conversation.
+            name (str): Name of the personality.
+            summary (str): Current summary.
+            summary_count (int): Number of messages folded into the current summary.
+            messages (list): Messages to fold into the summary.
+        """
+        try:
+            user_id, personality_id = key
+            new_summary = self.summarize(
+                name, summary, messages, user_id=user_id, personality_id=personality_id
+            )
+            if new_summary is None:
+                LOGGER.error(f"Cannot summarize conversation {key}!")
+                return
+
+            with app.app_context():
+                dbm.save_chat_summary(
+                    *key, new_summary, summary_count + len(messages), summary_count
+                )
+            LOGGER.debug(f"Summarized {len(messages)} messages of conversation {key}.")
+        except Exception as e:
+            LOGGER.error(f"Cannot summarize conversation {key}! {e}")
+        finally:
+            with self._lock:
+                self._pending.discard(key)
+
+
+def create_summarizer(model: AIModel, config: Mapping) -> ConversationSummarizer:
+    """
+    Creates the summarizer for the SUMMARY_* settings of the configuration.
+
+    Args:
+        model (AIModel): Model writing the summaries.
+        config (Mapping): Application configuration (usually current_app.config).
+
+    Returns:
+        ConversationSummarizer: Summarizer for the configuration.
+    """
+    return ConversationSummarizer(
+        model,
+        config["SUMMARY_KEEP_MESSAGES"],
+        config["SUMMARY_BATCH_MESSAGES"],
+        config["SUMMARY_MAX_WORDS"],
+        config["SUMMARY_WORKERS"],
+    )
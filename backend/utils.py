@@ -11,7 +11,8 @@ Utility functions.
 
 # region Imports
 import json
-from typing import Any
+import math
+from typing import Any, Callable, Tuple
 
 # endregion
 
@@ -44,3 +45,79 @@ def deserialize_json(serialized_json) -> Any:
     """
     # Convert JSON string to Python object
     return json.loads(serialized_json)
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimates the number of model tokens in a text, using the common approximation
+    of four characters per token for English text.
+
+    Arguments:
+        text (str): The text to be measured.
+
+    Returns:
+        int: Returns the estimated number of tokens.
+    """
+    return math.ceil(len(text) / 4)
+
+
+def compile_system_prompt(system_prompt: list) -> Tuple[str, int]:
+    """
+    Joins a list of system prompt sentences into the single system message sent to
+    the model and estimates its token count.
+
+    Arguments:
+        system_prompt (list): The system prompt sentences (str).
+
+    Returns:
+        tuple: Returns the system message content and its estimated token count.
+    """
+    system_message = " ".join(system_prompt)
+    return system_message, estimate_tokens(system_message)
+
+
+def format_sse(event: str, data: Any) -> str:
+    """
+    Formats an event for a Server-Sent Events (text/event-stream) response.
+
+    Arguments:
+        event (str): The event name.
+        data (Any): The event payload, serialized as JSON.
+
+    Returns:
+        str: Returns the formatted event.
+    """
+    return f"event: {event}\ndata: {serialize_json(data)}\n\n"
+
+
+def format_sse_comment(comment: str) -> str:
+    """
+    Formats a comment for a Server-Sent Events (text/event-stream) response. Clients
+    ignore comments, so they keep an idle stream (and its proxies) alive.
+
+    Arguments:
+        comment (str): The comment text.
+
+    Returns:
+        str: Returns the formatted comment.
+    """
+    return f": {comment}\n\n"
+
+
+def run_in_threadpool(function: Callable, *args) -> Any:
+    """
+    Runs a blocking function on gevent's threadpool (see SERVER_THREADPOOL). The
+    calling greenlet waits for the result while the other greenlets of the worker
+    keep running, instead of the whole worker blocking on the call.
+
+    Arguments:
+        function (Callable): The blocking function.
+        *args: Arguments of the function.
+
+    Returns:
+        Any: Returns the result of the function.
+    """
+    # gevent is only needed by gevent workers
+    import gevent
+
+    return gevent.get_hub().threadpool.apply(function, args)
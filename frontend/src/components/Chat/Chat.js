@@ -8,6 +8,35 @@ import ContactList from './ContactList';
 
 import './Chat.css';
 
+// Milliseconds between polls of a queued response
+const JOB_POLL_INTERVAL = 1000;
+
+/**
+ * Polls the job generating the response to a message (when the backend queues
+ * responses) until it is finished.
+ * @param {string} jobId The ID of the job.
+ * @param {string} token The token of the user.
+ * @return {Object} The response to the message.
+ */
+async function waitForJob(jobId, token) {
+  for (;;) {
+    const response = await fetch(`api/generation_jobs/${jobId}`, {
+      headers: {'Authorization': `Bearer ${token}`},
+    });
+
+    if (!response.ok) {
+      throw new Error(`HTTP error! status: ${response.status}`);
+    }
+
+    const job = await response.json();
+    if (job.result) {
+      return job.result;
+    }
+
+    await new Promise((resolve) => setTimeout(resolve, JOB_POLL_INTERVAL));
+  }
+}
+
 /**
  * Chat component representing the main chat interface of the application.
  * It handles displaying and managing chat conversations, contacts, and the
@@ -155,7 +184,12 @@ export default function Chat() {
         throw new Error(`HTTP error! status: ${response.status}`);
       }
 
-      const data = await response.json();
+      let data = await response.json();
+
+      // Queued responses are fetched once they are generated
+      if (response.status === 202) {
+        data = await waitForJob(data.job_id, token);
+      }
 
       if (!data || typeof data !== 'object' || !data.content) {
         throw new Error('Invalid response format');
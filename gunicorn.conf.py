@@ -0,0 +1,71 @@
+"""
+gunicorn.conf.py
+
+Author: Tim Duggan
+Date: 10/18/2026
+Company: ImposterAI
+Contact: csw73@cornell.edu
+
+Gunicorn settings of the ImposterAI server (see the Procfile). The number of
+worker processes is set with WEB_CONCURRENCY and the port with PORT, as usual.
+
+SERVER_MODE selects the kind of workers:
+    sync   : (default) every worker process serves one request at a time, so a
+             worker is busy for the whole model round trip of a message
+    gevent : every worker process serves up to SERVER_WORKER_CONNECTIONS requests
+             concurrently on greenlets. gevent patches sockets, sleeps and locks
+             to yield to other requests while they wait, so a worker waiting for
+             the model keeps serving other users. Model requests use the openai
+             client (the aiohttp client runs its own event loop thread, which
+             would block the workers), database connections are shared by the
+             requests of a worker instead of opened for every request and chat
+             writes of concurrent requests are committed together. SQLite calls
+             and password hashes, which gevent cannot patch, run on gevent's
+             threadpool so they do not block the other requests of the worker.
+"""
+# region Imports
+import os
+
+# endregion
+
+server_mode = os.environ.get("SERVER_MODE") or "sync"
+
+if server_mode == "gevent":
+    worker_class = "gevent"
+    worker_connections = int(os.environ.get("SERVER_WORKER_CONNECTIONS") or 1000)
+
+    # Read by backend/config.py when the workers load the application
+    os.environ.setdefault("MODEL_CLIENT", "openai")
+    os.environ.setdefault("SQLITE_SHARED_POOL", "1")
+    os.environ.setdefault("SERVER_THREADPOOL", "1")
+    os.environ.setdefault("CHAT_WRITE_BATCHING", "1")
+elif server_mode == "sync":
+    # A sync worker serves one request at a time, so there is never a batch of
+    # chat writes to commit together, only the batch window to wait out
+    os.environ["CHAT_WRITE_BATCHING"] = "0"
+else:
+    raise ValueError(f"Unknown server mode: {server_mode}")
+
+# Sync workers are restarted if a request takes longer, so leave time for the
+# model request deadline (see MODEL_REQUEST_DEADLINE in backend/config.py)
+timeout = int(os.environ.get("SERVER_TIMEOUT") or 120)
+
+
+def on_starting(server) -> None:
+    """
+    Checks that model requests give up before the workers serving them are killed.
+
+    Args:
+        server (Arbiter): The gunicorn master.
+
+    Raises:
+        ValueError: If MODEL_REQUEST_DEADLINE is not below the worker timeout.
+    """
+    # Imported here, after the server mode set the environment Config reads
+    from backend.config import Config
+
+    if Config.MODEL_REQUEST_DEADLINE >= timeout:
+        raise ValueError(
+            f"MODEL_REQUEST_DEADLINE ({Config.MODEL_REQUEST_DEADLINE}s) must be below"
+            + f" the worker timeout ({timeout}s)"
+        )
@@ -0,0 +1,106 @@
+"""
+conftest.py
+
+Author: Tim Duggan
+Date: 10/18/2026
+Company: ImposterAI
+Contact: csw73@cornell.edu
+
+Shared fixtures of the backend tests. The application runs against a temporary copy
+of the bundled database, with side databases in the same temporary directory and a
+local model echoing the user's messages, so tests never touch instance/ or OpenAI.
+"""
+# region General/API Imports
+import os
+import shutil
+import tempfile
+import uuid
+
+import pytest
+
+# endregion
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Every database lives in a temporary directory. The environment is set when the
+# tests are collected, before any test imports the backend (Config reads the
+# environment at import time).
+TMP = tempfile.mkdtemp()
+shutil.copy(
+    os.path.join(ROOT, "instance", "imposter.sqlite"),
+    os.path.join(TMP, "imposter.sqlite"),
+)
+os.environ.update(
+    {
+        "DATABASE_PATH": os.path.join(TMP, "imposter.sqlite"),
+        "CHAT_SHARDS": "",
+        "RATE_LIMIT_PATH": os.path.join(TMP, "rate_limit.sqlite"),
+        "RESPONSE_CACHE_PATH": os.path.join(TMP, "response_cache.sqlite"),
+        "IDEMPOTENCY_PATH": os.path.join(TMP, "idempotency.sqlite"),
+        "JOB_QUEUE_PATH": os.path.join(TMP, "job_queue.sqlite"),
+        "PASSWORD_HASH_WORKERS": "0",
+    }
+)
+
+
+def pytest_unconfigure(config) -> None:
+    """
+    Removes the temporary databases after the test session.
+    """
+    shutil.rmtree(TMP, ignore_errors=True)
+
+
+@pytest.fixture(scope="session")
+def app():
+    """
+    The application, running against the temporary databases.
+    """
+    # [1] Load the application with a local model
+    from app import app as flask_app
+    from backend.ai_model import AIModel
+    from openai.openai_object import OpenAIObject
+
+    class EchoModel(AIModel):
+        def make_request(self, conversation_messages: list, **kwargs):
+            return OpenAIObject.construct_from(
+                {
+                    "role": "assistant",
+                    "content": f"echo: {conversation_messages[-1]['content']}",
+                }
+            )
+
+    flask_app.config["TESTING"] = True
+    flask_app.extensions["model"] = EchoModel()
+
+    return flask_app
+
+
+@pytest.fixture
+def client(app):
+    """
+    A test client of the application.
+    """
+    return app.test_client()
+
+
+@pytest.fixture
+def auth_headers(client) -> dict:
+    """
+    Authorization headers of a newly registered user.
+    """
+    username = f"test-{uuid.uuid4().hex}"
+    response = client.post(
+        "/auth/register", json={"username": username, "password": username}
+    )
+    return {"Authorization": f"Bearer {response.get_json()['token']}"}
+
+
+@pytest.fixture
+def user_id(app, auth_headers) -> int:
+    """
+    ID of the user of auth_headers.
+    """
+    from backend.auth import decode_token
+
+    with app.app_context():
+        return decode_token(auth_headers["Authorization"].split(" ", 1)[1])
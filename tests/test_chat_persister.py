@@ -0,0 +1,115 @@
+"""
+test_chat_persister.py
+
+Author: Tim Duggan
+Date: 10/18/2026
+Company: ImposterAI
+Contact: csw73@cornell.edu
+
+Tests of the group commit of chat writes.
+"""
+# region General/API Imports
+import os
+import runpy
+import sqlite3
+import tempfile
+import threading
+import time
+
+import pytest
+
+# endregion
+
+# region Backend Imports
+from backend.chat_persister import ChatPersister
+
+# endregion
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def database() -> str:
+    """
+    Path to a new database with a table of written values.
+    """
+    path = os.path.join(tempfile.mkdtemp(), "chats.sqlite")
+    db = sqlite3.connect(path)
+    db.execute("CREATE TABLE writes (VALUE TEXT)")
+    db.commit()
+    db.close()
+    return path
+
+
+def insert(value: str, delay: float = 0.0):
+    """
+    Creates a write inserting a value, taking the given seconds.
+    """
+
+    def write(db):
+        time.sleep(delay)
+        db.execute("INSERT INTO writes (VALUE) VALUES (?)", (value,))
+
+    return write
+
+
+def read_values(database: str) -> list:
+    """
+    Reads the committed values.
+    """
+    db = sqlite3.connect(database)
+    values = [row[0] for row in db.execute("SELECT VALUE FROM writes")]
+    db.close()
+    return values
+
+
+def test_batched_writes_are_committed(app, database):
+    persister = ChatPersister(database, app.config)
+
+    assert persister.submit(insert("a"))
+    assert persister.submit(insert("b"))
+    assert read_values(database) == ["a", "b"]
+
+
+def test_write_not_started_in_time_is_cancelled(app, database):
+    persister = ChatPersister(
+        database, {**app.config, "CHAT_WRITE_BATCH_TIMEOUT": 0.1}
+    )
+
+    # A slow write keeps the writer busy past the timeout of the next one
+    slow = threading.Thread(target=persister.submit, args=(insert("slow", 0.4),))
+    slow.start()
+    time.sleep(0.05)
+    assert not persister.submit(insert("cancelled"))
+    slow.join()
+
+    # The cancelled write is never stored, so retrying it cannot duplicate it
+    assert read_values(database) == ["slow"]
+
+
+def test_write_started_in_time_is_waited_for(app, database):
+    persister = ChatPersister(
+        database, {**app.config, "CHAT_WRITE_BATCH_TIMEOUT": 0.1}
+    )
+
+    assert persister.submit(insert("slow", 0.3))
+    assert read_values(database) == ["slow"]
+
+
+@pytest.mark.parametrize("server_mode,batching", [("sync", "0"), ("gevent", "1")])
+def test_batching_is_only_enabled_for_concurrent_workers(
+    monkeypatch, server_mode, batching
+):
+    # Settings the server mode changes are restored after the test
+    for name in (
+        "CHAT_WRITE_BATCHING",
+        "SERVER_THREADPOOL",
+        "MODEL_CLIENT",
+        "SQLITE_SHARED_POOL",
+    ):
+        monkeypatch.delenv(name, raising=False)
+    monkeypatch.setenv("SERVER_MODE", server_mode)
+
+    runpy.run_path(os.path.join(ROOT, "gunicorn.conf.py"))
+
+    assert os.environ["CHAT_WRITE_BATCHING"] == batching
@@ -0,0 +1,114 @@
+"""
+test_compression.py
+
+Author: Tim Duggan
+Date: 10/18/2026
+Company: ImposterAI
+Contact: csw73@cornell.edu
+
+Tests of the compression of stored message contents, and of reading rows that
+cannot be decoded.
+"""
+# region General/API Imports
+import os
+import zlib
+
+import pytest
+
+# endregion
+
+# region Backend Imports
+from backend.compression import UNDECODABLE_CONTENT, ContentCodec, _create_codec
+
+# endregion
+
+# Conversation the undecodable row is stored in
+PERSONALITY_ID = 9
+
+CONTENT = "The quick brown fox jumps over the lazy dog. " * 10
+
+OLD_DICTIONARY = b"The quick brown fox jumps over the lazy dog."
+NEW_DICTIONARY = b"Lorem ipsum dolor sit amet."
+
+
+@pytest.mark.parametrize("codec", ["zlib", "lzma"])
+def test_contents_are_compressed_and_decoded(codec):
+    content_codec = ContentCodec(codec)
+
+    value, encoding = content_codec.encode(CONTENT)
+
+    assert (encoding, type(value)) == (codec, bytes)
+    assert len(value) < len(CONTENT)
+    assert content_codec.decode(value, encoding) == CONTENT
+
+
+def test_rows_of_a_retired_dictionary_stay_readable():
+    old_codec = ContentCodec("zlib", dictionaries=[OLD_DICTIONARY])
+    value, encoding = old_codec.encode(CONTENT)
+
+    codec = ContentCodec("zlib", dictionaries=[NEW_DICTIONARY, OLD_DICTIONARY])
+
+    assert codec.encode(CONTENT)[1] != encoding
+    assert codec.decode(value, encoding) == CONTENT
+
+
+def test_row_of_a_removed_dictionary_is_read_as_a_placeholder():
+    old_codec = ContentCodec("zlib", dictionaries=[OLD_DICTIONARY])
+    value, encoding = old_codec.encode(CONTENT)
+
+    codec = ContentCodec("zlib", dictionaries=[NEW_DICTIONARY])
+
+    assert codec.decode(value, encoding) == UNDECODABLE_CONTENT
+
+
+def test_corrupt_row_is_read_as_a_placeholder():
+    codec = ContentCodec("zlib")
+    value, encoding = codec.encode(CONTENT)
+
+    assert codec.decode(value[:-8] + b"corrupt!", encoding) == UNDECODABLE_CONTENT
+    assert codec.decode(b"\x00" * 16, "lzma") == UNDECODABLE_CONTENT
+
+
+def test_missing_retired_dictionary_file_does_not_stop_the_codec(tmp_path):
+    path = os.path.join(tmp_path, "new.dict")
+    with open(path, "wb") as f:
+        f.write(NEW_DICTIONARY)
+    missing = os.path.join(tmp_path, "retired.dict")
+
+    codec = _create_codec("zlib", 6, (path, missing), 128)
+    assert codec.encode(CONTENT)[1] == f"zlib:{zlib.adler32(NEW_DICTIONARY):08x}"
+
+    # The dictionary of new contents is required
+    with pytest.raises(FileNotFoundError):
+        _create_codec("zlib", 6, (missing, path), 128)
+
+
+def test_undecodable_row_does_not_break_its_conversation(
+    app, client, auth_headers, user_id
+):
+    from backend.db import get_chat_db
+
+    client.post(
+        "/api/send_user_message",
+        json={"activeContactId": PERSONALITY_ID, "newMessage": "Hello!"},
+        headers=auth_headers,
+    )
+    with app.app_context():
+        db = get_chat_db(user_id)
+        db.execute(
+            """
+            INSERT INTO messages (USER_ID, PERSONALITY_ID, SEQ, ROLE, CONTENT, ENCODING)
+            SELECT USER_ID, PERSONALITY_ID, MAX(SEQ) + 1, 'assistant', ?, ?
+            FROM messages WHERE USER_ID = ? AND PERSONALITY_ID = ?
+            """,
+            (b"unreadable", "zlib:deadbeef", user_id, PERSONALITY_ID),
+        )
+        db.commit()
+
+    response = client.post(
+        "/api/fetch_chat_history", json={"id": PERSONALITY_ID}, headers=auth_headers
+    )
+
+    assert response.status_code == 200
+    contents = [message["content"] for message in response.get_json()]
+    assert contents[-3:] == ["Hello!", "echo: Hello!", UNDECODABLE_CONTENT]
@@ -0,0 +1,184 @@
+"""
+test_fake_model.py
+
+Author: Tim Duggan
+Date: 10/18/2026
+Company: ImposterAI
+Contact: csw73@cornell.edu
+
+Tests of the fake model and of the fake model server speaking the chat completions
+wire format.
+"""
+# region General/API Imports
+import asyncio
+import threading
+import time
+
+import pytest
+from aiohttp import web
+
+# endregion
+
+# region Backend Imports
+from backend.ai_model import ModelError
+from backend.async_gpt_model import AsyncGPTModel
+from backend.fake_model import FakeModel, FakeProfile
+from backend.model_factory import create_model
+from FakeModelServer import create_server
+
+# endregion
+
+MESSAGES = [{"role": "user", "content": "Hello there!"}]
+
+
+@pytest.fixture
+def fake_server():
+    """
+    Serves the fake model in a background thread.
+
+    Yields:
+        Callable: Starts the server for a profile and returns its API base URL.
+    """
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    runners = []
+
+    def serve(profile: FakeProfile) -> str:
+        async def start() -> int:
+            runner = web.AppRunner(create_server(profile))
+            await runner.setup()
+            await web.TCPSite(runner, "127.0.0.1", 0).start()
+            runners.append(runner)
+            return runner.addresses[0][1]
+
+        port = asyncio.run_coroutine_threadsafe(start(), loop).result()
+        return f"http://127.0.0.1:{port}/v1"
+
+    yield serve
+
+    for runner in runners:
+        asyncio.run_coroutine_threadsafe(runner.cleanup(), loop).result()
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join()
+    loop.close()
+
+
+def read_stream(stream) -> tuple:
+    """
+    Reads a stream to its end.
+
+    Args:
+        stream (Generator): The stream.
+
+    Returns:
+        tuple: The chunks and the return value of the stream.
+    """
+    chunks = []
+    while True:
+        try:
+            chunks.append(next(stream))
+        except StopIteration as stop:
+            return chunks, stop.value
+
+
+def test_reply_is_rendered_from_the_template():
+    profile = FakeProfile("{personality_id} got {messages}: {message}")
+    model = FakeModel(profile)
+
+    resp = model.make_request(MESSAGES, personality_id=3)
+
+    assert resp == {"role": "assistant", "content": "3 got 1: Hello there!"}
+
+
+def test_stream_splits_the_reply_into_chunks():
+    model = FakeModel(FakeProfile("one two three", chunk_delay=0.01))
+
+    chunks, completed = read_stream(model.stream_request(MESSAGES))
+
+    assert chunks == ["one", " two", " three"]
+    assert completed is True
+
+
+@pytest.mark.parametrize("latency", ["fixed", "uniform:1", "gamma:1:2"])
+def test_invalid_latency_is_rejected(latency):
+    with pytest.raises(ValueError):
+        FakeProfile(latency=latency)
+
+
+def test_seeded_latencies_are_reproducible():
+    profiles = [FakeProfile(latency="lognormal:1.5:0.5", seed=7) for _ in range(2)]
+
+    latencies = [[profile.get_latency() for _ in range(5)] for profile in profiles]
+
+    assert latencies[0] == latencies[1]
+    assert all(latency > 0 for latency in latencies[0])
+
+
+def test_slow_response_times_out():
+    model = FakeModel(FakeProfile(latency="fixed:1.0"))
+
+    started = time.monotonic()
+    assert model.make_request(MESSAGES, timeout=0.1) is None
+    assert time.monotonic() - started < 0.5
+
+
+def test_injected_errors_are_retryable_model_errors():
+    model = FakeModel(FakeProfile(error_rate=1.0))
+    assert model.make_request(MESSAGES) is None
+
+    model.raise_errors = True
+    with pytest.raises(ModelError, match="status 500") as error:
+        model.make_request(MESSAGES)
+    assert error.value.retryable
+
+
+def test_requests_beyond_the_rate_limit_are_rejected():
+    model = FakeModel(FakeProfile(requests_per_minute=2))
+    model.raise_errors = True
+
+    model.make_request(MESSAGES)
+    model.make_request(MESSAGES)
+    with pytest.raises(ModelError, match="status 429"):
+        model.make_request(MESSAGES)
+
+
+def test_fake_client_is_selected_by_the_configuration(app):
+    config = {
+        **app.config,
+        "MODEL_CLIENT": "fake",
+        "MODEL_FALLBACKS": [],
+        "MODEL_RETRIES": None,
+        "RESPONSE_CACHE": False,
+        "RATE_LIMIT_REQUESTS_PER_MINUTE": 0,
+        "RATE_LIMIT_TOKENS_PER_MINUTE": 0,
+        "FAKE_MODEL_REPLY": "Fake: {message}",
+        "FAKE_MODEL_LATENCY": "none",
+    }
+
+    model = create_model(config)
+
+    assert isinstance(model, FakeModel)
+    assert model.make_request(MESSAGES)["content"] == "Fake: Hello there!"
+
+
+def test_server_speaks_the_chat_completions_format(app, fake_server):
+    api_base = fake_server(FakeProfile("Served: {message}", chunk_delay=0.01))
+    client = AsyncGPTModel({**app.config, "OPENAI_API_BASE": api_base})
+
+    assert client.make_request(MESSAGES)["content"] == "Served: Hello there!"
+    chunks, completed = read_stream(client.stream_request(MESSAGES))
+    assert "".join(chunks) == "Served: Hello there!"
+    assert len(chunks) == 3
+    assert completed is True
+
+
+def test_server_errors_are_retryable_for_the_client(app, fake_server):
+    api_base = fake_server(FakeProfile(requests_per_minute=1))
+    client = AsyncGPTModel({**app.config, "OPENAI_API_BASE": api_base})
+    client.raise_errors = True
+
+    client.make_request(MESSAGES)
+    with pytest.raises(ModelError) as error:
+        client.make_request(MESSAGES)
+    assert error.value.retryable
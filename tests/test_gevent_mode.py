@@ -0,0 +1,125 @@
+"""
+test_gevent_mode.py
+
+Author: Tim Duggan
+Date: 10/18/2026
+Company: ImposterAI
+Contact: csw73@cornell.edu
+
+Tests of running SQLite calls and password hashes on gevent's threadpool, so they
+do not block the other greenlets of a gevent worker.
+"""
+# region General/API Imports
+import os
+import runpy
+import sqlite3
+import threading
+import time
+
+import gevent
+import pytest
+
+# endregion
+
+# region Backend Imports
+from backend.db import ThreadpoolConnection, connect
+from backend.password_hasher import PasswordHasher
+
+# endregion
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def config(app) -> dict:
+    """
+    Configuration running SQLite calls on gevent's threadpool.
+    """
+    return {**app.config, "SERVER_THREADPOOL": True, "SQLITE_BUSY_TIMEOUT": 2.0}
+
+
+@pytest.fixture
+def database(tmp_path) -> str:
+    """
+    Path to a new database with a table of values.
+    """
+    path = os.path.join(tmp_path, "values.sqlite")
+    db = sqlite3.connect(path)
+    db.execute("CREATE TABLE items (VALUE INTEGER)")
+    db.commit()
+    db.close()
+    return path
+
+
+def test_statements_run_on_the_threadpool(config, database):
+    db = connect(database, config)
+    db.create_function("thread_id", 0, threading.get_ident)
+
+    assert isinstance(db, ThreadpoolConnection)
+    assert db.execute("SELECT thread_id()").fetchone()[0] != threading.get_ident()
+
+    # Statements behave like the ones of a plain connection
+    cursor = db.executemany("INSERT INTO items (VALUE) VALUES (?)", [(1,), (2,), (3,)])
+    assert cursor.rowcount == 3
+    assert db.execute("INSERT INTO items (VALUE) VALUES (4)").lastrowid == 4
+    db.commit()
+    values = [row["VALUE"] for row in db.execute("SELECT VALUE FROM items")]
+    assert values == [1, 2, 3, 4]
+    cursor = db.execute("SELECT VALUE FROM items ORDER BY VALUE")
+    assert cursor.fetchone()[0] == 1
+    assert [row[0] for row in cursor.fetchmany(2)] == [2, 3]
+    assert [row[0] for row in cursor.fetchall()] == [4]
+    assert cursor.fetchone() is None
+
+
+def test_greenlet_waiting_for_a_lock_does_not_block_the_others(config, database):
+    waiter = connect(database, config)
+    waiter.isolation_level = None
+    holder = sqlite3.connect(database, isolation_level=None)
+    holder.execute("BEGIN IMMEDIATE")
+    events = []
+
+    def write() -> None:
+        # Waits for the lock of the holder
+        waiter.execute("BEGIN IMMEDIATE")
+        waiter.execute("INSERT INTO items (VALUE) VALUES (1)")
+        waiter.execute("COMMIT")
+        events.append("written")
+
+    def release() -> None:
+        gevent.sleep(0.1)
+        events.append("released")
+        holder.execute("COMMIT")
+
+    started = time.monotonic()
+    gevent.joinall([gevent.spawn(write), gevent.spawn(release)], raise_error=True)
+
+    # The holder released its lock while the writer waited, long before the
+    # writer's busy timeout
+    assert events == ["released", "written"]
+    assert time.monotonic() - started < 1.0
+
+
+def test_passwords_are_hashed_on_the_threadpool_without_processes():
+    hasher = PasswordHasher("pbkdf2:sha256:1000", 1, 2, 1.0, threadpool=True)
+
+    pwhash = hasher.hash("secret")
+
+    assert hasher.check(pwhash, "secret")
+    assert not hasher.check(pwhash, "wrong")
+    assert hasher._pool is None
+
+
+def test_gevent_workers_use_the_threadpool(monkeypatch):
+    for name in (
+        "CHAT_WRITE_BATCHING",
+        "SERVER_THREADPOOL",
+        "MODEL_CLIENT",
+        "SQLITE_SHARED_POOL",
+    ):
+        monkeypatch.delenv(name, raising=False)
+    monkeypatch.setenv("SERVER_MODE", "gevent")
+
+    runpy.run_path(os.path.join(ROOT, "gunicorn.conf.py"))
+
+    assert os.environ["SERVER_THREADPOOL"] == "1"
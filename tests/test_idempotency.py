@@ -0,0 +1,193 @@
+"""
+test_idempotency.py
+
+Author: Tim Duggan
+Date: 10/18/2026
+Company: ImposterAI
+Contact: csw73@cornell.edu
+
+Tests of the idempotency keys of /api/send_user_message: replays, coalescing of
+concurrent duplicates and keys reused for another message.
+"""
+# region General/API Imports
+import hashlib
+import json
+import os
+import threading
+import time
+
+import pytest
+
+# endregion
+
+# region Backend Imports
+from backend.ai_model import AIModel
+from backend.idempotency import IdempotencyStore
+
+# endregion
+
+# Conversation every test sends to
+PERSONALITY_ID = 9
+
+
+class CountingModel(AIModel):
+    def __init__(self, delay: float = 0.0, failures: int = 0) -> None:
+        """
+        Model counting its requests, answering with the request number.
+
+        Args:
+            delay (float): Seconds until a response.
+            failures (int): Number of first requests without a response.
+        """
+        self.requests: int = 0
+        self._delay: float = delay
+        self._failures: int = failures
+        self._lock = threading.Lock()
+
+    def make_request(self, conversation_messages, **kwargs):
+        with self._lock:
+            self.requests += 1
+            request = self.requests
+        time.sleep(self._delay)
+        if request <= self._failures:
+            return None
+        return {"role": "assistant", "content": f"reply {request}"}
+
+
+def send_message(client, auth_headers: dict, key: str, message: str = "Hello!"):
+    """
+    Sends a message to /api/send_user_message with an idempotency key.
+
+    Args:
+        client (FlaskClient): Test client of the application.
+        auth_headers (dict): Authorization headers of the user.
+        key (str): Idempotency key.
+        message (str): The message.
+
+    Returns:
+        TestResponse: The response.
+    """
+    return client.post(
+        "/api/send_user_message",
+        json={"activeContactId": PERSONALITY_ID, "newMessage": message},
+        headers={**auth_headers, "Idempotency-Key": key},
+    )
+
+
+def count_user_messages(client, auth_headers: dict) -> int:
+    """
+    Counts the stored user messages of the conversation.
+
+    Args:
+        client (FlaskClient): Test client of the application.
+        auth_headers (dict): Authorization headers of the user.
+
+    Returns:
+        int: Number of user messages.
+    """
+    response = client.post(
+        "/api/fetch_chat_history", json={"id": PERSONALITY_ID}, headers=auth_headers
+    )
+    return sum(message["role"] == "user" for message in response.get_json())
+
+
+@pytest.fixture
+def store(app, tmp_path):
+    """
+    Creates a key store with a new database and the given TTL and wait.
+    """
+
+    def create(ttl: float = 60.0, wait: float = 5.0) -> IdempotencyStore:
+        path = os.path.join(tmp_path, "idempotency.sqlite")
+        return IdempotencyStore(path, ttl, wait, 0.01, app.config)
+
+    return create
+
+
+def test_duplicate_replays_the_stored_response(monkeypatch, app, client, auth_headers):
+    model = CountingModel()
+    monkeypatch.setitem(app.extensions, "model", model)
+
+    first = send_message(client, auth_headers, "key-1")
+    second = send_message(client, auth_headers, "key-1")
+
+    assert first.status_code == second.status_code == 200
+    assert first.get_json() == second.get_json()
+    assert model.requests == 1
+    assert count_user_messages(client, auth_headers) == 1
+
+
+def test_concurrent_duplicates_are_coalesced(monkeypatch, app, auth_headers):
+    model = CountingModel(delay=0.3)
+    monkeypatch.setitem(app.extensions, "model", model)
+
+    responses = []
+
+    def send() -> None:
+        responses.append(send_message(app.test_client(), auth_headers, "key-1"))
+
+    threads = [threading.Thread(target=send) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert model.requests == 1
+    contents = [response.get_json()["content"] for response in responses]
+    assert contents == ["reply 1"] * 3
+    assert count_user_messages(app.test_client(), auth_headers) == 1
+
+
+def test_key_reused_for_another_message_is_rejected(
+    monkeypatch, app, client, auth_headers
+):
+    monkeypatch.setitem(app.extensions, "model", CountingModel())
+
+    send_message(client, auth_headers, "key-1", "Hello!")
+    response = send_message(client, auth_headers, "key-1", "Goodbye!")
+
+    assert response.status_code == 422
+    assert "error" in response.get_json()
+
+
+def test_failed_request_releases_its_key(monkeypatch, app, client, auth_headers):
+    model = CountingModel(failures=1)
+    monkeypatch.setitem(app.extensions, "model", model)
+
+    assert send_message(client, auth_headers, "key-1").get_json()["error"]
+    retry = send_message(client, auth_headers, "key-1")
+
+    assert retry.get_json()["content"] == "reply 2"
+    assert model.requests == 2
+
+
+def test_expired_key_runs_the_request_again(store):
+    keys = store(ttl=0.1)
+    handler_calls = []
+
+    def handler():
+        handler_calls.append(1)
+        return {"content": f"reply {len(handler_calls)}"}, True
+
+    first = keys.execute(1, "key-1", {"message": "Hello!"}, handler)
+    time.sleep(0.15)
+    second = keys.execute(1, "key-1", {"message": "Hello!"}, handler)
+
+    assert (first["content"], second["content"]) == ("reply 1", "reply 2")
+
+
+def test_key_abandoned_in_flight_is_taken_over(store):
+    keys = store(wait=0.2)
+    payload = {"message": "Hello!"}
+    fingerprint = hashlib.sha256(
+        json.dumps(payload, sort_keys=True).encode("utf-8")
+    ).hexdigest()
+
+    # Another worker claimed the key and died before finishing the request
+    assert keys._claim(1, "key-1", fingerprint)[0] == "claimed"
+
+    started = time.monotonic()
+    response = keys.execute(1, "key-1", payload, lambda: ({"content": "Hi!"}, True))
+
+    assert response == {"content": "Hi!"}
+    assert 0.15 <= time.monotonic() - started < 1.0
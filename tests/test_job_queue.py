@@ -0,0 +1,212 @@
+"""
+test_job_queue.py
+
+Author: Tim Duggan
+Date: 10/18/2026
+Company: ImposterAI
+Contact: csw73@cornell.edu
+
+Tests of the reply generation job queue.
+"""
+# region General/API Imports
+import json
+import os
+import tempfile
+import threading
+import time
+
+import pytest
+
+# endregion
+
+# region Backend Imports
+from backend.chat_manager import ChatManager
+from backend.database_manager import DatabaseManager as dbm
+from backend.fake_model import FakeModel, FakeProfile
+from backend.job_queue import JobQueue, JobWorkerPool
+
+# endregion
+
+# Conversation the jobs are generated for
+PERSONALITY_ID = 9
+
+
+@pytest.fixture
+def queue(app) -> JobQueue:
+    """
+    A job queue in a new database, with leases of 50ms.
+    """
+    path = os.path.join(tempfile.mkdtemp(), "job_queue.sqlite")
+    return JobQueue(path, 0.05, 3, 60.0, app.config)
+
+
+def test_conversation_has_at_most_one_unfinished_job(queue):
+    job_id = queue.reserve(1, PERSONALITY_ID)
+
+    assert queue.reserve(1, PERSONALITY_ID) is None
+    assert queue.reserve(2, PERSONALITY_ID) is not None
+
+    # A cancelled reservation frees the conversation
+    queue.cancel(job_id)
+    assert queue.get(1, job_id) is None
+    assert queue.reserve(1, PERSONALITY_ID) is not None
+
+
+def test_jobs_are_claimed_in_order_once_enqueued(queue):
+    first = queue.reserve(1, PERSONALITY_ID)
+    second = queue.reserve(2, PERSONALITY_ID)
+
+    # [1] Reserved jobs wait for their message to be stored
+    assert queue.claim() is None
+
+    # [2] Enqueued jobs are claimed oldest first
+    queue.enqueue(second)
+    queue.enqueue(first)
+    assert queue.claim()["id"] == first
+    assert queue.claim()["id"] == second
+    assert queue.get(1, first)["status"] == "running"
+    assert queue.claim() is None
+
+
+def test_reserved_job_of_a_dead_request_is_claimed_after_its_lease(queue):
+    job_id = queue.reserve(1, PERSONALITY_ID)
+    assert queue.get(1, job_id)["status"] == "queued"
+
+    time.sleep(0.1)
+    assert queue.claim()["id"] == job_id
+
+
+def test_job_is_failed_after_the_maximum_attempts(queue):
+    job_id = queue.reserve(1, PERSONALITY_ID)
+    queue.enqueue(job_id)
+
+    # Every worker dies, so the lease of every attempt expires
+    for attempt in range(1, 4):
+        assert queue.claim()["attempts"] == attempt
+        time.sleep(0.1)
+
+    assert queue.claim() is None
+    assert queue.get(1, job_id)["status"] == "failed"
+    assert queue.reserve(1, PERSONALITY_ID) is not None
+
+
+def test_finished_job_stores_its_result(queue):
+    done_id = queue.reserve(1, PERSONALITY_ID)
+    failed_id = queue.reserve(2, PERSONALITY_ID)
+    queue.enqueue(done_id)
+    queue.enqueue(failed_id)
+
+    assert queue.finish(queue.claim(), {"content": "Hi!", "id": PERSONALITY_ID})
+    assert queue.finish(queue.claim(), {"content": "...", "error": True})
+
+    assert queue.get(1, done_id) == {
+        "id": done_id,
+        "status": "done",
+        "result": {"content": "Hi!", "id": PERSONALITY_ID},
+    }
+    assert queue.get(2, failed_id)["status"] == "failed"
+    # Jobs are only visible to their user
+    assert queue.get(2, done_id) is None
+
+
+def test_queued_message_is_answered_by_the_job_workers(
+    monkeypatch, app, client, auth_headers
+):
+    path = os.path.join(tempfile.mkdtemp(), "job_queue.sqlite")
+    job_queue = JobQueue(path, 5.0, 3, 60.0, app.config)
+    monkeypatch.setitem(app.extensions, "job_queue", job_queue)
+    monkeypatch.setitem(app.config, "MESSAGE_JOBS", True)
+    payload = {"activeContactId": PERSONALITY_ID, "newMessage": "Hello!"}
+
+    # [1] The message is queued, and the next one rejected until it is answered
+    response = client.post("/api/send_user_message", json=payload, headers=auth_headers)
+    assert response.status_code == 202
+    job_id = response.get_json()["job_id"]
+    response = client.post("/api/send_user_message", json=payload, headers=auth_headers)
+    assert response.status_code == 409
+
+    # [2] A job worker generates and stores the reply
+    pool = JobWorkerPool(app, job_queue, 1, 0.01)
+    thread = threading.Thread(target=pool.run)
+    thread.start()
+    try:
+        for _ in range(200):
+            job = client.get(
+                f"/api/generation_jobs/{job_id}", headers=auth_headers
+            ).get_json()
+            if job["status"] == "done":
+                break
+            time.sleep(0.01)
+    finally:
+        pool.stop()
+        thread.join()
+
+    assert job["result"] == {
+        "role": "assistant",
+        "content": "echo: Hello!",
+        "id": PERSONALITY_ID,
+    }
+    history = client.post(
+        "/api/fetch_chat_history", json={"id": PERSONALITY_ID}, headers=auth_headers
+    ).get_json()
+    assert history[-1] == {"role": "assistant", "content": "echo: Hello!"}
+
+
+def test_expired_attempt_cannot_finish_a_job_taken_over(queue):
+    job_id = queue.reserve(1, PERSONALITY_ID)
+    queue.enqueue(job_id)
+    stale = queue.claim()
+
+    # The lease expires and another worker takes the job over
+    time.sleep(0.1)
+    current = queue.claim()
+    assert (stale["id"], stale["attempts"]) == (job_id, 1)
+    assert (current["id"], current["attempts"]) == (job_id, 2)
+    assert not queue.owns(stale)
+    assert queue.owns(current)
+
+    assert queue.finish(current, {"content": "current", "id": PERSONALITY_ID})
+    assert not queue.finish(stale, {"content": "stale", "id": PERSONALITY_ID})
+    assert queue.get(1, job_id)["result"]["content"] == "current"
+
+
+def test_reply_of_a_job_taken_over_is_not_stored(app, user_id):
+    with app.test_request_context():
+        chat_manager = ChatManager(user_id, FakeModel(FakeProfile()))
+        chat_manager._add_user_message(PERSONALITY_ID, "Hello!")
+        chat_manager.store_conversation(PERSONALITY_ID)
+
+        result = chat_manager.generate_reply(PERSONALITY_ID, lambda: False)
+
+        messages = dbm.get_chat_from_id(user_id, PERSONALITY_ID)
+    assert result["content"] == "Fake reply to: Hello!"
+    assert [message["role"] for message in messages][-1] == "user"
+
+
+def test_subscription_ends_with_a_timeout_without_job_workers(
+    app, client, auth_headers, user_id, monkeypatch
+):
+    from backend.job_queue import get_job_queue
+
+    monkeypatch.setitem(app.config, "JOB_POLL_INTERVAL", 0.01)
+    monkeypatch.setitem(app.config, "JOB_HEARTBEAT_INTERVAL", 0.05)
+    monkeypatch.setitem(app.config, "JOB_SUBSCRIBE_TIMEOUT", 0.3)
+    with app.app_context():
+        job_queue = get_job_queue()
+    job_id = job_queue.reserve(user_id, PERSONALITY_ID)
+    job_queue.enqueue(job_id)
+
+    started = time.monotonic()
+    response = client.get(
+        f"/api/generation_jobs/{job_id}/events", headers=auth_headers
+    )
+    events = response.get_data(as_text=True).split("\n\n")
+
+    assert time.monotonic() - started < 1.0
+    assert events[0].startswith("event: status\n")
+    assert json.loads(events[0].split("data: ", 1)[1]) == {
+        "id": job_id,
+        "status": "queued",
+    }
+    assert ": heartbeat" in events
+    assert events[-2].startswith("event: timeout\n")
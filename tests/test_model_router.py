@@ -0,0 +1,106 @@
+"""
+test_model_router.py
+
+Author: Tim Duggan
+Date: 10/18/2026
+Company: ImposterAI
+Contact: csw73@cornell.edu
+
+Tests of the fallback chain of the model router: every model only gets the time
+left of the request's deadline, and the worker timeout leaves room for it.
+"""
+# region General/API Imports
+import os
+import runpy
+import time
+
+import pytest
+
+# endregion
+
+# region Backend Imports
+from backend.fake_model import FakeModel, FakeProfile
+from backend.metrics import METRICS
+from backend.model_router import ModelRouter, Route
+from backend.resilient_model import ResilientModel
+
+# endregion
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MESSAGES = [{"role": "user", "content": "Hello!"}]
+
+
+def create_route(model_id: str, latency: str, error_rate: float) -> Route:
+    """
+    Creates a route to a fake model without retries.
+
+    Args:
+        model_id (str): Id of the route.
+        latency (str): Latency distribution of the fake model.
+        error_rate (float): Share of failing requests.
+
+    Returns:
+        Route: The route.
+    """
+    profile = FakeProfile(f"{model_id}: {{message}}", latency, error_rate=error_rate)
+    return Route(model_id, ResilientModel(FakeModel(profile), retries=0), 8192)
+
+
+def test_fallback_answers_when_the_first_model_fails():
+    router = ModelRouter(
+        [
+            create_route("fallback-a", "none", 1.0),
+            create_route("fallback-b", "none", 0.0),
+        ],
+        deadline=5.0,
+    )
+
+    resp = router.make_request(MESSAGES)
+
+    assert resp["content"] == "fallback-b: Hello!"
+    assert METRICS.get_counter("router.fallbacks.fallback-a") == 1
+
+
+def test_fallback_chain_stops_at_the_request_deadline():
+    router = ModelRouter(
+        [
+            create_route("deadline-a", "fixed:0.3", 1.0),
+            create_route("deadline-b", "fixed:0.3", 0.0),
+            create_route("deadline-c", "none", 0.0),
+        ],
+        deadline=0.5,
+    )
+
+    started = time.monotonic()
+    resp = router.make_request(MESSAGES)
+    elapsed = time.monotonic() - started
+
+    # The first model fails after 0.3s, the second times out with the 0.2s left
+    # and the third is never tried
+    assert resp is None
+    assert 0.45 <= elapsed < 0.7
+    assert METRICS.get_counter("router.requests.deadline-b") == 1
+    assert METRICS.get_counter("router.requests.deadline-c") == 0
+    assert METRICS.get_counter("router.deadline_exceeded") >= 1
+
+
+def test_request_timeout_shortens_the_router_deadline():
+    router = ModelRouter([create_route("timeout-a", "fixed:1.0", 0.0)], deadline=5.0)
+
+    started = time.monotonic()
+    resp = router.make_request(MESSAGES, timeout=0.2)
+
+    assert resp is None
+    assert time.monotonic() - started < 0.5
+
+
+def test_request_deadline_is_below_the_worker_timeout(monkeypatch):
+    monkeypatch.delenv("SERVER_TIMEOUT", raising=False)
+    settings = runpy.run_path(os.path.join(ROOT, "gunicorn.conf.py"))
+    settings["on_starting"](None)
+
+    monkeypatch.setenv("SERVER_TIMEOUT", "60")
+    settings = runpy.run_path(os.path.join(ROOT, "gunicorn.conf.py"))
+    with pytest.raises(ValueError, match="MODEL_REQUEST_DEADLINE"):
+        settings["on_starting"](None)
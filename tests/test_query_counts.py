@@ -0,0 +1,114 @@
+"""
+test_query_counts.py
+
+Author: Tim Duggan
+Date: 10/18/2026
+Company: ImposterAI
+Contact: csw73@cornell.edu
+
+Counts the SQL statements run by the chat endpoints. A request only loads the
+conversation it uses, so the count is fixed and must not grow with the number of
+conversations the user has saved.
+"""
+# region General/API Imports
+import json
+
+import pytest
+
+# endregion
+
+# Conversation every endpoint is called for
+PERSONALITY_ID = 9
+
+ENDPOINTS = {
+    "send_user_message": (
+        "post",
+        "/api/send_user_message",
+        {"activeContactId": PERSONALITY_ID, "newMessage": "Hello!"},
+    ),
+    "fetch_chat_history": (
+        "post",
+        "/api/fetch_chat_history",
+        {"id": PERSONALITY_ID},
+    ),
+    "fetch_chat_history_page": (
+        "post",
+        "/api/fetch_chat_history_page",
+        {"id": PERSONALITY_ID, "limit": 10},
+    ),
+    "fetch_contacts": ("get", "/backend/fetch_contacts", None),
+}
+
+# Statements every endpoint runs once the per-worker caches are warm
+EXPECTED_STATEMENTS = {
+    # User lookup, messages of the conversation, personality cache generation check,
+    # and the transaction appending the two messages (BEGIN, chat row, two
+    # messages, chat preview, COMMIT)
+    "send_user_message": 9,
+    # User lookup, messages of the conversation, personality cache generation check
+    "fetch_chat_history": 3,
+    # User lookup and the page of messages
+    "fetch_chat_history_page": 2,
+    # User lookup, chat previews, personality cache generation check
+    "fetch_contacts": 3,
+}
+
+
+def count_statements(app, client, auth_headers: dict, endpoint: str) -> int:
+    """
+    Calls an endpoint, counting the SQL statements run on the database connection.
+
+    Args:
+        app (Flask): The application.
+        client (FlaskClient): Test client of the application.
+        auth_headers (dict): Authorization headers of the user.
+        endpoint (str): Key of the endpoint in ENDPOINTS.
+
+    Returns:
+        int: Number of statements.
+    """
+    from backend.db import get_db
+
+    method, url, payload = ENDPOINTS[endpoint]
+    statements = []
+    # Requests of the test client reuse the pooled connection of this thread
+    with app.app_context():
+        db = get_db()
+    db.set_trace_callback(statements.append)
+    try:
+        response = getattr(client, method)(url, json=payload, headers=auth_headers)
+    finally:
+        db.set_trace_callback(None)
+
+    assert response.status_code == 200, response.data
+    return len(statements)
+
+
+@pytest.mark.parametrize("endpoint", ENDPOINTS)
+def test_statement_count_does_not_grow_with_saved_chats(
+    app, client, auth_headers, endpoint
+):
+    # [1] Start the conversation and warm up the per-worker caches
+    for name in ENDPOINTS:
+        count_statements(app, client, auth_headers, name)
+    expected = EXPECTED_STATEMENTS[endpoint]
+    assert count_statements(app, client, auth_headers, endpoint) == expected
+
+    # [2] Save a conversation with every other personality
+    contacts = json.loads(
+        client.get("/backend/fetch_contacts", headers=auth_headers).data
+    )
+    other_ids = [
+        contact["id"] for contact in contacts if contact["id"] != PERSONALITY_ID
+    ]
+    assert other_ids
+    for personality_id in other_ids:
+        response = client.post(
+            "/api/send_user_message",
+            json={"activeContactId": personality_id, "newMessage": "Hi!"},
+            headers=auth_headers,
+        )
+        assert response.status_code == 200
+
+    # [3] The endpoint runs as many statements as with a single conversation
+    assert count_statements(app, client, auth_headers, endpoint) == expected
@@ -0,0 +1,146 @@
+"""
+test_rate_limiter.py
+
+Author: Tim Duggan
+Date: 10/18/2026
+Company: ImposterAI
+Contact: csw73@cornell.edu
+
+Tests of the token buckets shared by the workers and of the round-robin scheduling
+of the requests waiting for them.
+"""
+# region General/API Imports
+import os
+import threading
+import time
+
+import pytest
+
+# endregion
+
+# region Backend Imports
+from backend.fake_model import FakeModel, FakeProfile
+from backend.rate_limiter import FairScheduler, RateLimitedModel, TokenBuckets
+
+# endregion
+
+MESSAGES = [{"role": "user", "content": "Hello!"}]
+
+
+class ManualBuckets:
+    def __init__(self) -> None:
+        """
+        Buckets only admitting the requests released by the test.
+        """
+        self.released: int = 0
+        self._lock = threading.Lock()
+
+    def release(self) -> None:
+        """
+        Admits one more request.
+        """
+        with self._lock:
+            self.released += 1
+
+    def try_acquire(self, costs) -> float:
+        with self._lock:
+            if self.released:
+                self.released -= 1
+                return 0
+        return 0.01
+
+
+@pytest.fixture
+def buckets_path(tmp_path) -> str:
+    """
+    Path to a new bucket database.
+    """
+    return os.path.join(tmp_path, "rate_limit.sqlite")
+
+
+def test_bucket_refills_at_its_limit_per_minute(app, buckets_path):
+    buckets = TokenBuckets(buckets_path, "model", {"requests": 60}, app.config)
+
+    # [1] A full bucket holds a minute's worth of requests
+    for _ in range(60):
+        assert buckets.try_acquire({"requests": 1}) == 0
+
+    # [2] The next request waits for a refill of one request per second
+    assert 0.9 < buckets.try_acquire({"requests": 1}) <= 1.0
+
+
+def test_costs_are_only_taken_if_every_bucket_has_enough(app, buckets_path):
+    limits = {"requests": 60, "tokens": 600}
+    buckets = TokenBuckets(buckets_path, "model", limits, app.config)
+
+    assert buckets.try_acquire({"requests": 1, "tokens": 600}) == 0
+    assert buckets.try_acquire({"requests": 1, "tokens": 300}) > 0
+
+    # The rejected request took no request from its bucket
+    for _ in range(59):
+        assert buckets.try_acquire({"requests": 1, "tokens": 0}) == 0
+
+
+def test_oversized_request_only_waits_for_a_full_bucket(app, buckets_path):
+    buckets = TokenBuckets(buckets_path, "model", {"tokens": 600}, app.config)
+
+    # Unlimited buckets are ignored
+    assert buckets.try_acquire({"tokens": 6000, "requests": 1}) == 0
+    assert 59 < buckets.try_acquire({"tokens": 6000}) <= 60
+
+
+def test_buckets_are_shared_by_workers(app, buckets_path):
+    worker_a = TokenBuckets(buckets_path, "model", {"requests": 60}, app.config)
+    worker_b = TokenBuckets(buckets_path, "model", {"requests": 60}, app.config)
+    other_model = TokenBuckets(buckets_path, "other", {"requests": 60}, app.config)
+
+    assert worker_a.try_acquire({"requests": 60}) == 0
+    assert worker_b.try_acquire({"requests": 1}) > 0
+    assert other_model.try_acquire({"requests": 1}) == 0
+
+
+def test_waiting_requests_are_served_round_robin_per_user():
+    buckets = ManualBuckets()
+    scheduler = FairScheduler(buckets)
+    served = []
+
+    def request(user_id: str, label: str) -> None:
+        assert scheduler.acquire(user_id, {"requests": 1}, 5.0)
+        served.append(label)
+
+    # [1] A chatty user queues three requests before another user queues one
+    threads = []
+    for user_id, label in [("a", "a1"), ("a", "a2"), ("a", "a3"), ("b", "b1")]:
+        threads.append(threading.Thread(target=request, args=(user_id, label)))
+        threads[-1].start()
+        time.sleep(0.05)
+
+    # [2] Admit the requests one at a time
+    for count in range(1, 5):
+        buckets.release()
+        while len(served) < count:
+            time.sleep(0.01)
+    for thread in threads:
+        thread.join()
+
+    assert served == ["a1", "b1", "a2", "a3"]
+
+
+def test_request_waiting_too_long_is_rejected():
+    scheduler = FairScheduler(ManualBuckets())
+
+    started = time.monotonic()
+    assert not scheduler.acquire("a", {"requests": 1}, 0.1)
+    assert time.monotonic() - started < 0.5
+
+
+def test_wait_counts_against_the_request_timeout(app, buckets_path):
+    buckets = TokenBuckets(buckets_path, "model", {"requests": 1}, app.config)
+    model = RateLimitedModel(FakeModel(FakeProfile()), FairScheduler(buckets), 0, 60)
+
+    assert model.make_request(MESSAGES, user_id=1, timeout=5.0)
+
+    # The next request would wait a minute, longer than its timeout
+    started = time.monotonic()
+    assert model.make_request(MESSAGES, user_id=1, timeout=0.2) is None
+    assert time.monotonic() - started < 0.5
@@ -0,0 +1,232 @@
+"""
+test_resilient_model.py
+
+Author: Tim Duggan
+Date: 10/18/2026
+Company: ImposterAI
+Contact: csw73@cornell.edu
+
+Tests of the resilience layer of model requests.
+"""
+# region General/API Imports
+import threading
+import time
+
+import pytest
+
+# endregion
+
+# region Backend Imports
+from backend.ai_model import AIModel, ModelError
+from backend import resilient_model
+from backend.fake_model import FakeModel, FakeProfile
+from backend.metrics import METRICS
+from backend.resilient_model import CircuitBreaker, ResilientModel
+
+# endregion
+
+MESSAGES = [{"role": "user", "content": "Hello!"}]
+
+
+class ScriptedModel(AIModel):
+    def __init__(self, outcomes: list) -> None:
+        """
+        Model answering every request with the next scripted outcome: an exception
+        is raised, anything else is returned as the reply content.
+
+        Args:
+            outcomes (list): Outcomes of the requests, in order.
+        """
+        self.outcomes: list = list(outcomes)
+        self.requests: int = 0
+
+    def make_request(self, conversation_messages, **kwargs):
+        self.requests += 1
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return {"role": "assistant", "content": outcome}
+
+
+class DelayedModel(AIModel):
+    def __init__(self, delays: list) -> None:
+        """
+        Model answering every request after the next scripted delay.
+
+        Args:
+            delays (list): Delays (seconds) of the requests, in order.
+        """
+        self.delays: list = list(delays)
+        self._lock = threading.Lock()
+
+    def make_request(self, conversation_messages, **kwargs):
+        with self._lock:
+            delay = self.delays.pop(0)
+        time.sleep(delay)
+        return {"role": "assistant", "content": f"after {delay}s"}
+
+
+class StallingModel(AIModel):
+    def stream_request(self, conversation_messages, **kwargs):
+        """
+        Streams chunks slowly, ignoring the timeout like a stalled upstream.
+        """
+        self.timeout = kwargs.get("timeout")
+        for i in range(20):
+            yield f"chunk {i} "
+            time.sleep(0.1)
+        return True
+
+
+def read_stream(stream) -> tuple:
+    """
+    Reads a stream to its end.
+
+    Args:
+        stream (Generator): The stream.
+
+    Returns:
+        tuple: The chunks and the return value of the stream.
+    """
+    chunks = []
+    while True:
+        try:
+            chunks.append(next(stream))
+        except StopIteration as stop:
+            return chunks, stop.value
+
+
+@pytest.fixture
+def backoff_delays(monkeypatch) -> list:
+    """
+    Records the backoff delays instead of sleeping, always drawing the maximum
+    jittered delay.
+    """
+    delays = []
+    monkeypatch.setattr(resilient_model.random, "uniform", lambda low, high: high)
+    monkeypatch.setattr(resilient_model.time, "sleep", delays.append)
+    return delays
+
+
+def test_retryable_errors_are_retried(backoff_delays):
+    model = ScriptedModel([ModelError("rate limited", retryable=True)] * 2 + ["Hi!"])
+    resilient = ResilientModel(model, retries=2, base_delay=0.01)
+    retries = METRICS.get_counter("model.retries")
+
+    assert resilient.make_request(MESSAGES)["content"] == "Hi!"
+    assert model.requests == 3
+    assert METRICS.get_counter("model.retries") == retries + 2
+
+
+def test_other_errors_are_not_retried(backoff_delays):
+    model = ScriptedModel([ModelError("bad request"), "Hi!"])
+    resilient = ResilientModel(model, retries=2)
+
+    assert resilient.make_request(MESSAGES) is None
+    assert model.requests == 1
+    assert backoff_delays == []
+
+
+def test_backoff_grows_exponentially_up_to_the_maximum(backoff_delays):
+    model = ScriptedModel([ModelError("unavailable", retryable=True)] * 5)
+    resilient = ResilientModel(model, retries=4, base_delay=0.1, max_delay=0.5)
+
+    assert resilient.make_request(MESSAGES) is None
+    assert model.requests == 5
+    assert backoff_delays == [0.1, 0.2, 0.4, 0.5]
+
+
+def test_retry_is_skipped_when_its_backoff_exceeds_the_deadline(backoff_delays):
+    model = ScriptedModel([ModelError("unavailable", retryable=True), "Hi!"])
+    resilient = ResilientModel(model, retries=3, base_delay=1.0, deadline=0.5)
+
+    assert resilient.make_request(MESSAGES) is None
+    assert model.requests == 1
+    assert backoff_delays == []
+
+
+def test_slow_request_is_abandoned_at_the_deadline():
+    resilient = ResilientModel(DelayedModel([1.0]), retries=0, deadline=0.2)
+
+    started = time.monotonic()
+    assert resilient.make_request(MESSAGES) is None
+    assert time.monotonic() - started < 0.5
+
+
+def test_open_circuit_fails_requests_fast():
+    model = ScriptedModel([ModelError("unavailable", retryable=True)] * 2 + ["Hi!"])
+    circuit_breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+    resilient = ResilientModel(model, retries=0, circuit_breaker=circuit_breaker)
+
+    assert resilient.make_request(MESSAGES) is None
+    assert resilient.make_request(MESSAGES) is None
+
+    # The third request is rejected without reaching the model
+    assert resilient.make_request(MESSAGES) is None
+    assert model.requests == 2
+
+
+def test_slow_request_is_hedged():
+    # Twenty fast requests establish the latency percentile
+    model = DelayedModel([0.0] * 20 + [1.0, 0.0])
+    resilient = ResilientModel(
+        model, retries=0, hedging=True, hedge_min_delay=0.05, deadline=5.0
+    )
+    for _ in range(20):
+        resilient.make_request(MESSAGES)
+    hedged = METRICS.get_counter("model.hedged_requests")
+
+    started = time.monotonic()
+    resp = resilient.make_request(MESSAGES)
+
+    # The duplicate sent after 0.05s answers first
+    assert resp["content"] == "after 0.0s"
+    assert time.monotonic() - started < 0.5
+    assert METRICS.get_counter("model.hedged_requests") == hedged + 1
+
+
+def test_unexpected_error_of_a_trial_request_reopens_the_circuit():
+    model = ScriptedModel(
+        [ModelError("unavailable", retryable=True), KeyError("choices"), "Hi!"]
+    )
+    circuit_breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+    resilient = ResilientModel(model, retries=0, circuit_breaker=circuit_breaker)
+
+    # [1] A failure opens the circuit
+    assert resilient.make_request(MESSAGES) is None
+    assert not circuit_breaker.allow()
+
+    # [2] The trial request fails with a bug, which opens the circuit again
+    time.sleep(0.1)
+    with pytest.raises(KeyError):
+        resilient.make_request(MESSAGES)
+    assert not circuit_breaker.allow()
+
+    # [3] The next trial request is let through and closes the circuit
+    time.sleep(0.1)
+    assert resilient.make_request(MESSAGES)["content"] == "Hi!"
+    assert model.requests == 3
+
+
+def test_stream_receives_the_time_left_as_timeout():
+    model = FakeModel(FakeProfile(latency="fixed:2"))
+    resilient = ResilientModel(model, retries=0, deadline=0.3)
+
+    started = time.monotonic()
+    chunks, completed = read_stream(resilient.stream_request(MESSAGES))
+
+    assert (chunks, completed) == ([], False)
+    assert time.monotonic() - started < 0.6
+
+
+def test_stream_is_abandoned_at_the_deadline():
+    model = StallingModel()
+    resilient = ResilientModel(model, retries=0, deadline=0.35)
+
+    started = time.monotonic()
+    chunks, completed = read_stream(resilient.stream_request(MESSAGES))
+
+    assert 0 < model.timeout <= 0.35
+    assert 1 <= len(chunks) < 20
+    assert completed is False
+    assert time.monotonic() - started < 0.6
@@ -0,0 +1,81 @@
+"""
+test_response_cache.py
+
+Author: Tim Duggan
+Date: 10/18/2026
+Company: ImposterAI
+Contact: csw73@cornell.edu
+
+Tests of the response cache and of the metrics endpoint reporting its hit rates.
+"""
+# region Backend Imports
+from backend.fake_model import FakeProfile
+from backend.metrics import METRICS
+from backend.model_factory import create_model
+
+# endregion
+
+# Personality whose replies are cached
+PERSONALITY_ID = 9
+
+MESSAGES = [{"role": "user", "content": "Hello!"}]
+
+
+def get_profile(route) -> FakeProfile:
+    """
+    Returns the fake profile behind a route (cache, resilience layer, fake model).
+    """
+    return route.model._model._model._profile
+
+
+def test_fallback_replies_are_not_replayed_for_the_primary_model(app):
+    model = create_model(
+        {
+            **app.config,
+            "MODEL_CLIENT": "fake",
+            "MODEL_ID": "cached-primary",
+            "MODEL_FALLBACKS": ["cached-fallback"],
+            "MODEL_RETRIES": 0,
+            # Keep trying the primary first after it failed
+            "MODEL_ROUTE_MAX_ERROR_RATE": 1.0,
+            "RESPONSE_CACHE": "memory",
+            "RESPONSE_CACHE_PERSONALITIES": [PERSONALITY_ID],
+            "RATE_LIMIT_REQUESTS_PER_MINUTE": 0,
+            "RATE_LIMIT_TOKENS_PER_MINUTE": 0,
+        }
+    )
+    primary, fallback = model._routes
+
+    # [1] The primary model fails and the fallback's reply is cached
+    get_profile(primary)._error_rate = 1.0
+    assert model.make_request(MESSAGES, personality_id=PERSONALITY_ID)
+    assert METRICS.get_counter("router.fallbacks.cached-primary") == 1
+
+    # [2] Once the primary recovers it answers the same request itself
+    get_profile(primary)._error_rate = 0.0
+    assert model.make_request(MESSAGES, personality_id=PERSONALITY_ID)
+    assert METRICS.get_counter("router.requests.cached-primary") == 2
+
+    # [3] From then on, its own reply is served from the cache
+    assert model.make_request(MESSAGES, personality_id=PERSONALITY_ID)
+    assert METRICS.get_counter("router.requests.cached-primary") == 3
+    assert primary.model._lookup(
+        primary.model._get_key(MESSAGES, {"personality_id": PERSONALITY_ID})
+    )
+
+
+def test_metrics_require_the_metrics_token(app, client, monkeypatch):
+    # Without a token the endpoint does not exist (the frontend is served instead)
+    monkeypatch.setitem(app.config, "METRICS_TOKEN", None)
+    assert client.get("/backend/metrics").get_json(silent=True) is None
+
+    monkeypatch.setitem(app.config, "METRICS_TOKEN", "secret")
+    assert client.get("/backend/metrics").status_code == 401
+    wrong = client.get("/backend/metrics", headers={"Authorization": "Bearer wrong"})
+    assert wrong.status_code == 401
+
+    response = client.get(
+        "/backend/metrics", headers={"Authorization": "Bearer secret"}
+    )
+    assert response.status_code == 200
+    assert "counters" in response.get_json()
@@ -0,0 +1,137 @@
+"""
+test_streaming.py
+
+Author: Tim Duggan
+Date: 10/18/2026
+Company: ImposterAI
+Contact: csw73@cornell.edu
+
+Tests of the streamed responses of /api/stream_user_message, and of storing the
+response when the client disconnects before the stream ends.
+"""
+# region General/API Imports
+import json
+
+# endregion
+
+# region Backend Imports
+from backend.fake_model import FakeModel, FakeProfile
+
+# endregion
+
+# Conversation every test streams to
+PERSONALITY_ID = 9
+
+REPLY = "one two three four five six"
+
+
+def parse_events(body: str) -> list:
+    """
+    Parses the events of a text/event-stream body.
+
+    Args:
+        body (str): The body.
+
+    Returns:
+        list: Name and payload of every event, in order.
+    """
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.split("\n"))
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+def stream_message(client, auth_headers: dict, **kwargs):
+    """
+    Sends "Hello!" to /api/stream_user_message.
+
+    Args:
+        client (FlaskClient): Test client of the application.
+        auth_headers (dict): Authorization headers of the user.
+        **kwargs: Options of the test client request.
+
+    Returns:
+        TestResponse: The response.
+    """
+    return client.post(
+        "/api/stream_user_message",
+        json={"activeContactId": PERSONALITY_ID, "newMessage": "Hello!"},
+        headers=auth_headers,
+        **kwargs,
+    )
+
+
+def fetch_history(client, auth_headers: dict) -> list:
+    """
+    Fetches the stored messages of the conversation.
+
+    Args:
+        client (FlaskClient): Test client of the application.
+        auth_headers (dict): Authorization headers of the user.
+
+    Returns:
+        list: Role and content of every message.
+    """
+    response = client.post(
+        "/api/fetch_chat_history", json={"id": PERSONALITY_ID}, headers=auth_headers
+    )
+    return [
+        (message["role"], message["content"])
+        for message in response.get_json()
+        if message["role"] != "system"
+    ]
+
+
+def test_response_is_streamed_as_token_events_and_stored(
+    monkeypatch, app, client, auth_headers
+):
+    monkeypatch.setitem(app.extensions, "model", FakeModel(FakeProfile(REPLY)))
+
+    response = stream_message(client, auth_headers)
+
+    assert response.mimetype == "text/event-stream"
+    events = parse_events(response.get_data(as_text=True))
+    assert "".join(data["delta"] for name, data in events[:-1]) == REPLY
+    assert {name for name, _ in events[:-1]} == {"token"}
+    assert events[-1] == ("done", {"content": REPLY, "id": PERSONALITY_ID})
+    assert fetch_history(client, auth_headers)[-2:] == [
+        ("user", "Hello!"),
+        ("assistant", REPLY),
+    ]
+
+
+def test_failed_stream_sends_an_error_event_and_stores_nothing(
+    monkeypatch, app, client, auth_headers
+):
+    model = FakeModel(FakeProfile(REPLY, error_rate=1.0))
+    monkeypatch.setitem(app.extensions, "model", model)
+    history = fetch_history(client, auth_headers)
+
+    response = stream_message(client, auth_headers)
+
+    events = parse_events(response.get_data(as_text=True))
+    assert [name for name, _ in events] == ["error"]
+    assert events[0][1]["id"] == PERSONALITY_ID
+    assert fetch_history(client, auth_headers) == history
+
+
+def test_partial_response_is_stored_when_the_client_disconnects(
+    monkeypatch, app, client, auth_headers
+):
+    model = FakeModel(FakeProfile(REPLY, chunk_delay=0.01))
+    monkeypatch.setitem(app.extensions, "model", model)
+
+    # [1] Read the first two events, then disconnect
+    response = stream_message(client, auth_headers, buffered=False)
+    body = response.iter_encoded()
+    received = parse_events(b"".join([next(body), next(body)]).decode())
+    response.close()
+
+    # [2] The chunks sent so far are stored as the response
+    partial = "".join(data["delta"] for _, data in received)
+    assert partial and partial != REPLY
+    assert fetch_history(client, auth_headers)[-2:] == [
+        ("user", "Hello!"),
+        ("assistant", partial),
+    ]
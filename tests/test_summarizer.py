@@ -0,0 +1,193 @@
+"""
+test_summarizer.py
+
+Author: Tim Duggan
+Date: 10/18/2026
+Company: ImposterAI
+Contact: csw73@cornell.edu
+
+Tests of the rolling conversation summaries and the context windows sent in place
+of the summarized messages.
+"""
+# region General/API Imports
+import threading
+
+import pytest
+
+# endregion
+
+# region Backend Imports
+from backend.ai_model import AIModel
+from backend.context_window import TRUNCATION_POLICIES
+from backend.conversation import Conversation
+from backend.database_manager import DatabaseManager as dbm
+from backend.summarizer import ConversationSummarizer
+
+# endregion
+
+
+class RecordingModel(AIModel):
+    def __init__(self) -> None:
+        """
+        Model answering with a fixed summary and recording the request contexts.
+        """
+        self.contexts: list = []
+        self.done = threading.Event()
+
+    def make_request(self, conversation_messages, **kwargs):
+        self.contexts.append(kwargs)
+        self.done.set()
+        return {"role": "assistant", "content": "The user said hello."}
+
+
+# Conversation stored for the summary tests
+PERSONALITY_ID = 9
+
+
+def create_conversation(count: int, summary: str = None, summary_count: int = 0):
+    """
+    Creates a conversation starting with the intro message.
+
+    Args:
+        count (int): Number of messages after the intro message.
+        summary (str): Summary of the conversation.
+        summary_count (int): Number of leading messages folded into the summary.
+
+    Returns:
+        Conversation: The conversation.
+    """
+    messages = [{"role": "assistant", "content": "intro"}]
+    messages += [
+        {"role": "user" if i % 2 else "assistant", "content": f"message {i}"}
+        for i in range(1, count + 1)
+    ]
+    return Conversation(
+        1,
+        "Bot",
+        messages,
+        [],
+        summary=summary,
+        summary_count=summary_count,
+    )
+
+
+def test_summary_request_carries_the_conversation_context(app):
+    model = RecordingModel()
+    summarizer = ConversationSummarizer(model, keep_messages=2, batch_messages=2)
+
+    with app.app_context():
+        summarizer.schedule(7, 3, create_conversation(5))
+    assert model.done.wait(5)
+
+    assert model.contexts == [{"user_id": 7, "personality_id": 3}]
+
+
+def test_intro_is_kept_after_it_was_summarized():
+    conversation = create_conversation(6, "The user said hello.", summary_count=4)
+    policy = TRUNCATION_POLICIES["intro_and_recent"]
+
+    messages = conversation.export_context_window(1000, policy)
+
+    assert [message["content"] for message in messages] == [
+        "Summary of the earlier conversation: The user said hello.",
+        "intro",
+        "message 4",
+        "message 5",
+        "message 6",
+    ]
+
+
+def test_summary_is_only_saved_over_the_summary_it_was_built_upon(
+    app, client, auth_headers, user_id
+):
+    client.post(
+        "/api/send_user_message",
+        json={"activeContactId": PERSONALITY_ID, "newMessage": "Hello!"},
+        headers=auth_headers,
+    )
+
+    with app.app_context():
+        # [1] The first summary replaces the empty one
+        assert dbm.save_chat_summary(user_id, PERSONALITY_ID, "first", 2, 0)
+
+        # [2] A concurrent job built upon the empty summary is rejected
+        assert not dbm.save_chat_summary(user_id, PERSONALITY_ID, "stale", 1, 0)
+        assert dbm.get_chat_summary(user_id, PERSONALITY_ID) == ("first", 2)
+
+        # [3] A job built upon the first summary replaces it
+        assert dbm.save_chat_summary(user_id, PERSONALITY_ID, "second", 3, 2)
+        assert dbm.get_chat_summary(user_id, PERSONALITY_ID) == ("second", 3)
+
+
+def test_stale_summary_job_does_not_overwrite_the_summary(
+    app, client, auth_headers, user_id
+):
+    client.post(
+        "/api/send_user_message",
+        json={"activeContactId": PERSONALITY_ID, "newMessage": "Hello!"},
+        headers=auth_headers,
+    )
+    with app.app_context():
+        assert dbm.save_chat_summary(user_id, PERSONALITY_ID, "current", 2, 0)
+
+    # The job read the conversation before the current summary was saved
+    summarizer = ConversationSummarizer(RecordingModel())
+    summarizer._run(
+        app,
+        (user_id, PERSONALITY_ID),
+        "Bot",
+        None,
+        0,
+        [{"role": "user", "content": "Hello!"}],
+    )
+
+    with app.app_context():
+        assert dbm.get_chat_summary(user_id, PERSONALITY_ID) == ("current", 2)
+
+
+def test_only_aged_out_batches_are_summarized():
+    summarizer = ConversationSummarizer(
+        RecordingModel(), keep_messages=4, batch_messages=3
+    )
+
+    # [1] Two messages aged out of the kept window, fewer than the batch size
+    assert summarizer.get_aged_messages(create_conversation(5)) == []
+
+    # [2] The aged out messages after the summarized ones are due
+    conversation = create_conversation(9, "The user said hello.", summary_count=2)
+    assert [
+        message["content"] for message in summarizer.get_aged_messages(conversation)
+    ] == ["message 2", "message 3", "message 4", "message 5"]
+
+
+# Every message of create_conversation takes 7 tokens, the intro 6
+@pytest.mark.parametrize(
+    "policy,budget,expected",
+    [
+        ("recent", 21, ["message 4", "message 5", "message 6"]),
+        ("recent", 1, ["message 6"]),
+        ("intro_and_recent", 20, ["intro", "message 5", "message 6"]),
+        ("intro_and_recent", 1, ["intro", "message 6"]),
+        ("none", 1, ["intro"] + [f"message {i}" for i in range(1, 7)]),
+    ],
+)
+def test_truncation_policies_fill_the_budget(policy, budget, expected):
+    conversation = create_conversation(6)
+
+    messages = conversation.export_context_window(budget, TRUNCATION_POLICIES[policy])
+
+    assert [message["content"] for message in messages] == expected
+
+
+@pytest.mark.parametrize("policy", ["recent", "none"])
+def test_summarized_messages_are_not_sent_again(policy):
+    conversation = create_conversation(6, "The user said hello.", summary_count=4)
+
+    messages = conversation.export_context_window(1000, TRUNCATION_POLICIES[policy])
+
+    assert [message["content"] for message in messages] == [
+        "Summary of the earlier conversation: The user said hello.",
+        "message 4",
+        "message 5",
+        "message 6",
+    ]